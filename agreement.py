@@ -0,0 +1,53 @@
+from itertools import combinations
+
+import numpy as np
+
+from cascade import SKIPPED_TEXT
+from pipeline import DISABLED_TEXT, ERROR_TEXT
+from similarity import NgramProfile, profile_chrf
+
+# Рядки з узгодженістю нижче порогу потрапляють до звіту розбіжностей
+DISAGREEMENT_THRESHOLD = 0.5
+
+
+def agreement_scores(translations, max_n=6):
+    """Середній попарний chrF між перекладами рушіїв для кожного рядка.
+
+    Помилки, пропущені каскадом і вимкнені рушії не порівнюються; якщо порівнювати нічого, оцінка — None.
+    """
+    engines = list(translations)
+    if not engines:
+        return []
+    size = len(translations[engines[0]])
+    profiles = {}
+    valid = {}
+    for engine in engines:
+        texts = translations[engine]
+        profiles[engine] = NgramProfile(texts, max_n)
+        valid[engine] = np.array(
+            [bool(text) and text not in (ERROR_TEXT, SKIPPED_TEXT, DISABLED_TEXT) for text in texts],
+            dtype=bool,
+        )
+
+    total = np.zeros(size)
+    pairs = np.zeros(size)
+    for first, second in combinations(engines, 2):
+        compared = valid[first] & valid[second]
+        total += np.where(compared, profile_chrf(profiles[first], profiles[second]), 0.0)
+        pairs += compared
+    return [round(float(score / count), 3) if count else None for score, count in zip(total, pairs)]
+
+
+def review_order(scores):
+    """Індекси рядків від найменш узгоджених; рядки без оцінки — першими."""
+    return sorted(range(len(scores)), key=lambda idx: -1.0 if scores[idx] is None else scores[idx])
+
+
+def disagreement_rows(scores, threshold=DISAGREEMENT_THRESHOLD):
+    """Індекси рядків для перевірки (нижче порогу або без оцінки) у порядку review_order."""
+    return [idx for idx in review_order(scores) if scores[idx] is None or scores[idx] < threshold]
+
+
+def agreement_summary(scores, threshold=DISAGREEMENT_THRESHOLD):
+    flagged = len(disagreement_rows(scores, threshold))
+    return f"Узгодженість перекладів: рядків для перевірки {flagged} з {len(scores)} (chrF < {threshold})"
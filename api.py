@@ -0,0 +1,301 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from fetch import MAX_BODY_BYTES
+from metrics import JobTimings, render, stage
+from pipeline import TranslationPipeline
+from exporters import EXPORTERS
+from segments import SegmentTable
+from translate_script import (
+    extract_text, load_marian_model, build_engines, save_outputs,
+    sanitize_filename, ENGINE_LABELS, OUTPUT_FORMATS
+)
+
+UPLOAD_DIR = "temp"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+JOB_WORKERS = int(os.getenv("LTU_JOB_WORKERS", "2"))
+# Завершені завдання (разом із сегментами для потокової видачі) зберігаються обмежений час і в обмеженій кількості
+JOB_TTL = float(os.getenv("LTU_JOB_TTL", "3600"))
+MAX_FINISHED_JOBS = int(os.getenv("LTU_MAX_FINISHED_JOBS", "200"))
+# Найбільший розмір тіла запиту (файлу чи JSON), байт — як і для сторінок у fetch.py
+MAX_UPLOAD_BYTES = int(os.getenv("LTU_MAX_UPLOAD_BYTES", str(MAX_BODY_BYTES)))
+
+_jobs = {}
+_job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+_marian = None
+_marian_lock = threading.Lock()
+
+
+def get_marian():
+    """Ліниво завантажує MarianMT один раз для всіх завдань."""
+    global _marian
+    with _marian_lock:
+        if _marian is None:
+            _marian = load_marian_model()
+        return _marian
+
+
+class TranslationJob:
+    """Стан одного завдання перекладу та черги підписників потокової видачі."""
+
+    def __init__(self, source, formats=("docx",)):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.formats = tuple(formats)
+        self.status = "queued"
+        self.error = None
+        self.total = 0
+        self.progress = {name: 0 for name in ENGINE_LABELS}
+        self.segments = []
+        self._published = {}
+        self.outputs = {}
+        self.timings = JobTimings()
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "source": os.path.basename(self.source) if not self.source.startswith("http") else self.source,
+            "status": self.status,
+            "error": self.error,
+            "total": self.total,
+            "completed": len(self.segments),
+            "progress": self.progress,
+            "formats": list(self.formats),
+            "created_at": self.created_at,
+            "timings": {name: round(seconds, 3) for name, seconds in self.timings.stages.items()},
+        }
+
+    def subscribe(self, loop):
+        """Повертає вже готові сегменти та чергу для наступних подій."""
+        queue = asyncio.Queue()
+        with self._lock:
+            backlog = list(self.segments)
+            finished = self.status in ("done", "failed")
+            if not finished:
+                self._subscribers.append((loop, queue))
+        return backlog, queue, finished
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = [(l, q) for l, q in self._subscribers if q is not queue]
+
+    def _publish(self, event):
+        with self._lock:
+            if event is not None and event["index"] in self._published:
+                # Повторний прохід конвеєра надсилає виправлений рядок ще раз: замінюємо, а не дописуємо
+                self.segments[self._published[event["index"]]] = event
+            elif event is not None:
+                self._published[event["index"]] = len(self.segments)
+                self.segments.append(event)
+            subscribers = list(self._subscribers)
+            if event is None:
+                self._subscribers = []
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def run(self):
+        """Виконує завдання у фоновому потоці."""
+        self.status = "running"
+        try:
+            with self.timings:
+                with stage("extract"):
+                    paragraphs = extract_text(self.source)
+                if not paragraphs:
+                    raise ValueError("Документ не містить тексту або текст не вдалося витягти.")
+                self.total = len(paragraphs)
+                with stage("load_model"):
+                    tokenizer, model = get_marian()
+
+                def update_progress(engine, done, total):
+                    self.progress[engine] = done
+
+                def publish_segment(idx, paragraph, row):
+                    self._publish({"index": idx, "source": paragraph, **row})
+
+                with stage("translate"):
+                    pipeline = TranslationPipeline(
+                        build_engines(tokenizer, model), max_workers=10,
+                        on_progress=update_progress, on_segment=publish_segment
+                    )
+                    translations = pipeline.run(paragraphs)
+                with stage("segment"):
+                    segments = SegmentTable.from_translations(paragraphs, translations)
+                    del paragraphs, translations
+                self.outputs = save_outputs(self.source, segments, self.formats)
+            logging.info(f"Завдання {self.id}: {self.timings.summary_text()}")
+            self.status = "done"
+        except Exception as e:
+            logging.error(f"Завдання {self.id} завершилося з помилкою: {e}")
+            self.error = str(e)
+            self.status = "failed"
+        finally:
+            self.finished_at = time.monotonic()
+            self._publish(None)
+
+
+def _evict_jobs(now=None):
+    """Прибирає завершені завдання, старші за JOB_TTL, і найстаріші понад MAX_FINISHED_JOBS."""
+    now = now or time.monotonic()
+    finished = sorted(
+        (job for job in _jobs.values() if job.finished_at is not None), key=lambda job: job.finished_at
+    )
+    expired = [job for job in finished if now - job.finished_at > JOB_TTL]
+    expired += finished[len(expired):max(len(expired), len(finished) - MAX_FINISHED_JOBS)]
+    for job in expired:
+        del _jobs[job.id]
+        # Завантажений файл більше не потрібен; результати в output залишаються
+        if job.source.startswith(UPLOAD_DIR + os.sep) and os.path.exists(job.source):
+            os.remove(job.source)
+    if expired:
+        logging.info(f"Видалено завершених завдань: {len(expired)}")
+
+
+def _get_job(request):
+    return _jobs.get(request.path_params["job_id"])
+
+
+async def _read_body(request, limit=MAX_UPLOAD_BYTES):
+    """Читає тіло запиту частинами; None, якщо воно (або заявлений Content-Length) більше за limit."""
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        return None
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def submit_job(request):
+    """Створює завдання: JSON {"url": ..., "formats": [...]} або сирий файл із параметрами ?filename=&formats=.
+
+    formats — формати результату (docx, parquet, tmx, xliff, csv); за замовчуванням лише docx.
+    """
+    _evict_jobs()
+    formats = request.query_params.get("formats", "docx").split(",")
+    is_json = request.headers.get("content-type", "").startswith("application/json")
+    body = await _read_body(request)
+    if body is None:
+        return JSONResponse({"error": f"Тіло запиту більше за {MAX_UPLOAD_BYTES} байт."}, status_code=413)
+    if is_json:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return JSONResponse({"error": "Тіло запиту не є коректним JSON."}, status_code=400)
+        if not isinstance(payload, dict):
+            return JSONResponse({"error": "Очікується JSON-об'єкт {\"url\": ...}."}, status_code=400)
+        source = payload.get("url")
+        source = source.strip() if isinstance(source, str) else ""
+        formats = payload.get("formats") or formats
+        if not source.startswith("http"):
+            return JSONResponse({"error": "Очікується поле 'url'."}, status_code=400)
+    # Формати перевіряються до збереження завантаженого файлу
+    if (not isinstance(formats, list) or not all(isinstance(fmt, str) for fmt in formats)
+            or not set(formats) <= set(OUTPUT_FORMATS)):
+        return JSONResponse({"error": f"Доступні формати: {', '.join(OUTPUT_FORMATS)}."}, status_code=400)
+    if not is_json:
+        filename = sanitize_filename(os.path.basename(request.query_params.get("filename", "")))
+        if not filename.endswith((".pdf", ".docx")):
+            return JSONResponse({"error": "Параметр 'filename' має закінчуватися на .pdf або .docx."}, status_code=400)
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        source = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex[:8]}_{filename}")
+        if not body:
+            return JSONResponse({"error": "Порожнє тіло запиту: очікується вміст файлу."}, status_code=400)
+        await run_in_threadpool(_write_file, source, body)
+
+    job = TranslationJob(source, formats)
+    _jobs[job.id] = job
+    _job_executor.submit(job.run)
+    return JSONResponse(job.to_dict(), status_code=202)
+
+
+def _write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+async def job_status(request):
+    job = _get_job(request)
+    if job is None:
+        return JSONResponse({"error": "Завдання не знайдено."}, status_code=404)
+    return JSONResponse(job.to_dict())
+
+
+async def job_result(request):
+    """Віддає файл результату; ?format= обирає один із форматів завдання (за замовчуванням перший)."""
+    job = _get_job(request)
+    if job is None:
+        return JSONResponse({"error": "Завдання не знайдено."}, status_code=404)
+    if job.status != "done":
+        return JSONResponse(job.to_dict(), status_code=409)
+    fmt = request.query_params.get("format", job.formats[0])
+    if fmt not in job.outputs:
+        return JSONResponse({"error": f"Завдання не має результату у форматі {fmt}."}, status_code=404)
+    return FileResponse(
+        job.outputs[fmt],
+        filename=os.path.basename(job.outputs[fmt]),
+        media_type=DOCX_MIME if fmt == "docx" else EXPORTERS[fmt].mime,
+    )
+
+
+async def job_stream(request):
+    """Віддає перекладені сегменти у форматі NDJSON у міру їх готовності."""
+    job = _get_job(request)
+    if job is None:
+        return JSONResponse({"error": "Завдання не знайдено."}, status_code=404)
+
+    backlog, queue, finished = job.subscribe(asyncio.get_running_loop())
+
+    async def events():
+        try:
+            for event in backlog:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+            if finished:
+                return
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            job.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+async def metrics(request):
+    """Метрики процесу у текстовому форматі Prometheus."""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+app = Starlette(routes=[
+    Route("/jobs", submit_job, methods=["POST"]),
+    Route("/jobs/{job_id}", job_status),
+    Route("/jobs/{job_id}/result", job_result),
+    Route("/jobs/{job_id}/stream", job_stream),
+    Route("/metrics", metrics),
+])
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8000")))
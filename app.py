@@ -1,28 +1,63 @@
+import hashlib
+import io
 import os
 import streamlit as st
 from translate_script import (
-    extract_text, translate_text_google, translate_text_marian, translate_text_openai,
-    setup_document_orientation, add_title, create_translation_table, extract_text_from_url
+    extract_text, extract_text_from_url, load_marian_model, build_job_pipeline, summarize_stages,
+    build_translation_document, load_translation_document, write_review_csv, ENGINE_LABELS, OUTPUT_FORMATS
 )
-from transformers import MarianMTModel, MarianTokenizer
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import docx
+from agreement import agreement_scores, agreement_summary, disagreement_rows
+from crawl import crawl_urls, combine_pages
+from estimate import ThroughputHistory, estimate_job, format_estimate
+from exporters import EXPORTERS, export_segments
+from incremental import translate_incremental
+from metrics import JobTimings, stage, start_metrics_server
+from profiling import PROFILE_ENABLED, JobProfiler
+from segments import SegmentTable
+from translation_memory import TranslationMemory, MemoryLookup
+from placeholders import PlaceholderMasker
+from glossary import GlossaryEnforcer, load_glossary
 import logging
 import openai
-import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # Ініціалізація MarianMT
-model_name = "Helsinki-NLP/opus-mt-en-uk"
-tokenizer = MarianTokenizer.from_pretrained(model_name)
-model = MarianMTModel.from_pretrained(model_name)
+tokenizer, model = load_marian_model()
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Точка /metrics для Prometheus, якщо задано LTU_METRICS_PORT (один сервер на процес Streamlit)
+start_metrics_server()
+
+@st.cache_resource
+def get_translation_memory():
+    """Одна пам'ять перекладів на процес Streamlit."""
+    return TranslationMemory()
+
+@st.cache_resource
+def get_throughput_history():
+    """Історія швидкості рушіїв для оцінки тривалості, спільна для всіх сесій."""
+    return ThroughputHistory()
+
+@st.cache_data(show_spinner=False)
+def extract_file_paragraphs(file_path, digest):
+    """Витягує абзаци завантаженого файлу один раз.
+
+    digest — хеш вмісту: нова версія файлу з тією ж назвою й розміром не береться з кешу.
+    """
+    return extract_text(file_path)
+
+@st.cache_data(show_spinner=False)
+def estimate_file_job(file_path, digest, engines, fast_path, use_memory, mask_placeholders):
+    """Оцінка тривалості й вартості перекладу файлу для обраних рушіїв і налаштувань."""
+    return estimate_job(
+        extract_file_paragraphs(file_path, digest), tokenizer, get_translation_memory() if use_memory else None,
+        fast_path=fast_path, mask_placeholders=mask_placeholders, engines=engines, history=get_throughput_history()
+    )
+
 # Перевірка та створення папки temp
 TEMP_DIR = "temp"
 if not os.path.exists(TEMP_DIR):
@@ -109,7 +144,7 @@ if section == "Головна сторінка":
     st.write("Завантажте файл (DOCX або PDF) або введіть URL для перекладу.")
 
     # Вибір джерела
-    type_of_source = st.radio("Оберіть тип джерела:", ["Файл", "URL"])
+    type_of_source = st.radio("Оберіть тип джерела:", ["Файл", "URL", "Кілька URL / розділ сайту"])
 
     # Функція для збереження файлу
     def save_uploaded_file(uploaded_file):
@@ -118,66 +153,203 @@ if section == "Головна сторінка":
             f.write(uploaded_file.getbuffer())
         return file_path
 
+    # Інкрементальний переклад нової редакції документа
+    previous_upload = st.file_uploader(
+        "Попередній переклад LegalTransUA (DOCX, необов'язково) — будуть перекладені лише змінені абзаци:",
+        type=["docx"], key="previous_translation"
+    )
+    highlight_changes = st.checkbox("Підсвітити змінені рядки", value=True) if previous_upload else False
+
+    cascade_mode = st.checkbox(
+        "Каскадний режим: OpenAI лише для абзаців, де Google і MarianMT не узгоджені", value=False
+    )
+    use_memory = st.checkbox("Використовувати пам'ять перекладів", value=True)
+    mask_placeholders = st.checkbox("Маскувати числа, дати та посилання на статті перед перекладом", value=True)
+    fast_path = st.checkbox(
+        "Не перекладати номери сторінок, дати, суми, URL та український текст", value=True
+    )
+    score_agreement = st.checkbox(
+        "Оцінити узгодженість рушіїв і підготувати звіт розбіжностей для перевірки", value=True
+    )
+    profile_job = st.checkbox(
+        "Профілювати завдання (флеймграф потоків і виділення пам'яті за етапами)", value=PROFILE_ENABLED
+    )
+    selected_engines = st.multiselect(
+        "Рушії перекладу:", list(ENGINE_LABELS), default=list(ENGINE_LABELS), format_func=ENGINE_LABELS.get
+    )
+    output_formats = st.multiselect(
+        "Формати результату:", list(OUTPUT_FORMATS), default=["docx"],
+        format_func=lambda fmt: {"docx": "DOCX (таблиця порівняння)", "xliff": "XLIFF 2.0"}.get(fmt, fmt.upper())
+    )
+    glossary_upload = st.file_uploader(
+        "Глосарій обов'язкових термінів (CSV/TSV: термін, переклад; необов'язково):",
+        type=["csv", "tsv", "txt"], key="glossary"
+    )
+
+    def run_translation(paragraphs, output_file, download_name, show_estimate=True):
+        """Перекладає абзаци спільним конвеєром і пропонує завантажити DOCX; показує час етапів."""
+        if not selected_engines:
+            st.warning("Оберіть хоча б один рушій перекладу.")
+            return
+        if not output_formats:
+            st.warning("Оберіть хоча б один формат результату.")
+            return
+        profiler = JobProfiler() if profile_job else None
+        with JobTimings(profiler) as timings:
+            translate_paragraphs(paragraphs, output_file, download_name, show_estimate)
+        logging.info(timings.summary_text())
+        st.caption(timings.summary_text())
+        if profiler:
+            speedscope_file, _, allocations_file = profiler.write(output_file)
+            with open(speedscope_file, "rb") as f:
+                st.download_button(
+                    label="Завантажити профіль (speedscope.app)",
+                    data=f.read(),
+                    file_name=download_name.replace(".docx", ".speedscope.json"),
+                    mime="application/json"
+                )
+            with open(allocations_file, "rb") as f:
+                st.download_button(
+                    label="Завантажити звіт виділень пам'яті",
+                    data=f.read(),
+                    file_name=download_name.replace(".docx", "_пам'ять.txt"),
+                    mime="text/plain"
+                )
+
+    def translate_paragraphs(paragraphs, output_file, download_name, show_estimate):
+        if show_estimate:
+            with stage("estimate"):
+                estimate = estimate_job(
+                    paragraphs, tokenizer, get_translation_memory() if use_memory else None, fast_path=fast_path,
+                    mask_placeholders=mask_placeholders, engines=selected_engines, history=get_throughput_history()
+                )
+            st.info(format_estimate(estimate).replace("\n", "  \n"))
+
+        # Прогрес-бари
+        progress_bars = {
+            name: st.progress(0, text=f"{label}: 0%") for name, label in ENGINE_LABELS.items()
+        }
+
+        def update_progress(engine, done, total):
+            progress_bars[engine].progress(
+                done / total, text=f"{ENGINE_LABELS[engine]}: {int(done / total * 100)}%"
+            )
+
+        # Переклад
+        memory = MemoryLookup(get_translation_memory()) if use_memory else None
+        masker = PlaceholderMasker() if mask_placeholders else None
+        glossary = GlossaryEnforcer(load_glossary(glossary_upload.getvalue())) if glossary_upload else None
+        # Спільні лише збережені швидкості; виміри цього завдання — окремо від інших сесій
+        throughput = get_throughput_history().start_job()
+        with stage("translate"):
+            pipeline, stages = build_job_pipeline(
+                tokenizer, model, max_workers=5, on_progress=update_progress, cascade=cascade_mode,
+                memory=memory, masker=masker, fast_path=fast_path, glossary=glossary, engines=selected_engines,
+                throughput=throughput
+            )
+            changed = None
+            if previous_upload:
+                previous = load_translation_document(save_uploaded_file(previous_upload))
+                translations, changed = translate_incremental(pipeline, paragraphs, previous)
+                st.info(f"Змінено абзаців: {len(changed)} з {len(paragraphs)}.")
+            else:
+                translations = pipeline.run(paragraphs)
+
+        with stage("postprocess"):
+            if memory:
+                memory.save()
+            throughput.save()
+            term_flags = glossary.check(paragraphs, translations) if glossary else None
+            row_notes, notes = summarize_stages(paragraphs, stages)
+            scores = agreement_scores(translations) if score_agreement else None
+            if scores is not None:
+                notes.append(agreement_summary(scores))
+        with stage("segment"):
+            segments = SegmentTable.from_translations(
+                paragraphs, translations, notes=row_notes, changed=changed, scores=scores, term_flags=term_flags
+            )
+            # Переклади й метадані далі читаються з таблиці
+            del translations, row_notes, term_flags
+        for note in notes:
+            st.info(note)
+
+        # Збереження результатів у файл
+        if "docx" in output_formats:
+            with stage("render"):
+                doc = build_translation_document(segments, highlight_changes=highlight_changes, notes=notes)
+            with stage("save"):
+                doc.save(output_file)
+
+        st.success("Переклад завершено!")
+        if "docx" in output_formats:
+            with open(output_file, "rb") as f:
+                st.download_button(
+                    label="Завантажити таблицю DOCX",
+                    data=f.read(),
+                    file_name=download_name,
+                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                )
+        for fmt in output_formats:
+            if fmt == "docx":
+                continue
+            extension = EXPORTERS[fmt].extension
+            with stage("export"):
+                export_file = export_segments(
+                    segments, fmt, os.path.splitext(output_file)[0] + extension, source=download_name
+                )
+            with open(export_file, "rb") as f:
+                st.download_button(
+                    label=f"Завантажити {fmt.upper()}",
+                    data=f.read(),
+                    file_name=download_name.replace(".docx", extension),
+                    mime=EXPORTERS[fmt].mime
+                )
+
+        if scores is not None:
+            # Звіт лише з неузгодженими рядками, від найгірших
+            review_doc = build_translation_document(segments, notes=notes, rows=disagreement_rows(scores))
+            review_buffer = io.BytesIO()
+            review_doc.save(review_buffer)
+            st.download_button(
+                label="Завантажити лише розбіжності (DOCX)",
+                data=review_buffer.getvalue(),
+                file_name=download_name.replace(".docx", "_розбіжності.docx"),
+                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            )
+            csv_buffer = io.StringIO()
+            write_review_csv(csv_buffer, segments)
+            st.download_button(
+                label="Завантажити оцінки узгодженості (CSV)",
+                data=csv_buffer.getvalue().encode("utf-8-sig"),
+                file_name=download_name.replace(".docx", "_оцінки.csv"),
+                mime="text/csv"
+            )
+
     if type_of_source == "Файл":
         uploaded_file = st.file_uploader("Завантажте файл (DOCX або PDF):", type=["docx", "pdf"])
         if uploaded_file:
             file_path = save_uploaded_file(uploaded_file)
             st.success(f"Файл '{uploaded_file.name}' успішно завантажено.")
+            digest = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+            paragraphs = extract_file_paragraphs(file_path, digest)
+            st.info(f"Знайдено {len(paragraphs)} абзаців для перекладу.")
+
+            # Оцінка до запуску: рушії можна вимкнути в налаштуваннях вище
+            if paragraphs and selected_engines:
+                estimate = estimate_file_job(
+                    file_path, digest, tuple(selected_engines), fast_path, use_memory, mask_placeholders
+                )
+                st.info(format_estimate(estimate).replace("\n", "  \n"))
 
-            if st.button("Розпочати переклад"):
-                paragraphs = extract_text(file_path)
-                st.info(f"Знайдено {len(paragraphs)} абзаців для перекладу.")
-
-                # Прогрес-бари
-                google_progress = st.progress(0, text="Google Translate: 0%")
-                marian_progress = st.progress(0, text="MarianMT: 0%")
-                openai_progress = st.progress(0, text="OpenAI GPT: 0%")
-
-                # Переклад
-                google_translations = ["" for _ in paragraphs]
-                marian_translations = ["" for _ in paragraphs]
-                openai_translations = ["" for _ in paragraphs]
-
-                with ThreadPoolExecutor(max_workers=5) as executor:
-                    # Google Translate
-                    google_futures = {executor.submit(translate_text_google, para): idx for idx, para in enumerate(paragraphs)}
-                    for i, future in enumerate(as_completed(google_futures)):
-                        idx = google_futures[future]
-                        google_translations[idx] = future.result()
-                        google_progress.progress((i + 1) / len(paragraphs), text=f"Google Translate: {int((i + 1) / len(paragraphs) * 100)}%")
-
-                    # MarianMT
-                    marian_futures = {executor.submit(translate_text_marian, para, tokenizer, model): idx for idx, para in enumerate(paragraphs)}
-                    for i, future in enumerate(as_completed(marian_futures)):
-                        idx = marian_futures[future]
-                        marian_translations[idx] = future.result()
-                        marian_progress.progress((i + 1) / len(paragraphs), text=f"MarianMT: {int((i + 1) / len(paragraphs) * 100)}%")
-
-                    # OpenAI GPT
-                    openai_futures = {executor.submit(translate_text_openai, para): idx for idx, para in enumerate(paragraphs)}
-                    for i, future in enumerate(as_completed(openai_futures)):
-                        idx = openai_futures[future]
-                        openai_translations[idx] = future.result()
-                        openai_progress.progress((i + 1) / len(paragraphs), text=f"OpenAI GPT: {int((i + 1) / len(paragraphs) * 100)}%")
-
-                # Збереження результатів у файл
+            if not selected_engines:
+                st.warning("Оберіть хоча б один рушій перекладу.")
+            elif st.button("Розпочати переклад"):
                 base_name = os.path.splitext(uploaded_file.name)[0]
-                output_file = os.path.join(TEMP_DIR, f"{base_name}.docx")
-                doc = docx.Document()
-
-                # Налаштування документа
-                setup_document_orientation(doc)
-                add_title(doc)
-                create_translation_table(doc, paragraphs, google_translations, marian_translations, openai_translations)
-
-                doc.save(output_file)
-
-                st.success("Переклад завершено!")
-                st.download_button(
-                label="Завантажити таблицю DOCX",
-                data=open(output_file, "rb").read(),
-                file_name=f"Переклад_{os.path.splitext(uploaded_file.name)[0]}.docx",
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                run_translation(
+                    paragraphs,
+                    os.path.join(TEMP_DIR, f"{base_name}.docx"),
+                    f"Переклад_{base_name}.docx",
+                    show_estimate=False,
                 )
 
     elif type_of_source == "URL":
@@ -190,53 +362,36 @@ if section == "Головна сторінка":
                 st.warning("Не вдалося знайти текст на сторінці.")
             else:
                 st.success(f"Знайдено {len(paragraphs)} абзаців для перекладу.")
+                run_translation(
+                    paragraphs,
+                    os.path.join(TEMP_DIR, "Translated_from_URL.docx"),
+                    "Переклад_URL.docx",
+                )
 
-                # Прогрес-бари
-                google_progress = st.progress(0, text="Google Translate: 0%")
-                marian_progress = st.progress(0, text="MarianMT: 0%")
-                openai_progress = st.progress(0, text="OpenAI GPT: 0%")
-
-                # Переклад
-                google_translations = ["" for _ in paragraphs]
-                marian_translations = ["" for _ in paragraphs]
-                openai_translations = ["" for _ in paragraphs]
-
-                with ThreadPoolExecutor(max_workers=5) as executor:
-                    # Google Translate
-                    google_futures = {executor.submit(translate_text_google, para): idx for idx, para in enumerate(paragraphs)}
-                    for i, future in enumerate(as_completed(google_futures)):
-                        idx = google_futures[future]
-                        google_translations[idx] = future.result()
-                        google_progress.progress((i + 1) / len(paragraphs), text=f"Google Translate: {int((i + 1) / len(paragraphs) * 100)}%")
-
-                    # MarianMT
-                    marian_futures = {executor.submit(translate_text_marian, para, tokenizer, model): idx for idx, para in enumerate(paragraphs)}
-                    for i, future in enumerate(as_completed(marian_futures)):
-                        idx = marian_futures[future]
-                        marian_translations[idx] = future.result()
-                        marian_progress.progress((i + 1) / len(paragraphs), text=f"MarianMT: {int((i + 1) / len(paragraphs) * 100)}%")
-
-                    # OpenAI GPT
-                    openai_futures = {executor.submit(translate_text_openai, para): idx for idx, para in enumerate(paragraphs)}
-                    for i, future in enumerate(as_completed(openai_futures)):
-                        idx = openai_futures[future]
-                        openai_translations[idx] = future.result()
-                        openai_progress.progress((i + 1) / len(paragraphs), text=f"OpenAI GPT: {int((i + 1) / len(paragraphs) * 100)}%")
-
-                # Збереження результатів у таблицю
-                output_file = os.path.join(TEMP_DIR, "Translated_from_URL.docx")
-                doc = docx.Document()
-                setup_document_orientation(doc)
-                add_title(doc)
-                create_translation_table(doc, paragraphs, google_translations, marian_translations, openai_translations)
-                doc.save(output_file)
-
-                st.success("Переклад завершено!")
-                st.download_button(
-                    label="Завантажити таблицю DOCX",
-                    data=open(output_file, "rb").read(),
-                    file_name="Переклад_URL.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    elif type_of_source == "Кілька URL / розділ сайту":
+        url_text = st.text_area("Введіть URL (по одному в рядку):")
+        link_pattern = st.text_input(
+            "Переходити за посиланнями, що відповідають шаблону (регулярний вираз, необов'язково):"
+        )
+        max_depth = st.number_input("Глибина переходу за посиланнями:", min_value=0, max_value=5, value=0)
+        urls = [line.strip() for line in url_text.splitlines() if line.strip()]
+        if urls and st.button("Розпочати переклад"):
+            with st.spinner(f"Завантаження сторінок ({len(urls)} початкових URL)..."):
+                crawler = crawl_urls(urls, link_pattern=link_pattern or None, max_depth=int(max_depth))
+            for failed_url, error in crawler.failures.items():
+                st.warning(f"{failed_url}: {error}")
+            if not crawler.pages:
+                st.warning("Не вдалося знайти текст на жодній сторінці.")
+            else:
+                paragraphs = combine_pages(crawler.pages)
+                st.success(
+                    f"Сторінок: {len(crawler.pages)} (дублікатів пропущено: {len(crawler.duplicates)}), "
+                    f"абзаців для перекладу: {len(paragraphs)}."
+                )
+                run_translation(
+                    paragraphs,
+                    os.path.join(TEMP_DIR, "Translated_from_URLs.docx"),
+                    "Переклад_сторінок.docx",
                 )
 
 elif section == "Про додаток":
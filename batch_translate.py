@@ -0,0 +1,186 @@
+import argparse
+import glob
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from glossary import GlossaryEnforcer, load_glossary
+from pipeline import TranslationPipeline
+from replay import replaying
+from segments import SegmentTable
+from translate_script import (
+    extract_text, load_marian_model, build_engines, check_formats, output_base_name, save_outputs, ENGINE_LABELS,
+    OUTPUT_FORMATS
+)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+
+
+def collect_sources(inputs, url_list=None):
+    """Розгортає каталоги, glob-шаблони та список URL у впорядкований перелік джерел."""
+    sources = []
+    for item in inputs:
+        if item.startswith("http"):
+            sources.append(item)
+        elif os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        sources.append(os.path.join(root, name))
+        else:
+            matches = sorted(glob.glob(item, recursive=True)) or [item]
+            sources.extend(m for m in matches if m.lower().endswith(SUPPORTED_EXTENSIONS))
+    if url_list:
+        with open(url_list, encoding="utf-8") as f:
+            sources.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+
+    # Прибираємо повтори, зберігаючи порядок
+    return list(dict.fromkeys(sources))
+
+
+def output_suffixes(sources):
+    """Суфікси імен файлів результату для кожного джерела пакета.
+
+    Джерела з однаковою назвою (a/contract.docx, b/contract.docx) отримують свій номер у пакеті,
+    щоб не перезаписати одне одного.
+    """
+    names = Counter(output_base_name(source) for source in sources)
+    return {
+        source: f" [{idx}]" if names[output_base_name(source)] > 1 else ""
+        for idx, source in enumerate(sources, start=1)
+    }
+
+
+def _extract_worker(source):
+    """Витягує текст у дочірньому процесі; помилка повертається, а не піднімається."""
+    try:
+        # Документи вже обробляються паралельно, тож PDF усередині процесу — послідовно
+        return source, extract_text(source, processes=1), None
+    except Exception as e:
+        return source, None, str(e)
+
+
+def run_batch(sources, output_dir="output", processes=None, threads=10, glossary_file=None, formats=("docx",)):
+    """Перекладає пакет документів з глобальною дедуплікацією сегментів.
+
+    formats — формати результату з OUTPUT_FORMATS; outputs у підсумку — {джерело: {формат: шлях}}.
+    """
+    check_formats(formats)
+    started = time.monotonic()
+    failures = {}
+    documents = []
+
+    # Паралельне витягнення тексту
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for source, paragraphs, error in executor.map(_extract_worker, sources):
+            if error:
+                failures[source] = error
+                logging.error(f"Не вдалося витягти текст із {source}: {error}")
+            elif not paragraphs:
+                failures[source] = "Документ не містить тексту"
+            else:
+                documents.append((source, paragraphs))
+    extract_time = time.monotonic() - started
+
+    # Глобальна дедуплікація сегментів
+    unique = list(dict.fromkeys(p for _, paragraphs in documents for p in paragraphs))
+    total_segments = sum(len(paragraphs) for _, paragraphs in documents)
+    logging.info(f"Сегментів усього: {total_segments}, унікальних: {len(unique)}")
+
+    translations = {name: [] for name in ENGINE_LABELS}
+    glossary = GlossaryEnforcer(load_glossary(glossary_file)) if glossary_file else None
+    term_flags = []
+    translate_started = time.monotonic()
+    if unique:
+        # Під час відтворення записаних викликів модель не потрібна
+        tokenizer, model = (None, None) if replaying() else load_marian_model()
+
+        def log_progress(engine, done, total):
+            logging.info(f"{ENGINE_LABELS[engine]}: {done}/{total} ({int(done / total * 100)}%)")
+
+        pipeline = TranslationPipeline(
+            build_engines(tokenizer, model, glossary=glossary), max_workers=threads,
+            on_progress=log_progress, min_interval=5.0, min_step=0.05
+        )
+        translations = pipeline.run(unique)
+        if glossary:
+            term_flags = glossary.check(unique, translations)
+            logging.info(glossary.summary_text())
+    translate_time = time.monotonic() - translate_started
+
+    # Збереження кожного документа: перегляд рядків документа в таблиці унікальних сегментів (без копіювання)
+    segments = SegmentTable.from_translations(unique, translations, term_flags=term_flags or None)
+    translated_count = len(unique)
+    index = {para: i for i, para in enumerate(unique)}
+    documents = [(source, segments.take([index[p] for p in paragraphs])) for source, paragraphs in documents]
+    # Тексти й переклади тепер зберігає лише таблиця
+    del unique, translations, term_flags, index
+    outputs = {}
+    suffixes = output_suffixes(sources)
+    for source, document in documents:
+        try:
+            outputs[source] = save_outputs(
+                source, document, formats, output_dir=output_dir, name_suffix=suffixes[source]
+            )
+        except Exception as e:
+            failures[source] = str(e)
+            logging.error(f"Не вдалося зберегти переклад {source}: {e}")
+
+    elapsed = time.monotonic() - started
+    return {
+        "documents": len(sources),
+        "succeeded": len(outputs),
+        "failed": len(failures),
+        "failures": failures,
+        "outputs": outputs,
+        "segments_total": total_segments,
+        "segments_translated": translated_count,
+        "segments_deduplicated": total_segments - translated_count,
+        "extract_seconds": round(extract_time, 2),
+        "translate_seconds": round(translate_time, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "segments_per_second": round(total_segments / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def print_summary(summary):
+    print(f"Документів: {summary['documents']} (успішно: {summary['succeeded']}, помилок: {summary['failed']})")
+    print(
+        f"Сегментів: {summary['segments_total']}, перекладено: {summary['segments_translated']}, "
+        f"дедупліковано: {summary['segments_deduplicated']}"
+    )
+    print(
+        f"Час: {summary['elapsed_seconds']} с (витягнення {summary['extract_seconds']} с, "
+        f"переклад {summary['translate_seconds']} с), {summary['segments_per_second']} сегм./с"
+    )
+    for source, error in summary["failures"].items():
+        print(f"  ПОМИЛКА {source}: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетний переклад документів LegalTransUA.")
+    parser.add_argument("inputs", nargs="*", help="Каталоги, glob-шаблони, файли або URL.")
+    parser.add_argument("--url-list", help="Файл зі списком URL (по одному в рядку).")
+    parser.add_argument("--output-dir", default="output", help="Каталог для результатів.")
+    parser.add_argument("--processes", type=int, default=None, help="Кількість процесів для витягнення тексту.")
+    parser.add_argument("--threads", type=int, default=10, help="Кількість потоків для перекладу.")
+    parser.add_argument("--glossary", help="Глосарій обов'язкових термінів (CSV/TSV: термін, переклад).")
+    parser.add_argument("--formats", default="docx", help="Формати результату через кому: " + ", ".join(OUTPUT_FORMATS))
+    args = parser.parse_args(argv)
+
+    formats = args.formats.split(",")
+    if not set(formats) <= set(OUTPUT_FORMATS):
+        parser.error(f"Невідомий формат: {args.formats}. Доступні: {', '.join(OUTPUT_FORMATS)}")
+    sources = collect_sources(args.inputs, args.url_list)
+    if not sources:
+        parser.error("Не знайдено жодного документа для перекладу.")
+
+    summary = run_batch(sources, args.output_dir, args.processes, args.threads, args.glossary, formats)
+    print_summary(summary)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+import html
+import os
+import random
+
+import docx
+import fitz  # PyMuPDF
+
+# Зміна шаблонів або розмірів вимагає нової версії, інакше результати різних комітів не порівнянні
+CORPUS_VERSION = 1
+CORPUS_DIR = os.getenv("LTU_BENCH_CORPUS_DIR", os.path.join("data", "bench_corpus"))
+CORPUS_SIZES = {"small": 40, "medium": 400, "large": 2000}
+CORPUS_FORMATS = ("docx", "pdf", "html")
+PDF_LINES_PER_PAGE = 45
+
+_SUBJECTS = (
+    "The Member State concerned", "The competent authority", "The Commission", "The contracting party",
+    "The data controller", "Each Party", "The supervisory authority", "The applicant",
+)
+_VERBS = (
+    "shall notify", "shall ensure compliance with", "may request information from", "shall inform",
+    "shall adopt implementing acts concerning", "shall not be liable to", "shall submit a report to",
+)
+_OBJECTS = (
+    "the Agency", "the other Parties", "the national court", "the data subject", "the Council",
+    "the relevant market participants", "the European Parliament",
+)
+_CLAUSES = (
+    "in accordance with Article {article} of Regulation (EU) {year}/{number}",
+    "without undue delay and in any event within {days} days",
+    "where the conditions laid down in paragraph {paragraph} are met",
+    "subject to the exceptions referred to in Annex {annex}",
+    "as amended by Directive {year}/{number}/EU of {day} {month} {year}",
+    "unless otherwise provided for in this Agreement",
+)
+_MONTHS = ("January", "March", "April", "June", "September", "November", "December")
+_FILLERS = (
+    "Article {article}", "{day} {month} {year}", "{amount} EUR", "https://eur-lex.europa.eu/eli/reg/{year}/{number}/oj",
+    "Page {page}",
+)
+
+
+def _sentence(rng):
+    sentence = f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}"
+    for clause in rng.sample(_CLAUSES, rng.randint(1, 3)):
+        sentence += " " + clause
+    return _fill(sentence, rng) + "."
+
+
+def _fill(template, rng):
+    return template.format(
+        article=rng.randint(1, 99), year=rng.randint(1995, 2024), number=rng.randint(1, 2500),
+        days=rng.choice((15, 30, 60, 90)), paragraph=rng.randint(1, 9), annex=rng.choice(("I", "II", "III", "IV")),
+        day=rng.randint(1, 28), month=rng.choice(_MONTHS), amount=f"{rng.randint(1, 900)},{rng.randint(0, 999):03d}",
+        page=rng.randint(1, 400),
+    )
+
+
+def generate_paragraphs(count, seed=CORPUS_VERSION):
+    """Детермінований набір абзаців юридичного тексту: речення, короткі службові рядки й повтори."""
+    rng = random.Random(f"{seed}:{count}")
+    paragraphs = []
+    for idx in range(count):
+        roll = rng.random()
+        if roll < 0.1:
+            # Номери статей, дати, суми та URL — матеріал для швидкого шляху
+            paragraphs.append(_fill(rng.choice(_FILLERS), rng))
+        elif roll < 0.15 and paragraphs:
+            # Повтори стандартних формулювань, як у реальних договорах
+            paragraphs.append(rng.choice(paragraphs))
+        else:
+            paragraphs.append(" ".join(_sentence(rng) for _ in range(rng.randint(1, 4))))
+    return paragraphs
+
+
+def _write_docx(path, paragraphs):
+    doc = docx.Document()
+    for para in paragraphs:
+        doc.add_paragraph(para)
+    doc.save(path)
+
+
+def _write_pdf(path, paragraphs):
+    doc = fitz.open()
+    lines = [para[i:i + 90] for para in paragraphs for i in range(0, len(para), 90)]
+    for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+        page = doc.new_page()
+        page.insert_text((40, 50), "\n".join(lines[start:start + PDF_LINES_PER_PAGE]), fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def _write_html(path, paragraphs):
+    # Навігація й підвал перевіряють, що витягується лише основний текст
+    body = "\n".join(f"<p>{html.escape(para)}</p>" for para in paragraphs)
+    page = (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Regulation</title></head><body>"
+        "<nav><a href=\"/\">Home</a> <a href=\"/search\">Search</a> <a href=\"/help\">Help</a></nav>"
+        f"<main><article><h1>Regulation</h1>{body}</article></main>"
+        "<footer><p>© European Union. Cookie policy. Legal notice.</p></footer></body></html>"
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(page)
+
+
+_WRITERS = {"docx": _write_docx, "pdf": _write_pdf, "html": _write_html}
+
+
+def corpus_path(size, fmt, directory=CORPUS_DIR):
+    return os.path.join(directory, f"v{CORPUS_VERSION}", f"{size}.{fmt}")
+
+
+def ensure_corpus(sizes=tuple(CORPUS_SIZES), formats=CORPUS_FORMATS, directory=CORPUS_DIR):
+    """Створює відсутні файли корпусу поточної версії; повертає {(розмір, формат): шлях}."""
+    os.makedirs(os.path.join(directory, f"v{CORPUS_VERSION}"), exist_ok=True)
+    paths = {}
+    for size in sizes:
+        paragraphs = None
+        for fmt in formats:
+            path = corpus_path(size, fmt, directory)
+            if not os.path.exists(path):
+                paragraphs = paragraphs or generate_paragraphs(CORPUS_SIZES[size])
+                _WRITERS[fmt](path + ".tmp", paragraphs)
+                os.replace(path + ".tmp", path)
+            paths[size, fmt] = path
+    return paths
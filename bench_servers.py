@@ -0,0 +1,225 @@
+import html
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from zlib import crc32
+
+STAND_IN_PREFIX = "[uk] "
+
+
+class StandInConfig:
+    """Поведінка заглушки рушія: затримка (середня ± розкид), частка помилок 500 і обмеження швидкості.
+
+    throttle_rps — скільки запитів на секунду приймається; решта отримує 429, як у справжніх API.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, throttle_rps=0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class _StandInState:
+    """Лічильники й генератор випадковостей, спільні для всіх потоків сервера."""
+
+    def __init__(self, config):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self._tokens = float(config.throttle_rps)
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Повертає (статус, затримка) для чергового запиту."""
+        config = self.config
+        with self._lock:
+            self.requests += 1
+            if config.throttle_rps:
+                now = time.monotonic()
+                self._tokens = min(config.throttle_rps, self._tokens + (now - self._refilled) * config.throttle_rps)
+                self._refilled = now
+                if self._tokens < 1:
+                    self.throttled += 1
+                    return 429, 0.0
+                self._tokens -= 1
+            delay = max(0.0, self.random.gauss(config.latency, config.jitter)) if config.jitter else config.latency
+            if self.random.random() < config.error_rate:
+                self.errors += 1
+                return 500, delay
+        return 200, delay
+
+
+def stand_in_translation(text):
+    """Детермінований «переклад» заглушок: відрізняється від оригіналу, тож рушії не вважають його копією."""
+    return STAND_IN_PREFIX + text
+
+
+class StandInMarianTokenizer:
+    """Замінник токенізатора MarianMT: слова замість subword-токенів, без завантаження моделі."""
+
+    def __call__(self, texts, **kwargs):
+        return {"input_ids": [text.split() for text in texts]}
+
+    def batch_decode(self, sequences, skip_special_tokens=True):
+        return [stand_in_translation(" ".join(tokens)) for tokens in sequences]
+
+
+class StandInGenerateOutput:
+    """Відповідь generate(..., return_dict_in_generate=True): послідовності й log-ймовірність кожної."""
+
+    def __init__(self, sequences, sequences_scores):
+        self.sequences = sequences
+        self.sequences_scores = sequences_scores
+
+
+class StandInMarianModel:
+    """Замінник MarianMT із фіксованою затримкою на токен, що імітує generate().
+
+    low_confidence_rate — частка сегментів (детерміновано за текстом) з низькою впевненістю,
+    які каскад передає OpenAI; решта має високу впевненість.
+    """
+
+    def __init__(self, seconds_per_token=0.0005, low_confidence_rate=0.25):
+        self.seconds_per_token = seconds_per_token
+        self.low_confidence_rate = low_confidence_rate
+
+    def _score(self, tokens):
+        # crc32, а не hash(): частка ескалацій має бути однаковою в усіх процесах і запусках
+        low = crc32(" ".join(tokens).encode("utf-8")) % 1000 < self.low_confidence_rate * 1000
+        return math.log(0.2 if low else 0.9)
+
+    def generate(self, input_ids, return_dict_in_generate=False, **kwargs):
+        time.sleep(self.seconds_per_token * sum(len(tokens) for tokens in input_ids))
+        if return_dict_in_generate:
+            return StandInGenerateOutput(input_ids, [self._score(tokens) for tokens in input_ids])
+        return input_ids
+
+
+def stand_in_marian():
+    """Пара (токенізатор, модель) із тим самим інтерфейсом, що й load_marian_model()."""
+    return StandInMarianTokenizer(), StandInMarianModel()
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+    corpus_dir = None
+
+    def _reply(self, status, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _admit(self):
+        status, delay = self.state.admit()
+        time.sleep(delay)
+        if status != 200:
+            self._reply(status, json.dumps({"error": {"message": "stand-in failure"}}), "application/json")
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith("/corpus/") and self.corpus_dir:
+            # Сторінки корпусу віддаються без затримки, щоб вимірювати лише витягнення тексту
+            path = os.path.join(self.corpus_dir, os.path.basename(url.path))
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._reply(200, f.read(), "text/html; charset=utf-8")
+            except OSError:
+                self._reply(404, "", "text/plain")
+            return
+        if url.path != "/m":
+            self._reply(404, "", "text/plain")
+            return
+        # Мобільна сторінка Google Translate, яку розбирає deep_translator
+        text = parse_qs(url.query).get("q", [""])[0]
+        if self._admit():
+            body = f'<html><body><div class="result-container">{html.escape(stand_in_translation(text))}</div></body></html>'
+            self._reply(200, body, "text/html; charset=utf-8")
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/v1/chat/completions":
+            self._reply(404, "", "text/plain")
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        text = request.get("messages", [{}])[-1].get("content", "")
+        if not self._admit():
+            return
+        prompt_tokens = sum(len(message.get("content", "").split()) for message in request.get("messages", []))
+        completion = stand_in_translation(text)
+        self._reply(200, json.dumps({
+            "id": "chatcmpl-standin",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-3.5-turbo"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": completion}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(completion.split()),
+                "total_tokens": prompt_tokens + len(completion.split()),
+            },
+        }), "application/json")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer:
+    """Локальний HTTP-сервер, що імітує API Google Translate (/m) та OpenAI (/v1/chat/completions).
+
+    Додатково віддає HTML-файли корпусу за адресою /corpus/<ім'я>.
+    """
+
+    def __init__(self, config=None, corpus_dir=None, host="127.0.0.1", port=0):
+        self.config = config or StandInConfig()
+        self.state = _StandInState(self.config)
+        handler = type("Handler", (_StandInHandler,), {"state": self.state, "corpus_dir": corpus_dir})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self):
+        """Змінні середовища, що спрямовують рушії на цей сервер."""
+        return {
+            "LTU_GOOGLE_TRANSLATE_URL": f"{self.url}/m",
+            "OPENAI_API_BASE": f"{self.url}/v1",
+            "OPENAI_API_KEY": "stand-in",
+            "LTU_MARIAN_STAND_IN": "1",
+        }
+
+    def stats(self):
+        return {"requests": self.state.requests, "errors": self.state.errors, "throttled": self.state.throttled}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stand-in", daemon=True)
+        self._thread.start()
+        logging.info(f"Заглушки рушіїв: {self.url} ({self.config.to_dict()})")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
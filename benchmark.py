@@ -0,0 +1,250 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from bench_corpus import CORPUS_FORMATS, CORPUS_SIZES, CORPUS_VERSION, ensure_corpus
+from bench_servers import StandInConfig, StandInServer, stand_in_translation
+
+RESULTS_PATH = os.getenv("LTU_BENCH_RESULTS", os.path.join("data", "benchmarks", "results.jsonl"))
+SCENARIOS = ("extract", "google", "marian", "openai", "cascade", "render", "export", "e2e")
+# Сповільнення понад цю частку від базового коміту вважається регресією
+REGRESSION_THRESHOLD = 0.10
+
+
+def _peak_rss_mb():
+    # ru_maxrss у Linux — кілобайти
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _extract(fmt, path, corpus_url):
+    from pdf_extract import extract_pdf_lines
+    from translate_script import extract_text
+    if fmt == "pdf":
+        return [line for _, line in extract_pdf_lines(path)]
+    if fmt == "html":
+        return extract_text(f"{corpus_url}/corpus/{os.path.basename(path)}")
+    return extract_text(path)
+
+
+def run_scenario(scenario, fmt, size, path, corpus_url, max_workers=10):
+    """Виконує один сценарій в окремому процесі й повертає виміри (пік RSS — саме цього сценарію)."""
+    # Імпорт тут: адреси заглушок мають потрапити в середовище до імпорту openai і translate_script
+    from exporters import EXPORTERS, export_segments
+    from metrics import JobTimings, stage
+    from pipeline import ERROR_TEXT, TranslationPipeline
+    from segments import SegmentTable
+    from translate_script import (
+        ENGINE_LABELS, build_cascade_pipeline, build_engines, load_marian_model, save_translation_document
+    )
+
+    logging.getLogger().setLevel(logging.WARNING)
+    tokenizer, model = load_marian_model()
+    rss_before = _peak_rss_mb()
+    output_dir = tempfile.mkdtemp(prefix="ltu-bench-")
+
+    started = time.monotonic()
+    with JobTimings() as timings:
+        if scenario in ("google", "marian", "openai", "cascade", "render", "export"):
+            # Витягнення — підготовка, а не предмет вимірювання цих сценаріїв
+            paragraphs = _extract(fmt, path, corpus_url)
+            started = time.monotonic()
+        else:
+            with stage("extract"):
+                paragraphs = _extract(fmt, path, corpus_url)
+
+        if scenario in ("google", "marian", "openai", "e2e"):
+            disabled = [name for name in ENGINE_LABELS if scenario != "e2e" and name != scenario]
+            with stage("translate"):
+                pipeline = TranslationPipeline(
+                    build_engines(tokenizer, model, disabled=disabled), max_workers=max_workers
+                )
+                translations = pipeline.run(paragraphs)
+        elif scenario == "cascade":
+            # Google і MarianMT для всіх абзаців, OpenAI — лише для тих, де заглушка MarianMT не впевнена
+            with stage("translate"):
+                pipeline = build_cascade_pipeline(tokenizer, model, max_workers=max_workers)
+                translations = pipeline.run(paragraphs)
+        else:
+            translations = {name: [stand_in_translation(para) for para in paragraphs] for name in ENGINE_LABELS}
+
+        if scenario in ("render", "e2e"):
+            save_translation_document(
+                path, SegmentTable.from_translations(paragraphs, translations), output_dir=output_dir
+            )
+        if scenario == "export":
+            # Кожен формат — окремим етапом, щоб порівнювати їх між собою і з render (DOCX)
+            segments = SegmentTable.from_translations(paragraphs, translations)
+            for fmt, exporter in EXPORTERS.items():
+                with stage(f"export_{fmt}"):
+                    export_segments(segments, fmt, os.path.join(output_dir, f"{size}{exporter.extension}"))
+    seconds = time.monotonic() - started
+
+    chars = sum(len(para) for para in paragraphs)
+    result = {
+        "scenario": scenario,
+        "format": fmt,
+        "size": size,
+        "segments": len(paragraphs),
+        "chars": chars,
+        "seconds": round(seconds, 4),
+        "segments_per_sec": round(len(paragraphs) / seconds, 2) if seconds else None,
+        "chars_per_sec": round(chars / seconds, 1) if seconds else None,
+        "stages": {name: round(value, 4) for name, value in timings.stages.items()},
+        "engine_seconds": {name: round(total, 4) for name, (total, _) in timings.engines.items()},
+        "errors": sum(text == ERROR_TEXT for column in translations.values() for text in column),
+        "rss_baseline_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    if scenario == "cascade":
+        result["openai_calls"] = pipeline.summary["openai_calls"]
+    return result
+
+
+def git_revision():
+    """Короткий хеш поточного коміту й ознака незакомічених змін у відстежуваних файлах."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, dirty
+
+
+def run_benchmarks(scenarios=SCENARIOS, sizes=("small", "medium"), formats=CORPUS_FORMATS, config=None,
+                   real_marian=False, max_workers=10, results_path=RESULTS_PATH, replay=None, time_scale=1.0):
+    """Запускає всі комбінації сценаріїв, розмірів і форматів; дописує результати в results_path.
+
+    replay — запис викликів рушіїв (replay.EngineRecorder): рушії відповідають записаними відповідями
+    з записаною затримкою, помноженою на time_scale, замість заглушок.
+    """
+    paths = ensure_corpus(sizes, formats)
+    commit, dirty = git_revision()
+    run = {
+        "run_id": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        "commit": commit,
+        "dirty": dirty,
+        "corpus_version": CORPUS_VERSION,
+        "real_marian": real_marian,
+        "replay": replay,
+    }
+    results = []
+    with StandInServer(config, corpus_dir=os.path.dirname(next(iter(paths.values())))) as server:
+        os.environ.update(server.environment())
+        if real_marian:
+            os.environ.pop("LTU_MARIAN_STAND_IN")
+        if replay:
+            os.environ.update(LTU_ENGINE_REPLAY=replay, LTU_REPLAY_TIME_SCALE=str(time_scale))
+        # Кожен сценарій — у свіжому процесі (spawn): чистий пік RSS і незалежні запобіжники рушіїв
+        context = multiprocessing.get_context("spawn")
+        for scenario in scenarios:
+            for size in sizes:
+                for fmt in formats:
+                    before = server.stats()
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        result = executor.submit(
+                            run_scenario, scenario, fmt, size, paths[size, fmt], server.url, max_workers
+                        ).result()
+                    after = server.stats()
+                    result["server"] = {key: after[key] - before[key] for key in after}
+                    result.update(run, stand_in=server.config.to_dict())
+                    results.append(result)
+                    logging.info(
+                        f"{scenario}/{fmt}/{size}: {result['seconds']:.2f} с, "
+                        f"{result['segments_per_sec']} сегм./с, пік RSS {result['peak_rss_mb']} МБ"
+                    )
+
+    os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+    with open(results_path, "a", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return results
+
+
+def load_results(results_path=RESULTS_PATH, commit=None):
+    """Результати останнього запуску (для commit — останнього запуску на цьому коміті)."""
+    try:
+        with open(results_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+    if commit:
+        records = [record for record in records if record.get("commit") and commit.startswith(record["commit"])]
+    if not records:
+        return []
+    last_run = records[-1]["run_id"]
+    return [record for record in records if record["run_id"] == last_run]
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Порівнює тривалість однакових сценаріїв; повертає [(ключ, база, зараз, зміна, регресія)]."""
+    base = {(r["scenario"], r["format"], r["size"]): r for r in baseline if r["corpus_version"] == CORPUS_VERSION}
+    rows = []
+    for record in current:
+        key = (record["scenario"], record["format"], record["size"])
+        if key not in base or not base[key]["seconds"]:
+            continue
+        change = record["seconds"] / base[key]["seconds"] - 1
+        rows.append((key, base[key]["seconds"], record["seconds"], change, change > threshold))
+    return rows
+
+
+def print_results(results, comparison=None):
+    print(f"{'Сценарій':<24}{'с':>9}{'сегм./с':>10}{'пік RSS, МБ':>13}  Етапи")
+    for result in results:
+        stages = ", ".join(f"{name} {seconds:.2f}" for name, seconds in result["stages"].items())
+        print(
+            f"{result['scenario'] + '/' + result['format'] + '/' + result['size']:<24}{result['seconds']:>9.2f}"
+            f"{result['segments_per_sec'] or 0:>10.1f}{result['peak_rss_mb']:>13.1f}  {stages}"
+        )
+    if comparison:
+        print("\nПорівняння з базовим комітом:")
+        for key, base, current, change, regression in comparison:
+            mark = "  РЕГРЕСІЯ" if regression else ""
+            print(f"{'/'.join(key):<24}{base:>9.2f} → {current:.2f} с ({change:+.0%}){mark}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк LegalTransUA на синтетичному корпусі.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Через кому: " + ", ".join(SCENARIOS))
+    parser.add_argument("--sizes", default="small,medium", help="Через кому: " + ", ".join(CORPUS_SIZES))
+    parser.add_argument("--formats", default=",".join(CORPUS_FORMATS))
+    parser.add_argument("--latency", type=float, default=0.05, help="Середня затримка заглушок рушіїв, с.")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Розкид затримки, с.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Частка відповідей 500.")
+    parser.add_argument("--throttle-rps", type=float, default=0, help="Ліміт запитів на секунду (понад — 429).")
+    parser.add_argument("--threads", type=int, default=10, help="Кількість потоків конвеєра.")
+    parser.add_argument("--real-marian", action="store_true", help="Справжня модель MarianMT замість заглушки.")
+    parser.add_argument("--replay", help="Відтворювати записані виклики рушіїв (LTU_ENGINE_RECORD).")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Множник записаних затримок.")
+    parser.add_argument("--baseline", help="Коміт, з результатами якого порівняти цей запуск.")
+    parser.add_argument("--results", default=RESULTS_PATH)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    config = StandInConfig(args.latency, args.jitter, args.error_rate, args.throttle_rps)
+    # Базу читаємо до запуску, інакше на тому самому коміті вона збіглася б із новими результатами
+    baseline = load_results(args.results, args.baseline) if args.baseline else None
+    results = run_benchmarks(
+        args.scenarios.split(","), args.sizes.split(","), args.formats.split(","), config,
+        real_marian=args.real_marian, max_workers=args.threads, results_path=args.results,
+        replay=args.replay, time_scale=args.time_scale
+    )
+    comparison = compare_results(baseline, results) if baseline else None
+    print_results(results, comparison)
+    return 1 if comparison and any(row[-1] for row in comparison) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
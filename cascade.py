@@ -0,0 +1,88 @@
+import logging
+import math
+
+from pipeline import ERROR_TEXT, TranslationPipeline
+from similarity import chrf
+
+# Маршрути рядків у таблиці перекладів
+ROUTE_CHEAP = "G+M"
+ROUTE_ESCALATED = "G+M→O"
+ROUTE_LEGEND = f"Маршрут: {ROUTE_CHEAP} — Google і MarianMT узгоджені, OpenAI не викликався; {ROUTE_ESCALATED} — переклад OpenAI."
+SKIPPED_TEXT = "— (не знадобився: Google і MarianMT узгоджені)"
+
+
+class CascadePipeline:
+    """Каскадний режим: спершу Google і MarianMT, OpenAI — лише для складних абзаців.
+
+    Абзац вважається «легким», якщо chrF між Google і MarianMT не нижчий за agreement_threshold,
+    а середня ймовірність токена MarianMT не нижча за confidence_threshold.
+    Має той самий інтерфейс, що й TranslationPipeline (engines, run).
+    """
+
+    def __init__(self, engines, marian_scored, max_workers=5, on_progress=None,
+                 agreement_threshold=0.55, confidence_threshold=0.5):
+        self.engines = engines
+        self.marian_scored = marian_scored
+        self.max_workers = max_workers
+        self.on_progress = on_progress
+        self.agreement_threshold = agreement_threshold
+        self.confidence_threshold = confidence_threshold
+        self.routes = {}
+        self.summary = {"segments": 0, "openai_calls": 0, "openai_calls_saved": 0}
+
+    def is_easy(self, google_text, marian_text, marian_score):
+        if ERROR_TEXT in (google_text, marian_text) or marian_score is None:
+            return False
+        if math.exp(marian_score) < self.confidence_threshold:
+            return False
+        return chrf(google_text, marian_text) >= self.agreement_threshold
+
+    def run(self, paragraphs):
+        """Перекладає абзаци каскадом і повертає {назва: список перекладів}."""
+        scores = {}
+
+        def marian(text):
+            translated, score = self.marian_scored(text)
+            scores[text] = score
+            return translated
+
+        first_stage = TranslationPipeline(
+            {"google": self.engines["google"], "marian": marian},
+            max_workers=self.max_workers, on_progress=self.on_progress,
+        ).run(paragraphs)
+
+        hard = []
+        for idx, para in enumerate(paragraphs):
+            if self.is_easy(first_stage["google"][idx], first_stage["marian"][idx], scores.get(para)):
+                self.routes[para] = ROUTE_CHEAP
+            else:
+                self.routes[para] = ROUTE_ESCALATED
+                hard.append(idx)
+
+        openai_translations = [SKIPPED_TEXT] * len(paragraphs)
+        if hard:
+            second_stage = TranslationPipeline(
+                {"openai": self.engines["openai"]},
+                max_workers=self.max_workers, on_progress=self.on_progress,
+            ).run([paragraphs[idx] for idx in hard])
+            for pos, idx in enumerate(hard):
+                openai_translations[idx] = second_stage["openai"][pos]
+        elif self.on_progress and paragraphs:
+            self.on_progress("openai", len(paragraphs), len(paragraphs))
+
+        self.summary["segments"] += len(paragraphs)
+        self.summary["openai_calls"] += len(hard)
+        self.summary["openai_calls_saved"] += len(paragraphs) - len(hard)
+        logging.info(
+            f"Каскад: OpenAI викликано для {len(hard)} з {len(paragraphs)} абзаців, "
+            f"заощаджено викликів: {len(paragraphs) - len(hard)}"
+        )
+
+        return {
+            "google": first_stage["google"],
+            "marian": first_stage["marian"],
+            "openai": openai_translations,
+        }
+
+    def summary_text(self):
+        return f"{ROUTE_LEGEND} Заощаджено викликів OpenAI: {self.summary['openai_calls_saved']}"
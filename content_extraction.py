@@ -0,0 +1,147 @@
+import re
+from urllib.parse import urlparse
+
+from lxml import etree, html
+
+# Блокові елементи, текст яких стає окремим абзацом (у порядку документа)
+BLOCK_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "dt", "dd", "blockquote", "pre", "td", "th", "caption"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+CONTAINER_TAGS = {"div", "article", "main", "section", "td", "body"}
+
+# Елементи, що ніколи не містять основного тексту
+DROP_TAGS = ["script", "style", "noscript", "template", "nav", "footer", "aside", "form", "iframe", "svg", "button",
+             "select", "input", "label"]
+# Шукається в кожному токені id, class і role окремо як ціла частина між дефісами чи підкресленнями,
+# тож «shareholders» чи «menu-item-article» не вважаються службовими
+BOILERPLATE_PATTERN = re.compile(
+    r"(?:^|[-_])(?:cookies?|gdpr|banner|navbar|nav|breadcrumbs?|footer|sidebar|social|skip-?links?|popup|modal|"
+    r"newsletter|subscribe|advert|promo|toolbar|share-?(?:buttons|links|bar)|language-?(?:list|selector|switch))"
+    r"(?:$|[-_])",
+    re.IGNORECASE,
+)
+
+# Основний контейнер тексту на правових порталах (перший знайдений XPath виграє)
+SITE_RULES = {
+    "eur-lex.europa.eu": [
+        "//div[@id='document1']", "//div[@id='textTabContent']", "//div[contains(@class, 'eli-container')]",
+        "//div[@id='text']",
+    ],
+    "zakon.rada.gov.ua": ["//div[@id='article']", "//div[contains(@class, 'rvps')]/..", "//div[@id='page']"],
+    "legislation.gov.uk": ["//div[@id='viewLegContents']", "//div[@id='content']"],
+    "curia.europa.eu": ["//div[@id='document_content']", "//div[contains(@class, 'tab_document')]"],
+}
+
+MIN_BLOCK_CHARS = 25
+# Змінюється разом із правилами витягнення, щоб кешовані абзаци сторінок перераховувались
+EXTRACTOR_VERSION = 2
+
+
+def _text_length(element):
+    return len(" ".join("".join(element.itertext()).split()))
+
+
+def _link_density(element):
+    total = _text_length(element)
+    if not total:
+        return 0.0
+    return sum(_text_length(link) for link in element.iter("a")) / total
+
+
+def _is_boilerplate(element):
+    marker = f"{element.get('id', '')} {element.get('class', '')} {element.get('role', '')}"
+    return any(BOILERPLATE_PATTERN.search(token) for token in marker.split())
+
+
+def _drop_boilerplate(container):
+    """Видаляє службові елементи всередині обраного контейнера за id, class і role: банери cookie, підвали.
+
+    Сам контейнер і його предки не видаляються — класи обгорток макета («with-sidebar») його не зачіпають.
+    """
+    for element in list(container.iter(etree.Element)):
+        if element is container or element.tag in ("html", "body"):
+            continue
+        if _is_boilerplate(element):
+            element.drop_tree()
+
+
+def _site_container(root, url):
+    host = (urlparse(url).hostname or "") if url else ""
+    for domain, xpaths in SITE_RULES.items():
+        if host == domain or host.endswith("." + domain):
+            for xpath in xpaths:
+                found = root.xpath(xpath)
+                if found:
+                    return found[0]
+    return None
+
+
+def _best_container(root):
+    """Контейнер з найбільшою кількістю тексту в абзацах з урахуванням щільності посилань."""
+    scores = {}
+    for block in root.iter("p", "li", "pre", "blockquote", "td", "dd"):
+        length = _text_length(block)
+        if length < MIN_BLOCK_CHARS:
+            continue
+        score = (1 + min(length / 100, 3)) * (1 - _link_density(block))
+        parent = block.getparent()
+        for weight in (1.0, 0.5, 0.25):
+            if parent is None:
+                break
+            if parent.tag in CONTAINER_TAGS:
+                scores[parent] = scores.get(parent, 0.0) + score * weight
+            parent = parent.getparent()
+    if not scores:
+        return root.find("body") if root.find("body") is not None else root
+    return max(scores, key=lambda element: scores[element] * (1 - _link_density(element)))
+
+
+def _own_text(element):
+    """Текст елемента без вкладених блокових елементів (вони стають окремими абзацами)."""
+    parts = [element.text or ""]
+    for child in element:
+        if not isinstance(child.tag, str) or child.tag not in BLOCK_TAGS:
+            parts.append(_own_text(child) if isinstance(child.tag, str) else "")
+        parts.append(child.tail or "")
+    return " ".join("".join(parts).split())
+
+
+def _iter_blocks(container):
+    for element in container.iter(*BLOCK_TAGS):
+        text = _own_text(element)
+        if not text:
+            continue
+        if element.tag not in HEADING_TAGS and len(text) < MIN_BLOCK_CHARS and _link_density(element) > 0.5:
+            continue
+        yield text
+
+
+def html_parser(encoding=None):
+    """Парсер lxml.html, якому можна подавати сторінку частинами (feed/close) під час завантаження."""
+    return html.HTMLParser(encoding=encoding, remove_comments=True)
+
+
+def extract_main_content(content, url=None):
+    """Повертає абзаци основного тексту сторінки: заголовки, абзаци, пункти списків у порядку документа.
+
+    Меню, банери cookie та підвали відкидаються; для правових порталів основний контейнер задано правилами
+    SITE_RULES, для інших сайтів він обирається за щільністю тексту й посилань.
+    """
+    if not content or not content.strip():
+        return []
+    return extract_from_tree(html.fromstring(content), url)
+
+
+def extract_from_tree(root, url=None):
+    """Як extract_main_content, але для вже розібраного дерева (наприклад, із html_parser)."""
+    etree.strip_elements(root, etree.Comment, *DROP_TAGS, with_tail=False)
+    # Службові елементи чистяться лише всередині обраного контейнера, щоб класи предків не зачепили основний текст
+    container = _site_container(root, url)
+    if container is None:
+        container = _best_container(root)
+    _drop_boilerplate(container)
+
+    paragraphs = list(_iter_blocks(container))
+    if not paragraphs:
+        # Сторінка без розмітки абзаців — беремо весь видимий текст
+        paragraphs = [line.strip() for line in container.text_content().splitlines() if line.strip()]
+    return paragraphs
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from urllib.parse import urldefrag, urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+from lxml import etree, html
+
+from content_extraction import extract_from_tree
+from exporters import EXPORTERS
+from fetch import (
+    CONNECT_TIMEOUT, MAX_BODY_BYTES, READ_TIMEOUT, USER_AGENT, FetchError, HttpCache, conditional_headers
+)
+
+# Ввічливість до порталів: не більше двох одночасних запитів і секунда між запитами до одного хоста
+HOST_CONCURRENCY = 2
+HOST_DELAY = 1.0
+
+
+class HostLimiter:
+    """Обмежує кількість одночасних запитів і інтервал між запитами до кожного хоста."""
+
+    def __init__(self, concurrency=HOST_CONCURRENCY, delay=HOST_DELAY):
+        self.concurrency = concurrency
+        self.delay = delay
+        self._semaphores = {}
+        self._locks = {}
+        self._next_allowed = {}
+
+    async def acquire(self, host):
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.concurrency))
+        await semaphore.acquire()
+        async with self._locks.setdefault(host, asyncio.Lock()):
+            wait = self._next_allowed.get(host, 0.0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_allowed[host] = time.monotonic() + self.delay
+
+    def release(self, host):
+        self._semaphores[host].release()
+
+
+class Crawler:
+    """Асинхронне завантаження списку сторінок або розділу сайту з обмеженням глибини.
+
+    Посилання переходять лише в межах хоста початкової сторінки й (якщо задано) за шаблоном link_pattern.
+    Сторінки з однаковим витягнутим текстом (дзеркала, параметри в URL) залишаються в одному примірнику.
+    """
+
+    def __init__(self, link_pattern=None, max_depth=0, max_pages=200, concurrency=8,
+                 host_concurrency=HOST_CONCURRENCY, host_delay=HOST_DELAY, cache=None, respect_robots=True):
+        self.link_pattern = re.compile(link_pattern) if link_pattern else None
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.limiter = HostLimiter(host_concurrency, host_delay)
+        self.cache = cache or HttpCache()
+        self.respect_robots = respect_robots
+        self.pages = []
+        self.duplicates = {}
+        self.failures = {}
+        self._robots = {}
+        self._robots_locks = {}
+        self._content_hashes = {}
+
+    async def _read_body(self, response, url):
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise FetchError(f"Сторінка більша за {MAX_BODY_BYTES} байт: {url}")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def _allowed(self, session, url):
+        if not self.respect_robots:
+            return True
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        # robots.txt завантажується один раз на хост, навіть якщо сторінки хоста обходяться паралельно
+        async with self._robots_locks.setdefault(origin, asyncio.Lock()):
+            if origin not in self._robots:
+                robots = RobotFileParser()
+                # Запит robots.txt теж підпадає під обмеження хоста
+                host = parsed.hostname or ""
+                await self.limiter.acquire(host)
+                try:
+                    async with session.get(f"{origin}/robots.txt") as response:
+                        lines = (await response.text(errors="replace")).splitlines() if response.status == 200 else []
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    lines = []
+                finally:
+                    self.limiter.release(host)
+                robots.parse(lines)
+                self._robots[origin] = robots
+        return self._robots[origin].can_fetch(USER_AGENT, url)
+
+    async def _fetch(self, session, url):
+        """Повертає тіло сторінки; за наявності в кеші надсилає умовний запит (ETag/Last-Modified).
+
+        Якщо сервер відповів 304, а тіла в кеші вже немає, сторінка запитується ще раз без умовних заголовків.
+        """
+        entry = self.cache.get(url)
+        host = urlparse(url).hostname or ""
+        for headers in (conditional_headers(entry), {}) if entry else ({},):
+            await self.limiter.acquire(host)
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304 and headers:
+                        body = self.cache.body(url)
+                        if body is not None:
+                            return body
+                        logging.info(f"Обхід: тіла сторінки немає в кеші, повторний запит без умови: {url}")
+                        continue
+                    if response.status != 200:
+                        raise FetchError(f"Не вдалося завантажити сторінку ({response.status}): {url}")
+                    body = await self._read_body(response, url)
+                    if response.headers.get("ETag") or response.headers.get("Last-Modified"):
+                        self.cache.put(url, {
+                            "url": url,
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                        }, body)
+                    return body
+            finally:
+                self.limiter.release(host)
+
+    def _parse(self, body, url, follow_links):
+        """Витягує абзаци й посилання (виконується в пулі потоків, щоб не блокувати цикл подій)."""
+        if not body or not body.strip():
+            return [], []
+        root = html.fromstring(body)
+        links = []
+        if follow_links:
+            host = urlparse(url).hostname
+            for href in root.xpath("//a/@href"):
+                link = urldefrag(urljoin(url, href.strip()))[0]
+                parsed = urlparse(link)
+                if parsed.scheme not in ("http", "https") or parsed.hostname != host:
+                    continue
+                if self.link_pattern and not self.link_pattern.search(link):
+                    continue
+                links.append(link)
+        return extract_from_tree(root, url), links
+
+    async def _visit(self, session, semaphore, url, depth):
+        async with semaphore:
+            try:
+                if not await self._allowed(session, url):
+                    raise FetchError(f"Заборонено robots.txt: {url}")
+                body = await self._fetch(session, url)
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, self._parse, body, url, depth < self.max_depth
+                )
+            # Бінарні чи зіпсовані тіла під виглядом HTML (ParserError) — збій лише цієї сторінки, а не обходу
+            except (FetchError, aiohttp.ClientError, asyncio.TimeoutError, ValueError, etree.LxmlError) as e:
+                self.failures[url] = str(e) or type(e).__name__
+                logging.warning(f"Обхід: {url}: {self.failures[url]}")
+                return None
+
+    def _record(self, url, paragraphs):
+        digest = hashlib.blake2b("\n".join(paragraphs).encode("utf-8"), digest_size=16).hexdigest()
+        if digest in self._content_hashes:
+            self.duplicates[url] = self._content_hashes[digest]
+            return
+        self._content_hashes[digest] = url
+        self.pages.append((url, paragraphs))
+
+    async def crawl(self, urls):
+        """Обходить сторінки рівнями (у порядку виявлення) і повертає [(url, абзаци)]."""
+        timeout = aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        seen = set()
+        frontier = []
+        for url in urls:
+            url = urldefrag(url.strip())[0]
+            if url and url not in seen:
+                seen.add(url)
+                frontier.append(url)
+
+        started = time.monotonic()
+        async with aiohttp.ClientSession(timeout=timeout, headers={"User-Agent": USER_AGENT}) as session:
+            depth = 0
+            visited = 0
+            while frontier and visited < self.max_pages:
+                frontier = frontier[:self.max_pages - visited]
+                visited += len(frontier)
+                results = await asyncio.gather(*(self._visit(session, semaphore, url, depth) for url in frontier))
+                next_frontier = []
+                for url, result in zip(frontier, results):
+                    if result is None:
+                        continue
+                    paragraphs, links = result
+                    if paragraphs:
+                        self._record(url, paragraphs)
+                    for link in links:
+                        if link not in seen:
+                            seen.add(link)
+                            next_frontier.append(link)
+                frontier = next_frontier
+                depth += 1
+
+        logging.info(
+            f"Обхід: сторінок {len(self.pages)}, дублікатів {len(self.duplicates)}, помилок {len(self.failures)} "
+            f"за {time.monotonic() - started:.1f} с"
+        )
+        return self.pages
+
+
+def crawl_urls(urls, **options):
+    """Синхронна обгортка над Crawler.crawl; повертає обхідник із результатами (pages, duplicates, failures)."""
+    crawler = Crawler(**options)
+    asyncio.run(crawler.crawl(urls))
+    return crawler
+
+
+def combine_pages(pages):
+    """Поєднує сторінки в одне завдання: URL сторінки окремим рядком перед її абзацами."""
+    paragraphs = []
+    for url, page_paragraphs in pages:
+        paragraphs.append(url)
+        paragraphs.extend(page_paragraphs)
+    return paragraphs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Переклад кількох сторінок або розділу сайту одним документом.")
+    parser.add_argument("urls", nargs="*", help="Початкові URL.")
+    parser.add_argument("--url-list", help="Файл зі списком URL (по одному в рядку).")
+    parser.add_argument("--pattern", help="Регулярний вираз для посилань, за якими переходити.")
+    parser.add_argument("--depth", type=int, default=0, help="Глибина переходу за посиланнями (0 — лише задані URL).")
+    parser.add_argument("--max-pages", type=int, default=200)
+    parser.add_argument("--host-delay", type=float, default=HOST_DELAY, help="Пауза між запитами до хоста, с.")
+    parser.add_argument("--output-dir", default="output")
+    parser.add_argument("--formats", default="docx", help="Формати результату через кому (docx, parquet, tmx, xliff, csv).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    urls = list(args.urls)
+    if args.url_list:
+        with open(args.url_list, encoding="utf-8") as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not urls:
+        parser.error("Не задано жодного URL.")
+    formats = args.formats.split(",")
+    # Перевірка до обходу: таблиця DOCX і формати експортерів (як OUTPUT_FORMATS у translate_script)
+    if not set(formats) <= {"docx", *EXPORTERS}:
+        parser.error(f"Невідомий формат: {args.formats}. Доступні: docx, {', '.join(EXPORTERS)}")
+
+    crawler = crawl_urls(
+        urls, link_pattern=args.pattern, max_depth=args.depth, max_pages=args.max_pages, host_delay=args.host_delay
+    )
+    if not crawler.pages:
+        logging.error("Не вдалося витягти текст із жодної сторінки.")
+        return 1
+
+    # Імпорт тут, щоб обхід працював без завантаження моделей перекладу
+    from translate_script import process_document
+    process_document(urls[0], paragraphs=combine_pages(crawler.pages), output_dir=args.output_dir,
+                     fast_path=True, formats=formats)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
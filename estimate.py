@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from pipeline import DISABLED_TEXT, ENGINES, ERROR_TEXT
+from placeholders import mask_text
+from segment_filter import ROUTE_COPY, classify_segment
+
+try:
+    import tiktoken
+except ImportError:  # Лічильник токенів OpenAI необов'язковий — без нього оцінка наближена
+    tiktoken = None
+
+THROUGHPUT_PATH = os.getenv("LTU_THROUGHPUT_PATH", os.path.join("data", "throughput.json"))
+
+# Секунд на 1000 символів оригіналу для одного виклику, поки немає власної історії
+DEFAULT_SECONDS_PER_1K_CHARS = {"google": 1.5, "marian": 4.0, "openai": 8.0}
+# Вартість у доларах: gpt-3.5-turbo за 1M токенів; deep_translator звертається до безкоштовного веб-інтерфейсу Google
+OPENAI_PRICE_PER_1M = {"input": 0.50, "output": 1.50}
+GOOGLE_PRICE_PER_1M_CHARS = 0.0
+# Системна інструкція й службові токени повідомлень на один запит
+OPENAI_PROMPT_OVERHEAD = 20
+# Український переклад займає приблизно стільки токенів на кожен токен англійського оригіналу
+OPENAI_OUTPUT_RATIO = 1.8
+# Вага нових вимірювань у ковзному середньому швидкості рушія
+HISTORY_WEIGHT = 0.3
+
+
+def count_openai_tokens(texts):
+    """Кількість токенів gpt-3.5-turbo; без tiktoken — наближено (~4 символи латиницею на токен)."""
+    if tiktoken is not None:
+        encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        return sum(len(tokens) for tokens in encoding.encode_batch(list(texts)))
+    return sum(max(1, round(len(text) / 4)) for text in texts)
+
+
+def count_marian_tokens(texts, tokenizer):
+    if tokenizer is None:
+        return sum(len(text.split()) * 4 // 3 + 1 for text in texts)
+    return sum(len(ids) for ids in tokenizer(list(texts))["input_ids"])
+
+
+class ThroughputHistory:
+    """Історична швидкість рушіїв (секунд на 1000 символів), зібрана з попередніх завдань.
+
+    Спільна для всіх завдань процесу лише збереженими швидкостями: виміри кожного завдання накопичуються
+    в окремому ThroughputJob (start_job) і додаються сюди його save().
+    """
+
+    def __init__(self, path=THROUGHPUT_PATH):
+        self.path = path
+        self.rates = dict(DEFAULT_SECONDS_PER_1K_CHARS)
+        self.measured = set()
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+            self.rates.update(stored)
+            self.measured.update(stored)
+        except (OSError, ValueError):
+            pass
+
+    def start_job(self):
+        """Новий накопичувач вимірів для одного завдання."""
+        return ThroughputJob(self)
+
+    def record(self, totals):
+        """Додає виміри завдання {рушій: (секунди, символи)} до ковзного середнього і записує історію."""
+        with self._lock:
+            for engine, (seconds, chars) in totals.items():
+                if chars < 1000:
+                    continue
+                rate = seconds / chars * 1000
+                if engine in self.measured:
+                    rate = (1 - HISTORY_WEIGHT) * self.rates[engine] + HISTORY_WEIGHT * rate
+                self.rates[engine] = round(rate, 3)
+                self.measured.add(engine)
+            rates = {engine: self.rates[engine] for engine in self.measured}
+            if not rates:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(rates, f)
+            os.replace(self.path + ".tmp", self.path)
+
+
+class ThroughputJob:
+    """Виміри швидкості рушіїв одного завдання; паралельні завдання не змішують своїх вимірів."""
+
+    def __init__(self, history):
+        self.history = history
+        self._totals = {name: [0.0, 0] for name in ENGINES}
+        self._lock = threading.Lock()
+
+    def wrap(self, engine, translate):
+        """Повертає функцію рушія, що вимірює тривалість успішних викликів.
+
+        Винятки, помилки й швидкі відмови (відкритий запобіжник) не враховуються, щоб не спотворити швидкість.
+        """
+        def timed(text, **kwargs):
+            started = time.monotonic()
+            result = translate(text, **kwargs)
+            translated = result[0] if isinstance(result, tuple) else result
+            if translated and translated not in (ERROR_TEXT, DISABLED_TEXT):
+                with self._lock:
+                    self._totals[engine][0] += time.monotonic() - started
+                    self._totals[engine][1] += len(text)
+            return result
+        return timed
+
+    def save(self):
+        """Передає виміри завдання в історію."""
+        with self._lock:
+            totals, self._totals = self._totals, {name: [0.0, 0] for name in ENGINES}
+        self.history.record(totals)
+
+
+def _memory_hits(paragraphs, memory, masked):
+    """Для кожного рушія — абзаци, переклад яких уже є в пам'яті перекладів."""
+    hits = {name: set() for name in ENGINES}
+    for para in paragraphs:
+        key = mask_text(para)[0] if masked else para
+        exact = memory.lookup(key)
+        if key != para and "import" in memory.lookup(para):
+            exact["import"] = True
+        for name in ENGINES:
+            if "import" in exact or name in exact:
+                hits[name].add(para)
+        if para not in hits["openai"]:
+            fuzzy = memory.fuzzy(key, threshold=0.95, limit=1)
+            if fuzzy:
+                hits["openai"].add(para)
+    return hits
+
+
+def estimate_job(paragraphs, tokenizer=None, memory=None, fast_path=False, mask_placeholders=False,
+                 engines=ENGINES, max_workers=5, history=None):
+    """Оцінює виклики, токени, тривалість і вартість завдання до його запуску.
+
+    memory — TranslationMemory для врахування очікуваних збігів; history — ThroughputHistory.
+    """
+    history = history or ThroughputHistory()
+    unique = list(dict.fromkeys(paragraphs))
+    routes = {para: classify_segment(para)[0] for para in unique} if fast_path else {}
+    # Швидкий шлях: копії не перекладаються зовсім.
+    # Конвеєр не об'єднує повтори в межах документа, тож кожен повтор — окремий виклик.
+    to_translate = {
+        name: [para for para in paragraphs if routes.get(para) != ROUTE_COPY]
+        for name in engines
+    }
+
+    hits = _memory_hits(unique, memory, mask_placeholders) if memory else {name: set() for name in engines}
+    per_engine = {}
+    total_seconds = 0.0
+    for name in engines:
+        texts = [para for para in to_translate[name] if para not in hits[name]]
+        chars = sum(len(text) for text in texts)
+        seconds = chars / 1000 * history.rates[name]
+        total_seconds += seconds
+        entry = {
+            "segments": len(texts),
+            "memory_hits": len(to_translate[name]) - len(texts),
+            "chars": chars,
+            "seconds": seconds,
+            "measured": name in history.measured,
+        }
+        if name == "google":
+            entry["cost"] = chars / 1_000_000 * GOOGLE_PRICE_PER_1M_CHARS
+        elif name == "marian":
+            entry["tokens"] = count_marian_tokens(texts, tokenizer)
+            entry["cost"] = 0.0
+        else:
+            source_tokens = count_openai_tokens(texts)
+            input_tokens = source_tokens + OPENAI_PROMPT_OVERHEAD * len(texts)
+            output_tokens = int(source_tokens * OPENAI_OUTPUT_RATIO)
+            entry["tokens"] = input_tokens + output_tokens
+            entry["cost"] = (
+                input_tokens * OPENAI_PRICE_PER_1M["input"] + output_tokens * OPENAI_PRICE_PER_1M["output"]
+            ) / 1_000_000
+        per_engine[name] = entry
+
+    # Усі рушії ділять один пул потоків завдання
+    wall_seconds = total_seconds / max_workers if per_engine else 0.0
+    estimate = {
+        "segments": len(paragraphs),
+        "unique_segments": len(unique),
+        "engines": per_engine,
+        "wall_seconds": wall_seconds,
+        "cost": sum(entry["cost"] for entry in per_engine.values()),
+    }
+    logging.info(format_estimate(estimate))
+    return estimate
+
+
+def format_estimate(estimate):
+    """Короткий текстовий звіт оцінки для журналу й інтерфейсу."""
+    lines = [
+        f"Оцінка: {estimate['segments']} сегментів ({estimate['unique_segments']} унікальних), "
+        f"≈{_format_duration(estimate['wall_seconds'])}, ≈${estimate['cost']:.2f}"
+    ]
+    for name, entry in estimate["engines"].items():
+        tokens = f", {entry['tokens']} токенів" if "tokens" in entry else ""
+        source = "" if entry["measured"] else " (типова швидкість)"
+        lines.append(
+            f"{name}: викликів {entry['segments']} (з пам'яті {entry['memory_hits']}), {entry['chars']} символів"
+            f"{tokens}, ≈{_format_duration(entry['seconds'])} роботи{source}, ≈${entry['cost']:.2f}"
+        )
+    return "\n".join(lines)
+
+
+def _format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f} с"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} хв"
+    return f"{seconds / 3600:.1f} год"
@@ -0,0 +1,258 @@
+import csv
+import os
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cascade import SKIPPED_TEXT
+from pipeline import DISABLED_TEXT, ERROR_TEXT
+from segments import ENGINES, ROW_BATCH_SIZE, missing_terms, row_note
+
+SOURCE_LANG = "en"
+TARGET_LANG = "uk"
+# Рушій, чий переклад стає цільовим текстом XLIFF, якщо він є; решта — варіанти (модуль mtc)
+TARGET_PREFERENCE = ("openai", "google", "marian")
+CREATION_TOOL = "LegalTransUA"
+
+# Символи, заборонені в XML 1.0 (трапляються в тексті з PDF)
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _xml(text):
+    return escape(_XML_INVALID.sub("", text or ""))
+
+
+def _translated(text):
+    """Чи є текст справжнім перекладом, а не позначкою помилки, пропуску чи вимкненого рушія."""
+    return bool(text) and text not in (ERROR_TEXT, SKIPPED_TEXT, DISABLED_TEXT)
+
+
+def _missing_text(row):
+    return "; ".join(
+        f"{engine}: {source} → {target}" for engine in ENGINES for source, target in missing_terms(row, engine)
+    )
+
+
+class Exporter(ABC):
+    """Експортер готової таблиці сегментів: заголовок, рядки по одному в порядку документа, завершення.
+
+    Запускається після завдання над уже зібраною SegmentTable; сам експорт додає до неї лише поточний
+    пакет рядків (ROW_BATCH_SIZE), а не копію документа. Підкласи мають реалізувати write_row.
+    """
+
+    extension = None
+    mime = None
+
+    def __init__(self, path, source=None):
+        self.path = path
+        self.source = source
+        self.file = None
+        self.rows = 0
+
+    def open(self, segments):
+        self.file = open(self.path, "w", encoding="utf-8", newline="")
+
+    @abstractmethod
+    def write_row(self, idx, row):
+        """Записує рядок idx (словник колонок таблиці сегментів)."""
+
+    def close(self):
+        self.file.close()
+
+    def export(self, segments):
+        self.open(segments)
+        try:
+            for idx, row in segments.iter_rows():
+                self.write_row(idx, row)
+                self.rows += 1
+        finally:
+            self.close()
+        return self.path
+
+
+class CsvExporter(Exporter):
+    """CSV: номер, оригінал, переклади рушіїв і наявні колонки метаданих (utf-8-sig для Excel)."""
+
+    extension = ".csv"
+    mime = "text/csv"
+
+    def open(self, segments):
+        self.file = open(self.path, "w", encoding="utf-8-sig", newline="")
+        self.columns = [name for name in segments.table.column_names if not name.startswith("missing_")]
+        self.with_terms = any(name.startswith("missing_") for name in segments.table.column_names)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["index"] + self.columns + (["missing_terms"] if self.with_terms else []))
+
+    def write_row(self, idx, row):
+        values = ["" if row[name] is None else row[name] for name in self.columns]
+        self.writer.writerow([idx + 1] + values + ([_missing_text(row)] if self.with_terms else []))
+
+
+class TmxExporter(Exporter):
+    """TMX 1.4: одна одиниця на кожен справжній переклад рушія (властивість x-engine).
+
+    Помилки, пропуски каскаду, вимкнені рушії й копії оригіналу (швидкий шлях: номери сторінок, дати, URL)
+    не експортуються, тож файл можна імпортувати в пам'ять перекладів (tm_import.py) або CAT-інструмент
+    без чищення.
+    """
+
+    extension = ".tmx"
+    mime = "application/x-tmx+xml"
+
+    def __init__(self, path, source=None, engines=ENGINES):
+        super().__init__(path, source)
+        self.engines = engines
+
+    def open(self, segments):
+        super().open(segments)
+        created = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.file.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n<tmx version="1.4">\n'
+            f'<header creationtool="{CREATION_TOOL}" creationtoolversion="1" segtype="paragraph" '
+            f'o-tmf="{CREATION_TOOL}" adminlang="{SOURCE_LANG}" srclang="{SOURCE_LANG}" datatype="plaintext" '
+            f'creationdate="{created}"/>\n<body>\n'
+        )
+
+    def write_row(self, idx, row):
+        source = _xml(row["source"])
+        for engine in self.engines:
+            if not _translated(row[engine]) or row[engine] == row["source"]:
+                continue
+            props = f'<prop type="x-engine">{engine}</prop>'
+            note = row_note(row)
+            if note:
+                props += f'<prop type="x-note">{_xml(note)}</prop>'
+            self.file.write(
+                f'<tu tuid="{idx + 1}-{engine}">{props}'
+                f'<tuv xml:lang="{SOURCE_LANG}"><seg>{source}</seg></tuv>'
+                f'<tuv xml:lang="{TARGET_LANG}"><seg>{_xml(row[engine])}</seg></tuv></tu>\n'
+            )
+
+    def close(self):
+        if self.file and not self.file.closed:
+            self.file.write("</body>\n</tmx>\n")
+        super().close()
+
+
+class XliffExporter(Exporter):
+    """XLIFF 2.0: ціль — переклад першого доступного рушія з TARGET_PREFERENCE, решта — варіанти mtc:match.
+
+    Сторінка, маршрут, оцінка узгодженості й пропущені терміни глосарію записуються в примітки одиниці.
+    """
+
+    extension = ".xlf"
+    mime = "application/xliff+xml"
+
+    def open(self, segments):
+        super().open(segments)
+        original = quoteattr(os.path.basename(self.source or self.path))
+        self.file.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<xliff xmlns="urn:oasis:names:tc:xliff:document:2.0" '
+            'xmlns:mtc="urn:oasis:names:tc:xliff:matches:2.0" '
+            f'version="2.0" srcLang="{SOURCE_LANG}" trgLang="{TARGET_LANG}">\n'
+            f'<file id="f1" original={original}>\n'
+        )
+
+    def write_row(self, idx, row):
+        unit_id = idx + 1
+        candidates = [engine for engine in TARGET_PREFERENCE if _translated(row[engine])]
+        target_engine = candidates[0] if candidates else None
+        source = _xml(row["source"])
+
+        parts = [f'<unit id="u{unit_id}">']
+        alternatives = candidates[1:]
+        if alternatives:
+            parts.append("<mtc:matches>")
+            for engine in alternatives:
+                parts.append(
+                    f'<mtc:match ref="#s{unit_id}" type="mt" origin="{engine}">'
+                    f"<source>{source}</source><target>{_xml(row[engine])}</target></mtc:match>"
+                )
+            parts.append("</mtc:matches>")
+
+        notes = [
+            ("engine", target_engine),
+            ("location", row_note(row)),
+            ("agreement", None if row.get("score") is None else f"{row['score']:.3f}"),
+            ("glossary", _missing_text(row)),
+        ]
+        notes = [(category, text) for category, text in notes if text]
+        if notes:
+            parts.append("<notes>")
+            parts.extend(f'<note category="{category}">{_xml(text)}</note>' for category, text in notes)
+            parts.append("</notes>")
+
+        state = "translated" if target_engine else "initial"
+        parts.append(f'<segment id="s{unit_id}" state="{state}"><source>{source}</source>')
+        if target_engine:
+            parts.append(f"<target>{_xml(row[target_engine])}</target>")
+        parts.append("</segment></unit>\n")
+        self.file.write("".join(parts))
+
+    def close(self):
+        if self.file and not self.file.closed:
+            self.file.write("</file>\n</xliff>\n")
+        super().close()
+
+
+class ParquetExporter(Exporter):
+    """Parquet: колонки таблиці сегментів як є, групами рядків по ROW_BATCH_SIZE.
+
+    export передає пакети Arrow без перетворення в Python; write_row накопичує рядки в пакет.
+    """
+
+    extension = ".parquet"
+    mime = "application/vnd.apache.parquet"
+
+    def open(self, segments):
+        self.schema = segments.table.schema.with_metadata(
+            {"source": self.source or "", "creation_tool": CREATION_TOOL}
+        )
+        self.writer = pq.ParquetWriter(self.path, self.schema, compression="zstd")
+        self._pending = []
+
+    def write_row(self, idx, row):
+        self._pending.append(row)
+        if len(self._pending) >= ROW_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self.writer.write_batch(pa.RecordBatch.from_pylist(self._pending, schema=self.schema))
+            self._pending = []
+
+    def close(self):
+        try:
+            self._flush()
+        finally:
+            self.writer.close()
+
+    def export(self, segments):
+        self.open(segments)
+        try:
+            for batch in segments.iter_batches(ROW_BATCH_SIZE):
+                self.writer.write_batch(batch)
+                self.rows += batch.num_rows
+        finally:
+            self.close()
+        return self.path
+
+
+EXPORTERS = {
+    "parquet": ParquetExporter,
+    "tmx": TmxExporter,
+    "xliff": XliffExporter,
+    "csv": CsvExporter,
+}
+
+
+def export_segments(segments, fmt, path, source=None):
+    """Записує таблицю сегментів у формат fmt (ключ EXPORTERS); повертає шлях до файлу."""
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Непідтримуваний формат експорту: {fmt}. Доступні: {', '.join(EXPORTERS)}")
+    return EXPORTERS[fmt](path, source).export(segments)
@@ -0,0 +1,169 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from content_extraction import EXTRACTOR_VERSION, extract_from_tree, extract_main_content, html_parser
+from metrics import CACHE_LOOKUPS, stage
+
+HTTP_CACHE_DIR = os.getenv("LTU_HTTP_CACHE_DIR", os.path.join("data", "http_cache"))
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0
+MAX_BODY_BYTES = 20 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+USER_AGENT = "LegalTransUA/1.0"
+
+_local = threading.local()
+
+
+class FetchError(Exception):
+    """Сторінку не вдалося завантажити: мережа, статус відповіді або завеликий розмір."""
+
+
+def get_session():
+    """Сесія requests із пулом з'єднань, окрема для кожного потоку."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = USER_AGENT
+        _local.session = session
+    return session
+
+
+class HttpCache:
+    """Дисковий кеш сторінок: заголовки валідації (ETag/Last-Modified), тіло та витягнуті абзаци."""
+
+    def __init__(self, directory=HTTP_CACHE_DIR):
+        self.directory = directory
+
+    def _path(self, url, suffix):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}{suffix}")
+
+    def get(self, url):
+        """Повертає метадані запису або None."""
+        try:
+            with open(self._path(url, ".json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def body(self, url):
+        try:
+            with gzip.open(self._path(url, ".html.gz"), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, url, entry, body=None):
+        meta_path = self._path(url, ".json")
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        if body is not None:
+            body_path = self._path(url, ".html.gz")
+            with gzip.open(body_path + ".tmp", "wb", compresslevel=5) as f:
+                f.write(body)
+            os.replace(body_path + ".tmp", body_path)
+        # Атомарний запис: паралельні завдання не побачать половину файлу
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(meta_path + ".tmp", meta_path)
+
+
+def conditional_headers(entry):
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _stream_into_parser(response, url, max_bytes):
+    """Читає тіло частинами, одночасно подаючи їх у парсер lxml; повертає (дерево, тіло)."""
+    declared = response.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise FetchError(f"Сторінка завелика ({int(declared)} байт): {url}")
+    charset = requests.utils.get_encoding_from_headers(response.headers)
+    # requests підставляє ISO-8859-1 для text/* без charset — тоді кодування визначає сам парсер
+    if charset and charset.lower() == "iso-8859-1" and "charset" not in response.headers.get("Content-Type", ""):
+        charset = None
+    parser = html_parser(charset)
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise FetchError(f"Сторінка більша за {max_bytes} байт: {url}")
+        chunks.append(chunk)
+        parser.feed(chunk)
+    body = b"".join(chunks)
+    if not body.strip():
+        return None, body
+    return parser.close(), body
+
+
+def fetch_paragraphs(url, cache=None, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_bytes=MAX_BODY_BYTES):
+    """Завантажує сторінку й повертає абзаци основного тексту.
+
+    Якщо сторінка є в кеші, надсилається умовний запит; на 304 повертаються збережені абзаци
+    без повторного завантаження й розбору. Якщо в кеші немає ні абзаців, ні тіла (запис crawl.py
+    або видалене тіло), сторінка запитується ще раз без умовних заголовків.
+    """
+    cache = cache or HttpCache()
+    entry = cache.get(url)
+    for headers in (conditional_headers(entry), {}) if entry else ({},):
+        try:
+            with stage("fetch"), \
+                    get_session().get(url, headers=headers, timeout=timeout, stream=True) as response:
+                not_modified = response.status_code == 304 and bool(headers)
+                CACHE_LOOKUPS.inc(cache="http", result="hit" if not_modified else "miss")
+                if not_modified:
+                    paragraphs = _cached_paragraphs(cache, url, entry)
+                    if paragraphs is not None:
+                        logging.info(f"Сторінка не змінилась (304), використано кеш: {url}")
+                        return paragraphs
+                    logging.info(f"Сторінка не змінилась (304), але в кеші немає тексту — повторний запит: {url}")
+                    continue
+                if response.status_code != 200:
+                    raise FetchError(f"Не вдалося завантажити сторінку ({response.status_code}): {url}")
+                tree, body = _stream_into_parser(response, url, max_bytes)
+                response_headers = response.headers
+        except requests.exceptions.RequestException as e:
+            raise FetchError(f"Помилка при завантаженні {url}: {e}") from e
+        break
+
+    paragraphs = extract_from_tree(tree, url) if tree is not None else []
+    # Порожній результат не кешується, щоб наступний запит не отримав 304 на «порожню» сторінку
+    if paragraphs and (response_headers.get("ETag") or response_headers.get("Last-Modified")):
+        cache.put(url, {
+            "url": url,
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+            "extractor": EXTRACTOR_VERSION,
+            "paragraphs": paragraphs,
+        }, body)
+    return paragraphs
+
+
+def _cached_paragraphs(cache, url, entry):
+    """Абзаци сторінки з кешу (за потреби — заново витягнуті з тіла) або None, якщо їх немає."""
+    if entry.get("paragraphs") and entry.get("extractor") == EXTRACTOR_VERSION:
+        return entry["paragraphs"]
+    body = cache.body(url)
+    if body is None:
+        return None
+    paragraphs = extract_main_content(body, url)
+    if not paragraphs:
+        return None
+    entry["paragraphs"] = paragraphs
+    entry["extractor"] = EXTRACTOR_VERSION
+    cache.put(url, entry)
+    return paragraphs
@@ -0,0 +1,159 @@
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+
+_PRIME = (1 << 61) - 1
+
+
+def normalize_segment(text):
+    """Нормалізує сегмент для пошуку: нижній регістр і один пробіл між словами."""
+    return " ".join(text.lower().split())
+
+
+def word_similarity(a, b, threshold=0.0):
+    """Схожість 0..1 за відстанню Левенштейна між послідовностями слів.
+
+    Якщо верхня оцінка за спільними словами нижча за threshold, повертає її без повного підрахунку.
+    """
+    a_words = a.split()
+    b_words = b.split()
+    if not a_words and not b_words:
+        return 1.0
+    longest = max(len(a_words), len(b_words))
+    if a_words == b_words:
+        return 1.0
+
+    # Кожна позиція без редагування — це спільне слово, тож відстань не менша за longest - спільні
+    upper_bound = sum((Counter(a_words) & Counter(b_words)).values()) / longest
+    if upper_bound < threshold:
+        return upper_bound
+
+    previous = list(range(len(b_words) + 1))
+    for i, word in enumerate(a_words, 1):
+        current = [i]
+        for j, other in enumerate(b_words, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (word != other),
+            ))
+        previous = current
+    return 1.0 - previous[-1] / longest
+
+
+class MinHasher:
+    """MinHash-підписи символьних n-грам сегмента."""
+
+    def __init__(self, num_perm=64, ngram=5, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.ngram = ngram
+        self._a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+
+    def _shingle_hashes(self, text):
+        text = normalize_segment(text)
+        if len(text) <= self.ngram:
+            shingles = {text}
+        else:
+            shingles = {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+        return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    def signature(self, text):
+        hashes = self._shingle_hashes(text)
+        return ((hashes[:, None] * self._a + self._b) % _PRIME).min(axis=0).astype(np.uint32)
+
+    def signatures(self, texts, chunk_size=1000):
+        """Підписи пакета сегментів (масив N × num_perm), обчислені векторно."""
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(texts), chunk_size):
+            hashes = [self._shingle_hashes(text) for text in texts[start:start + chunk_size]]
+            offsets = np.cumsum([0] + [len(h) for h in hashes[:-1]])
+            values = (np.concatenate(hashes)[:, None] * self._a + self._b) % _PRIME
+            result[start:start + len(hashes)] = np.minimum.reduceat(values, offsets, axis=0)
+        return result
+
+
+class FuzzyIndex:
+    """LSH-індекс MinHash-підписів на відсортованих масивах (компактний для мільйонів сегментів)."""
+
+    def __init__(self, num_perm=64, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm має ділитися на bands без остачі.")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._mix = np.random.default_rng(7).integers(1, 1 << 63, self.rows, dtype=np.uint64) | np.uint64(1)
+        # Відсортовані ключі та ідентифікатори кожної смуги; _merge замінює пару цілком,
+        # тож candidates читає узгоджений знімок без блокування
+        self._bands = (
+            [np.empty(0, dtype=np.uint64) for _ in range(bands)],
+            [np.empty(0, dtype=np.int64) for _ in range(bands)],
+        )
+        self._pending_ids = []
+        self._pending_signatures = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._bands[1][0]) + sum(len(ids) for ids in self._pending_ids)
+
+    def _band_keys(self, signatures):
+        """Хеш кожної смуги підпису: масив N × bands."""
+        signatures = signatures.astype(np.uint64)
+        keys = np.zeros((len(signatures), self.bands), dtype=np.uint64)
+        for row in range(self.rows):
+            keys += signatures[:, row::self.rows] * self._mix[row]
+        return keys
+
+    def add(self, ids, signatures):
+        """Додає пакет ідентифікаторів і їхніх підписів (масив N × num_perm)."""
+        if len(ids):
+            with self._lock:
+                self._pending_ids.append(np.asarray(ids, dtype=np.int64))
+                self._pending_signatures.append(np.asarray(signatures, dtype=np.uint32))
+
+    def _flush(self):
+        with self._lock:
+            if not self._pending_ids:
+                return
+            ids = np.concatenate(self._pending_ids)
+            signatures = np.vstack(self._pending_signatures)
+            self._pending_ids = []
+            self._pending_signatures = []
+            self._merge(ids, self._band_keys(signatures))
+
+    def _merge(self, ids, keys):
+        """Вливає нові ключі смуг у нові відсортовані масиви й підміняє їх одним присвоєнням.
+
+        Сортується лише новий пакет (O(k log k)), а в наявні масиви він вставляється за позиціями
+        searchsorted одним лінійним проходом, без повторного сортування всього індексу.
+        """
+        old_keys, old_ids = self._bands
+        new_keys, new_ids = [], []
+        for band in range(self.bands):
+            order = np.argsort(keys[:, band], kind="stable")
+            batch_keys = keys[order, band]
+            # side="right": серед однакових ключів старі записи залишаються першими
+            positions = np.searchsorted(old_keys[band], batch_keys, side="right")
+            new_keys.append(np.insert(old_keys[band], positions, batch_keys))
+            new_ids.append(np.insert(old_ids[band], positions, ids[order]))
+        self._bands = (new_keys, new_ids)
+
+    def candidates(self, signature, limit=50):
+        """Ідентифікатори кандидатів, упорядковані за кількістю збігів смуг."""
+        self._flush()
+        keys = self._band_keys(signature[None, :])[0]
+        keys_by_band, ids_by_band = self._bands
+        found = []
+        for band in range(self.bands):
+            band_keys = keys_by_band[band]
+            left = np.searchsorted(band_keys, keys[band], side="left")
+            right = np.searchsorted(band_keys, keys[band], side="right")
+            if right > left:
+                found.append(ids_by_band[band][left:right])
+        if not found:
+            return []
+        ids, counts = np.unique(np.concatenate(found), return_counts=True)
+        order = np.argsort(-counts, kind="stable")[:limit]
+        return ids[order].tolist()
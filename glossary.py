@@ -0,0 +1,211 @@
+import csv
+import hashlib
+import io
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from cascade import SKIPPED_TEXT
+from pipeline import DISABLED_TEXT, ERROR_TEXT
+
+WORD_PATTERN = re.compile(r"\w+(?:[-'’]\w+)*")
+# Скільки термінів глосарію передається OpenAI в одному запиті
+MAX_PROMPT_TERMS = 30
+
+# Скомпільовані автомати останніх версій глосаріїв (LRU): кожна правка глосарію — нова версія
+MAX_COMPILED_GLOSSARIES = 4
+_COMPILED = OrderedDict()
+_COMPILED_LOCK = threading.Lock()
+
+
+def tokenize(text):
+    return WORD_PATTERN.findall(text.lower())
+
+
+def term_stems(target):
+    """Основи слів перекладу терміна без відмінкових закінчень (до двох останніх літер)."""
+    return [word[:max(3, len(word) - 2)] for word in tokenize(target)]
+
+
+def contains_term(translation_words, stems):
+    """Чи містить переклад усі основи слів обов'язкового перекладу терміна."""
+    return all(any(word.startswith(stem) for word in translation_words) for stem in stems)
+
+
+class TermMatcher:
+    """Автомат Ахо–Корасік над словами: усі терміни глосарію за один лінійний прохід по тексту."""
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._lengths = []
+        for term_id, term in enumerate(terms):
+            words = tokenize(term)
+            self._lengths.append(len(words))
+            if not words:
+                continue
+            node = 0
+            for word in words:
+                next_node = self._goto[node].get(word)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][word] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = next_node
+            self._out[node].append(term_id)
+        self._build_links()
+
+    def _build_links(self):
+        # Посилання на найближчий суфікс із термінами, щоб не копіювати списки виходів
+        self._link = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                queue.append(child)
+                state = self._fail[node]
+                while state and word not in self._goto[state]:
+                    state = self._fail[state]
+                fail = self._goto[state].get(word, 0)
+                self._fail[child] = fail
+                self._link[child] = fail if self._out[fail] else self._link[fail]
+
+    def __len__(self):
+        return len(self._goto)
+
+    def find(self, text):
+        """Повертає ідентифікатори термінів у тексті: найдовші збіги без перекриття, зліва направо."""
+        goto, fail, out, link = self._goto, self._fail, self._out, self._link
+        matches = []
+        node = 0
+        for pos, word in enumerate(tokenize(text)):
+            while node and word not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word, 0)
+            state = node
+            while state:
+                for term_id in out[state]:
+                    matches.append((pos - self._lengths[term_id] + 1, -self._lengths[term_id], term_id))
+                state = link[state]
+
+        found = []
+        covered = 0
+        for start, negative_length, term_id in sorted(matches):
+            if start >= covered:
+                found.append(term_id)
+                covered = start - negative_length
+        return found
+
+
+class Glossary:
+    """Скомпільований глосарій обов'язкових перекладів EN→UK однієї версії."""
+
+    def __init__(self, entries, version=None):
+        self.entries = entries
+        self.version = version
+        self.stems = [term_stems(target) for _, target in entries]
+        started = time.monotonic()
+        self.matcher = TermMatcher([source for source, _ in entries])
+        logging.info(
+            f"Глосарій {version or ''}: {len(entries)} термінів скомпільовано за {time.monotonic() - started:.2f} с"
+        )
+
+    def find(self, text):
+        """Пари (термін, обов'язковий переклад), знайдені в тексті."""
+        return [self.entries[term_id] for term_id in self.matcher.find(text)]
+
+    def missing(self, term_ids, translation):
+        """Терміни з term_ids, обов'язкового перекладу яких немає в translation."""
+        words = tokenize(translation)
+        return [self.entries[term_id] for term_id in term_ids if not contains_term(words, self.stems[term_id])]
+
+
+def parse_glossary(data):
+    """Розбирає CSV/TSV (термін, переклад) з байтів; рядок заголовка пропускається."""
+    text = data.decode("utf-8-sig")
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    entries = {}
+    for row in csv.reader(io.StringIO(text), dialect):
+        if len(row) < 2:
+            continue
+        source, target = row[0].strip(), row[1].strip()
+        if source and target and source.lower() not in ("en", "source", "term", "термін"):
+            entries.setdefault(source.lower(), (source, target))
+    return list(entries.values())
+
+
+def load_glossary(source):
+    """Завантажує глосарій зі шляху або байтів; автомат компілюється один раз на версію вмісту.
+
+    Зберігаються лише MAX_COMPILED_GLOSSARIES останніх версій, тож правки глосарію не накопичуються в процесі.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    version = hashlib.blake2b(data, digest_size=8).hexdigest()
+    with _COMPILED_LOCK:
+        glossary = _COMPILED.get(version)
+        if glossary is None:
+            glossary = Glossary(parse_glossary(data), version)
+            _COMPILED[version] = glossary
+            while len(_COMPILED) > MAX_COMPILED_GLOSSARIES:
+                _COMPILED.popitem(last=False)
+        else:
+            _COMPILED.move_to_end(version)
+    return glossary
+
+
+class GlossaryEnforcer:
+    """Застосовує глосарій у межах одного завдання: терміни в запиті OpenAI і перевірка перекладів."""
+
+    def __init__(self, glossary):
+        self.glossary = glossary
+        self.stats = {"prompted": 0, "missing": 0, "rows_flagged": 0}
+        self._lock = threading.Lock()
+
+    def wrap_openai(self, translate):
+        """Повертає функцію OpenAI, що передає знайдені терміни в translate(text, terms=...)."""
+        def with_terms(text, **kwargs):
+            terms = self.glossary.find(text)[:MAX_PROMPT_TERMS]
+            if terms:
+                with self._lock:
+                    self.stats["prompted"] += 1
+                kwargs["terms"] = terms
+            return translate(text, **kwargs)
+        return with_terms
+
+    def check(self, paragraphs, translations):
+        """Повертає для кожного рядка {рушій: [пропущені терміни]} або None, якщо все гаразд."""
+        flags = []
+        for idx, para in enumerate(paragraphs):
+            row = {}
+            term_ids = self.glossary.matcher.find(para)
+            if term_ids:
+                for engine, texts in translations.items():
+                    text = texts[idx]
+                    if not text or text in (ERROR_TEXT, SKIPPED_TEXT, DISABLED_TEXT):
+                        continue
+                    missing = self.glossary.missing(term_ids, text)
+                    if missing:
+                        row[engine] = missing
+                        self.stats["missing"] += len(missing)
+            if row:
+                self.stats["rows_flagged"] += 1
+            flags.append(row or None)
+        return flags
+
+    def summary_text(self):
+        return (
+            f"Глосарій: {len(self.glossary.entries)} термінів, терміни передано OpenAI для "
+            f"{self.stats['prompted']} сегментів, рядків із пропущеними термінами {self.stats['rows_flagged']}"
+        )
@@ -0,0 +1,82 @@
+import difflib
+import hashlib
+import logging
+
+from cascade import SKIPPED_TEXT, CascadePipeline
+from pipeline import DISABLED_TEXT, ERROR_TEXT
+
+# Позначки замість перекладу: такі комірки попередньої версії не переносяться, абзац перекладається знову
+NOT_TRANSLATED = (ERROR_TEXT, DISABLED_TEXT)
+
+
+def segment_hash(text):
+    """Хеш сегмента без урахування відмінностей у пробілах."""
+    return hashlib.blake2b(" ".join(text.split()).encode("utf-8"), digest_size=16).digest()
+
+
+def align_segments(old_paragraphs, new_paragraphs):
+    """Повертає для кожного нового сегмента індекс незмінного старого (або None) та множину змінених рядків."""
+    old_hashes = [segment_hash(p) for p in old_paragraphs]
+    new_hashes = [segment_hash(p) for p in new_paragraphs]
+
+    mapping = [None] * len(new_paragraphs)
+    changed = set()
+    matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for k in range(j2 - j1):
+                mapping[j1 + k] = i1 + k
+        elif tag in ("replace", "insert"):
+            changed.update(range(j1, j2))
+
+    # Переміщені абзаци вважаються зміненими, але переклад для них можна взяти з попередньої версії
+    old_positions = {h: i for i, h in enumerate(old_hashes)}
+    for j in changed:
+        mapping[j] = old_positions.get(new_hashes[j])
+
+    return mapping, changed
+
+
+def _is_cascade(pipeline):
+    """Чи є серед вкладених конвеєрів (FilteredPipeline.inner) каскадний."""
+    while pipeline is not None:
+        if isinstance(pipeline, CascadePipeline):
+            return True
+        pipeline = getattr(pipeline, "inner", None)
+    return False
+
+
+def translate_incremental(pipeline, paragraphs, previous):
+    """Перекладає лише нові або змінені сегменти, решту бере з попереднього перекладу.
+
+    previous — словник {"paragraphs": [...], <рушій>: [...]}, як повертає load_translation_document.
+    """
+    mapping, changed = align_segments(previous["paragraphs"], paragraphs)
+    engines = list(pipeline.engines)
+    translations = {name: [""] * len(paragraphs) for name in engines}
+    # У каскаді пропущений OpenAI — остаточний стан «легкого» рядка; без каскаду такий рядок треба перекласти
+    not_translated = NOT_TRANSLATED if _is_cascade(pipeline) else NOT_TRANSLATED + (SKIPPED_TEXT,)
+
+    to_translate = []
+    for idx, old_idx in enumerate(mapping):
+        reused = old_idx is not None and all(
+            previous[name][old_idx] and previous[name][old_idx] not in not_translated for name in engines
+        )
+        if reused:
+            for name in engines:
+                translations[name][idx] = previous[name][old_idx]
+        else:
+            to_translate.append(idx)
+
+    logging.info(
+        f"Інкрементальний переклад: змінено {len(changed)} з {len(paragraphs)} абзаців, "
+        f"до перекладу {len(to_translate)}"
+    )
+
+    if to_translate:
+        fresh = pipeline.run([paragraphs[idx] for idx in to_translate])
+        for name in engines:
+            for pos, idx in enumerate(to_translate):
+                translations[name][idx] = fresh[name][pos]
+
+    return translations, changed
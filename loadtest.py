@@ -0,0 +1,382 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import aiohttp
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.Common_pb2 import FileUploaderState, UploadedFileInfo
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from bench_corpus import ensure_corpus
+from bench_servers import StandInConfig, StandInServer
+from resilience import LatencyHistogram
+
+APP_SCRIPT = "app.py"
+# Підписи віджетів app.py, за якими сесія знаходить їх ідентифікатори
+SOURCE_LABEL = "Оберіть тип джерела:"
+SOURCE_OPTIONS = ("Файл", "URL")
+UPLOAD_LABEL = "Завантажте файл (DOCX або PDF):"
+URL_LABEL = "Введіть URL:"
+START_LABEL = "Розпочати переклад"
+DOWNLOAD_LABEL = "Завантажити таблицю DOCX"
+FLOWS = ("file", "url")
+SCRIPT_TIMEOUT = 600.0
+MONITOR_INTERVAL = 0.5
+
+
+class SessionError(Exception):
+    """Сесія не змогла пройти сценарій: виняток у скрипті, відсутній віджет або тайм-аут."""
+
+
+class StreamlitSession:
+    """Імітує браузер: протокол Streamlit (protobuf через вебсокет), завантаження і скачування файлів."""
+
+    def __init__(self, http, base_url, timeout=SCRIPT_TIMEOUT):
+        self.http = http
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session_id = None
+        self.page_script_hash = ""
+        self.elements = {}
+        self.states = {}
+        self._ws = None
+
+    async def connect(self):
+        self._ws = await self.http.ws_connect(
+            f"{self.base_url.replace('http', 'ws', 1)}/_stcore/stream", max_msg_size=0
+        )
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _send(self, message):
+        await self._ws.send_bytes(message.SerializeToString())
+
+    async def _receive(self):
+        message = await asyncio.wait_for(self._ws.receive(), self.timeout)
+        if message.type != aiohttp.WSMsgType.BINARY:
+            raise SessionError(f"З'єднання закрито сервером ({message.type.name})")
+        forward = ForwardMsg()
+        forward.ParseFromString(message.data)
+        return forward
+
+    def _collect(self, forward, errors):
+        kind = forward.WhichOneof("type")
+        if kind == "new_session":
+            self.page_script_hash = forward.new_session.page_script_hash
+            if forward.new_session.HasField("initialize"):
+                self.session_id = forward.new_session.initialize.session_id
+        elif kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+            element_type = forward.delta.new_element.WhichOneof("type")
+            element = getattr(forward.delta.new_element, element_type)
+            if element_type == "exception":
+                errors.append(f"{element.type}: {element.message}")
+            elif getattr(element, "label", None):
+                self.elements[element.label] = (element_type, element)
+
+    async def rerun(self):
+        """Надсилає поточний стан віджетів і чекає завершення скрипта; повертає тривалість."""
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.page_script_hash = self.page_script_hash
+        message.rerun_script.widget_states.widgets.extend(self.states.values())
+        started = time.monotonic()
+        await self._send(message)
+        self.elements = {}
+        errors = []
+        while True:
+            forward = await self._receive()
+            if forward.WhichOneof("type") == "script_finished":
+                break
+            self._collect(forward, errors)
+        # Кнопки (trigger) спрацьовують лише на одному перезапуску, як у браузері
+        self.states = {key: state for key, state in self.states.items() if not state.HasField("trigger_value")}
+        if errors:
+            raise SessionError("; ".join(errors))
+        return time.monotonic() - started
+
+    def widget(self, label):
+        if label not in self.elements:
+            raise SessionError(f"На сторінці немає віджета «{label}»")
+        return self.elements[label][1]
+
+    def set_value(self, label, **value):
+        state = WidgetState(id=self.widget(label).id, **value)
+        self.states[state.id] = state
+
+    async def upload(self, label, path, name):
+        """Завантажує файл так само, як фронтенд: запит адреси через вебсокет і PUT на /_stcore/upload_file."""
+        uploader = self.widget(label)
+        request = BackMsg()
+        request.file_urls_request.request_id = uuid.uuid4().hex
+        request.file_urls_request.file_names.append(name)
+        request.file_urls_request.session_id = self.session_id or ""
+        await self._send(request)
+        while True:
+            forward = await self._receive()
+            if forward.WhichOneof("type") == "file_urls_response":
+                break
+        response = forward.file_urls_response
+        if response.error_msg or not response.file_urls:
+            raise SessionError(f"Сервер не видав адресу для завантаження: {response.error_msg}")
+        urls = response.file_urls[0]
+
+        with open(path, "rb") as f:
+            data = f.read()
+        form = aiohttp.FormData()
+        form.add_field("file", data, filename=name, content_type="application/octet-stream")
+        async with self.http.put(f"{self.base_url}{urls.upload_url}", data=form) as reply:
+            if reply.status >= 400:
+                raise SessionError(f"Завантаження файлу: HTTP {reply.status}")
+
+        state = WidgetState(id=uploader.id)
+        state.file_uploader_state_value.CopyFrom(FileUploaderState(
+            max_file_size=uploader.max_upload_size_mb * 1024 * 1024,
+            uploaded_file_info=[UploadedFileInfo(name=name, size=len(data), file_id=urls.file_id, file_urls=urls)],
+        ))
+        self.states[state.id] = state
+
+    async def download(self, label):
+        """Скачує файл кнопки завантаження; повертає розмір у байтах."""
+        async with self.http.get(f"{self.base_url}{self.widget(label).url}") as reply:
+            data = await reply.read()
+        if reply.status != 200 or not data.startswith(b"PK"):
+            raise SessionError(f"Скачування «{label}»: HTTP {reply.status}, {len(data)} байт")
+        return len(data)
+
+
+async def run_session(number, flow, base_url, corpus, corpus_url, timeout=SCRIPT_TIMEOUT):
+    """Проходить один сценарій (file — завантаження DOCX, url — веб-сторінка) і повертає тривалість кроків."""
+    steps = {}
+    started = time.monotonic()
+    result = {"session": number, "flow": flow, "steps": steps, "error": None}
+    async with aiohttp.ClientSession() as http:
+        session = StreamlitSession(http, base_url, timeout)
+        try:
+            await session.connect()
+            steps["first_render"] = await session.rerun()
+            if flow == "file":
+                upload_started = time.monotonic()
+                await session.upload(UPLOAD_LABEL, corpus["docx"], f"session-{number}.docx")
+                await session.rerun()
+                steps["upload_extract"] = time.monotonic() - upload_started
+            else:
+                session.set_value(SOURCE_LABEL, int_value=SOURCE_OPTIONS.index("URL"))
+                await session.rerun()
+                session.set_value(URL_LABEL, string_value=corpus_url)
+                steps["enter_url"] = await session.rerun()
+            session.set_value(START_LABEL, trigger_value=True)
+            steps["translate"] = await session.rerun()
+            download_started = time.monotonic()
+            await session.download(DOWNLOAD_LABEL)
+            steps["download"] = time.monotonic() - download_started
+        except (SessionError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            result["error"] = str(e) or type(e).__name__
+        finally:
+            await session.close()
+    steps["total"] = time.monotonic() - started
+    return result
+
+
+def process_stats(pid):
+    """RSS (МБ) і кількість потоків процесу з /proc (Linux)."""
+    stats = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    stats["rss_mb"] = int(line.split()[1]) / 1024
+                elif line.startswith("Threads:"):
+                    stats["threads"] = int(line.split()[1])
+    except OSError:
+        pass
+    return stats
+
+
+class ServerMonitor:
+    """Періодично знімає RSS і кількість потоків сервера Streamlit."""
+
+    def __init__(self, pid, interval=MONITOR_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+
+    def sample(self):
+        stats = process_stats(self.pid)
+        if stats:
+            self.samples.append((time.monotonic(), stats))
+        return stats
+
+    async def run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def peak(self, key):
+        return max((stats.get(key, 0) for _, stats in self.samples), default=None)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(port, environment, workdir):
+    """Запускає app.py справжнім сервером Streamlit з ізольованими даними (пам'ять перекладів, кеші)."""
+    env = dict(os.environ, **environment)
+    env.update(
+        LTU_TM_PATH=os.path.join(workdir, "tm.sqlite3"),
+        LTU_HTTP_CACHE_DIR=os.path.join(workdir, "http_cache"),
+        LTU_THROUGHPUT_PATH=os.path.join(workdir, "throughput.json"),
+    )
+    command = [
+        sys.executable, "-m", "streamlit", "run", APP_SCRIPT, "--server.headless=true", f"--server.port={port}",
+        "--server.address=127.0.0.1", "--server.enableXsrfProtection=false", "--server.fileWatcherType=none",
+        "--browser.gatherUsageStats=false",
+    ]
+    with open(os.path.join(workdir, "streamlit.log"), "w") as log:
+        return subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_healthy(base_url, process, timeout=120.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Сервер Streamlit завершився з кодом {process.returncode}")
+            try:
+                async with http.get(f"{base_url}/_stcore/health") as reply:
+                    if reply.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError("Сервер Streamlit не відповів вчасно")
+
+
+def summarize(results, monitor, baseline, rounds_rss):
+    """Перцентилі кроків, частка помилок і ресурси сервера."""
+    steps = {}
+    for result in results:
+        if result["error"]:
+            continue
+        for name, seconds in result["steps"].items():
+            steps.setdefault(name, LatencyHistogram(window=len(results), min_samples=1)).observe(seconds)
+    errors = [result for result in results if result["error"]]
+    final = monitor.sample()
+    return {
+        "sessions": len(results),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(results), 3) if results else 0.0,
+        "error_examples": sorted({result["error"] for result in errors})[:5],
+        "steps": {
+            name: {q: round(histogram.percentile(value), 3) for q, value in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))}
+            for name, histogram in steps.items()
+        },
+        "rss_mb": {
+            "start": round(baseline.get("rss_mb", 0), 1),
+            "peak": round(monitor.peak("rss_mb") or 0, 1),
+            "end": round(final.get("rss_mb", 0), 1),
+            "after_rounds": [round(value, 1) for value in rounds_rss],
+        },
+        "threads": {"start": baseline.get("threads"), "peak": monitor.peak("threads"), "end": final.get("threads")},
+    }
+
+
+async def run_load_test(sessions=10, flows=FLOWS, rounds=1, ramp_up=5.0, config=None, idle=5.0,
+                        timeout=SCRIPT_TIMEOUT):
+    """Запускає app.py і заглушки рушіїв, проганяє rounds хвиль по sessions одночасних сесій."""
+    corpus = {fmt: path for (_, fmt), path in ensure_corpus(("small",), ("docx", "html")).items()}
+    workdir = tempfile.mkdtemp(prefix="ltu-load-")
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    results = []
+    rounds_rss = []
+    with StandInServer(config, corpus_dir=os.path.dirname(corpus["html"])) as server:
+        corpus_url = f"{server.url}/corpus/{os.path.basename(corpus['html'])}"
+        process = start_app(port, server.environment(), workdir)
+        try:
+            await _wait_healthy(base_url, process)
+            monitor = ServerMonitor(process.pid)
+            baseline = monitor.sample()
+            monitor_task = asyncio.create_task(monitor.run())
+            for round_number in range(rounds):
+                async def delayed(number):
+                    # Рівномірний наростаючий запуск сесій, як під час реального наплину користувачів
+                    await asyncio.sleep(ramp_up * number / max(1, sessions))
+                    return await run_session(
+                        number, flows[number % len(flows)], base_url, corpus, corpus_url, timeout
+                    )
+                started = time.monotonic()
+                wave = await asyncio.gather(*(delayed(number) for number in range(sessions)))
+                results.extend(wave)
+                await asyncio.sleep(idle)
+                rounds_rss.append(monitor.sample().get("rss_mb", 0))
+                failed = sum(1 for result in wave if result["error"])
+                logging.info(
+                    f"Хвиля {round_number + 1}/{rounds}: {sessions} сесій за {time.monotonic() - started:.1f} с, "
+                    f"помилок {failed}, RSS сервера {rounds_rss[-1]:.0f} МБ"
+                )
+            monitor_task.cancel()
+            summary = summarize(results, monitor, baseline, rounds_rss)
+            summary["engines"] = server.stats()
+            summary["server_log"] = os.path.join(workdir, "streamlit.log")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return summary, results
+
+
+def print_summary(summary):
+    print(f"Сесій: {summary['sessions']}, помилок: {summary['errors']} ({summary['error_rate']:.1%})")
+    for error in summary["error_examples"]:
+        print(f"  {error}")
+    print(f"{'Крок':<18}{'p50, с':>9}{'p90, с':>9}{'p99, с':>9}")
+    for name, values in summary["steps"].items():
+        print(f"{name:<18}{values['p50']:>9.2f}{values['p90']:>9.2f}{values['p99']:>9.2f}")
+    rss, threads = summary["rss_mb"], summary["threads"]
+    print(
+        f"RSS сервера: {rss['start']} → пік {rss['peak']} → {rss['end']} МБ (після хвиль: {rss['after_rounds']}); "
+        f"потоків: {threads['start']} → пік {threads['peak']} → {threads['end']}"
+    )
+    print(f"Журнал сервера: {summary['server_log']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Навантажувальний тест інтерфейсу Streamlit LegalTransUA.")
+    parser.add_argument("--sessions", type=int, default=10, help="Кількість одночасних сесій у хвилі.")
+    parser.add_argument("--rounds", type=int, default=1, help="Кількість хвиль (для виявлення росту пам'яті).")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="Сценарії сесій по черзі: file, url.")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="За скільки секунд стартують усі сесії хвилі.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Середня затримка заглушок рушіїв, с.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Частка відповідей 500 від заглушок.")
+    parser.add_argument("--throttle-rps", type=float, default=0, help="Ліміт запитів на секунду заглушок.")
+    parser.add_argument("--timeout", type=float, default=SCRIPT_TIMEOUT, help="Тайм-аут одного перезапуску, с.")
+    parser.add_argument("--output", help="Записати зведення й результати сесій у JSON.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    config = StandInConfig(latency=args.latency, error_rate=args.error_rate, throttle_rps=args.throttle_rps)
+    summary, results = asyncio.run(run_load_test(
+        args.sessions, tuple(args.flows.split(",")), args.rounds, args.ramp_up, config, timeout=args.timeout
+    ))
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "sessions": results}, f, ensure_ascii=False, indent=2)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,269 @@
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = os.getenv("LTU_METRICS_PORT")
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_registry = []
+_current_job = contextvars.ContextVar("ltu_current_job", default=None)
+# Сумарний час вкладених етапів поточного етапу (список з одного числа, щоб вкладений етап міг його змінити)
+_stage_children = contextvars.ContextVar("ltu_stage_children", default=None)
+_server = None
+_server_lock = threading.Lock()
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("ltu_stage_seconds", "Тривалість етапів завдання", ["stage"])
+ENGINE_SECONDS = Histogram("ltu_engine_call_seconds", "Затримка одного виклику рушія", ["engine"])
+ENGINE_CALLS = Counter("ltu_engine_calls_total", "Виклики рушіїв за результатом", ["engine", "outcome"])
+ENGINE_RETRIES = Counter("ltu_engine_retries_total", "Повторні спроби викликів рушіїв", ["engine"])
+PIPELINE_PENDING = Gauge("ltu_pipeline_pending_tasks", "Сегменти в черзі пулу перекладу")
+CACHE_LOOKUPS = Counter("ltu_cache_lookups_total", "Звернення до кешів за результатом", ["cache", "result"])
+MODEL_MEMORY = Gauge("ltu_model_memory_bytes", "Пам'ять параметрів завантажених моделей", ["model"])
+PROCESS_MEMORY = Gauge("ltu_process_resident_memory_bytes", "Резидентна пам'ять процесу")
+JOBS = Counter("ltu_jobs_total", "Завершені завдання перекладу", ["status"])
+
+
+def _resident_memory():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss — пікове значення (КБ у Linux, байти в macOS), але краще, ніж нічого
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def render():
+    """Усі метрики у текстовому форматі Prometheus."""
+    PROCESS_MEMORY.set(_resident_memory())
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class JobTimings:
+    """Тривалість етапів і сумарний час викликів рушіїв одного завдання.
+
+    profiler — необов'язковий JobProfiler, що працює під час завдання і отримує межі етапів.
+    """
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.stages = {}
+        self.engines = {}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_job.set(self)
+        if self.profiler:
+            self.profiler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler:
+            self.profiler.stop()
+        _current_job.reset(self._token)
+        JOBS.inc(status="failed" if exc_type else "done")
+        return False
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_engine_call(self, engine, seconds):
+        with self._lock:
+            total, calls = self.engines.get(engine, (0.0, 0))
+            self.engines[engine] = (total + seconds, calls + 1)
+
+    def summary_text(self):
+        elapsed = time.monotonic() - self.started
+        stages = ", ".join(f"{name} {seconds:.1f} с" for name, seconds in self.stages.items())
+        engines = ", ".join(
+            f"{name} {total:.1f} с/{calls} викл." for name, (total, calls) in self.engines.items()
+        )
+        return f"Час завдання: {elapsed:.1f} с ({stages}); сумарно у рушіях: {engines or '—'}"
+
+
+@contextmanager
+def stage(name):
+    """Вимірює етап: глобальна гістограма й таймінги поточного завдання (якщо воно є).
+
+    Враховується власний час етапу: вкладені етапи (наприклад, fetch усередині extract) віднімаються
+    від зовнішнього, тож у зведенні завдання їхній час не рахується двічі.
+    """
+    job = _current_job.get()
+    profiler = job.profiler if job is not None else None
+    if profiler:
+        profiler.enter_stage(name)
+    parent = _stage_children.get()
+    children = [0.0]
+    token = _stage_children.set(children)
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        elapsed = time.monotonic() - started
+        _stage_children.reset(token)
+        if parent is not None:
+            parent[0] += elapsed
+        own = max(elapsed - children[0], 0.0)
+        STAGE_SECONDS.observe(own, stage=name)
+        if job is not None:
+            job.add_stage(name, own)
+        if profiler:
+            profiler.exit_stage(name)
+
+
+def instrument_engine(engine, translate, failure_values=()):
+    """Обгортає рушій вимірюванням затримки й підрахунком помилок.
+
+    Пул потоків не переносить контекст, тому завдання фіксується під час створення обгортки.
+    """
+    job = _current_job.get()
+
+    def measured(text, **kwargs):
+        started = time.monotonic()
+        outcome = "error"
+        try:
+            result = translate(text, **kwargs)
+            value = result[0] if isinstance(result, tuple) else result
+            if value and value not in failure_values:
+                outcome = "ok"
+            return result
+        finally:
+            elapsed = time.monotonic() - started
+            ENGINE_SECONDS.observe(elapsed, engine=engine)
+            ENGINE_CALLS.inc(engine=engine, outcome=outcome)
+            if job is not None:
+                job.add_engine_call(engine, elapsed)
+    return measured
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None, host="127.0.0.1"):
+    """Запускає локальну точку /metrics у фоновому потоці (один раз на процес); порт — LTU_METRICS_PORT."""
+    global _server
+    port = port or METRICS_PORT
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            except OSError as e:
+                logging.warning(f"Не вдалося запустити сервер метрик на порту {port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+            logging.info(f"Метрики доступні на http://{host}:{port}/metrics")
+    return _server
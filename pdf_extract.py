@@ -0,0 +1,48 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+# Менші PDF швидше обробити в одному процесі, ніж запускати пул
+PARALLEL_MIN_PAGES = 64
+PAGES_PER_TASK = 32
+
+
+def _page_lines(page):
+    return [line.strip() for line in page.get_text("text").splitlines() if line.strip()]
+
+
+def _extract_range(file_path, start, stop):
+    """Рядки сторінок [start, stop) як список (номер сторінки з 1, рядок); кожен процес відкриває файл сам."""
+    with fitz.open(file_path) as doc:
+        return [(number + 1, line) for number in range(start, stop) for line in _page_lines(doc[number])]
+
+
+def page_count(file_path):
+    with fitz.open(file_path) as doc:
+        return doc.page_count
+
+
+def extract_pdf_lines(file_path, processes=None):
+    """Витягує непорожні рядки PDF разом із номером сторінки: [(сторінка, рядок)].
+
+    Великі PDF діляться на діапазони сторінок, які обробляються паралельно в окремих процесах;
+    результат збирається в порядку сторінок і збігається з послідовним режимом.
+    """
+    total = page_count(file_path)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or total < PARALLEL_MIN_PAGES:
+        return _extract_range(file_path, 0, total)
+
+    ranges = [(start, min(start + PAGES_PER_TASK, total)) for start in range(0, total, PAGES_PER_TASK)]
+    # spawn, а не fork: виклик іде з робочих потоків API та Streamlit, а fork копіює стан їхніх блокувань
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(processes, len(ranges)), mp_context=context) as executor:
+        parts = executor.map(
+            _extract_range, [file_path] * len(ranges), [start for start, _ in ranges], [stop for _, stop in ranges]
+        )
+        lines = [item for part in parts for item in part]
+    logging.info(f"PDF {file_path}: {total} сторінок оброблено в {min(processes, len(ranges))} процесах")
+    return lines
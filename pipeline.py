@@ -0,0 +1,194 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import PIPELINE_PENDING
+from resilience import CLOSED, ENGINE_BREAKERS
+
+# Рушії перекладу в порядку колонок таблиці — єдине визначення для всіх модулів
+ENGINES = ("google", "marian", "openai")
+
+ERROR_TEXT = "Помилка перекладу"
+DISABLED_TEXT = "— (рушій вимкнено для цього завдання)"
+
+# Найдовше очікування відновлення рушія перед повтором невдалих сегментів, с
+MAX_RETRY_WAIT = 120.0
+# Пауза між пробними запитами, якщо пробу зайняло інше завдання (подвоюється до RETRY_BACKOFF_CAP)
+RETRY_BACKOFF = 1.0
+RETRY_BACKOFF_CAP = 15.0
+
+
+class ThrottledProgressReporter:
+    """Передає події прогресу не частіше за заданий інтервал або крок у відсотках."""
+
+    def __init__(self, callback, total, min_interval=0.25, min_step=0.01):
+        self.callback = callback
+        self.total = total
+        self.min_interval = min_interval
+        self.min_step = min_step
+        self._last_time = {}
+        self._last_fraction = {}
+
+    def update(self, engine, done):
+        """Реєструє прогрес рушія і викликає callback лише за потреби."""
+        if not self.callback or not self.total:
+            return
+        fraction = done / self.total
+        now = time.monotonic()
+        last_time = self._last_time.get(engine)
+        last_fraction = self._last_fraction.get(engine, 0.0)
+        if (
+            done < self.total
+            and last_time is not None
+            and now - last_time < self.min_interval
+            and fraction - last_fraction < self.min_step
+        ):
+            return
+        self._last_time[engine] = now
+        self._last_fraction[engine] = fraction
+        self.callback(engine, done, self.total)
+
+    def finish(self, engine):
+        """Гарантує фінальну подію 100% для рушія."""
+        if self.callback and self._last_fraction.get(engine) != 1.0:
+            self._last_fraction[engine] = 1.0
+            self.callback(engine, self.total, self.total)
+
+
+class TranslationPipeline:
+    """Єдиний конвеєр перекладу для Streamlit, CLI та API.
+
+    Сегменти, що завершилися помилкою (наприклад, через відкритий запобіжник рушія),
+    за retry_failed=True перекладаються ще раз наприкінці; виправлені рядки повторно
+    передаються в on_segment з тим самим індексом. Якщо запобіжник рушія (breakers, за замовчуванням
+    ENGINE_BREAKERS) відкритий, повтор чекає на пробний запит (не довше max_retry_wait) і
+    перекладає решту сегментів лише після того, як проба вдалася.
+    """
+
+    def __init__(self, engines, max_workers=5, on_progress=None, on_segment=None,
+                 min_interval=0.25, min_step=0.01, retry_failed=True, breakers=None,
+                 max_retry_wait=MAX_RETRY_WAIT):
+        # engines: впорядкований словник {назва: функція(text) -> str | None}
+        self.engines = engines
+        self.max_workers = max_workers
+        self.on_progress = on_progress
+        self.on_segment = on_segment
+        self.min_interval = min_interval
+        self.min_step = min_step
+        self.retry_failed = retry_failed
+        self.breakers = ENGINE_BREAKERS if breakers is None else breakers
+        self.max_retry_wait = max_retry_wait
+
+    def run(self, paragraphs):
+        """Перекладає абзаци всіма рушіями і повертає {назва: список перекладів}."""
+        total = len(paragraphs)
+        translations = {name: [""] * total for name in self.engines}
+        reporter = ThrottledProgressReporter(self.on_progress, total, self.min_interval, self.min_step)
+        for name in self.engines:
+            reporter.update(name, 0)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self._translate_all(executor, paragraphs, translations, reporter)
+            if self.retry_failed:
+                self._retry_failed(executor, paragraphs, translations)
+
+        for name in self.engines:
+            reporter.finish(name)
+
+        return translations
+
+    @staticmethod
+    def _submit(executor, translate, para):
+        """Ставить виклик рушія в пул; черга в PIPELINE_PENDING зменшується, щойно виклик завершився
+        (або скасований), навіть якщо обробку результатів перервав виняток."""
+        PIPELINE_PENDING.inc()
+        future = executor.submit(translate, para)
+        future.add_done_callback(lambda _: PIPELINE_PENDING.dec())
+        return future
+
+    def _translate_all(self, executor, paragraphs, translations, reporter):
+        """Основний прохід: усі абзаци всіма рушіями."""
+        done = {name: 0 for name in self.engines}
+        pending_engines = [len(self.engines)] * len(paragraphs)
+        futures = {}
+        for name, translate in self.engines.items():
+            for idx, para in enumerate(paragraphs):
+                futures[self._submit(executor, translate, para)] = (name, idx)
+
+        for future in as_completed(futures):
+            name, idx = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.warning(f"{name}: помилка перекладу абзацу {idx + 1}: {e}")
+                result = None
+            translations[name][idx] = result or ERROR_TEXT
+            done[name] += 1
+            reporter.update(name, done[name])
+
+            pending_engines[idx] -= 1
+            if pending_engines[idx] == 0 and self.on_segment:
+                self.on_segment(idx, paragraphs[idx], {n: translations[n][idx] for n in self.engines})
+
+    def _await_recovery(self, name, rows, paragraphs, translations, fixed):
+        """Чекає, поки запобіжник рушія пропустить пробний запит, і перекладає ним перший невдалий сегмент.
+
+        Повертає True, якщо решту сегментів варто повторити (проба вдалася або рушій не у збої).
+        """
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            return True
+        deadline = time.monotonic() + self.max_retry_wait
+        backoff = 0.0
+        while True:
+            delay = max(breaker.seconds_until_probe(), backoff)
+            if time.monotonic() + delay > deadline:
+                logging.warning(f"{name}: рушій не відновився за {self.max_retry_wait:.0f} с, повтор скасовано")
+                return False
+            if delay:
+                logging.info(f"{name}: запобіжник відкритий, повтор {len(rows)} сегментів через {delay:.0f} с")
+                time.sleep(delay)
+            try:
+                result = self.engines[name](paragraphs[rows[0]])
+            except Exception:
+                result = None
+            if result and result != ERROR_TEXT:
+                translations[name][rows[0]] = result
+                fixed.add(rows.pop(0))
+                return True
+            if breaker.state == CLOSED:
+                # Помилка не через збій рушія: решта сегментів повторюється як звичайно
+                return True
+            backoff = min(max(backoff * 2, RETRY_BACKOFF), RETRY_BACKOFF_CAP)
+
+    def _retry_failed(self, executor, paragraphs, translations):
+        """Відкладений повтор сегментів, які не вдалося перекласти в основному проході."""
+        failed = {
+            name: [idx for idx, text in enumerate(translations[name]) if text == ERROR_TEXT] for name in self.engines
+        }
+        failed = {name: rows for name, rows in failed.items() if rows}
+        if not failed:
+            return
+
+        logging.info(f"Повторний переклад {sum(map(len, failed.values()))} сегментів, що завершилися помилкою")
+        fixed = set()
+        futures = {}
+        for name, rows in failed.items():
+            if not self._await_recovery(name, rows, paragraphs, translations, fixed):
+                continue
+            for idx in rows:
+                futures[self._submit(executor, self.engines[name], paragraphs[idx])] = (name, idx)
+
+        for future in as_completed(futures):
+            name, idx = futures[future]
+            try:
+                result = future.result()
+            except Exception:
+                result = None
+            if result and result != ERROR_TEXT:
+                translations[name][idx] = result
+                fixed.add(idx)
+
+        if self.on_segment:
+            for idx in sorted(fixed):
+                self.on_segment(idx, paragraphs[idx], {n: translations[n][idx] for n in self.engines})
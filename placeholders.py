@@ -0,0 +1,80 @@
+import logging
+import re
+import threading
+
+from pipeline import ERROR_TEXT
+
+# Порядок груп важливий: довші й специфічніші шаблони перевіряються першими
+MASK_PATTERN = re.compile(
+    r"(?P<url>\bhttps?://[^\s<>\"]+[^\s<>\".,;:)])"
+    r"|(?P<email>\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b)"
+    r"|(?P<date>\b\d{1,2}[./]\d{1,2}[./]\d{2,4}\b|\b\d{4}-\d{2}-\d{2}\b)"
+    r"|(?P<regulation>\b\d{2,4}/\d{1,4}(?:/[A-Z]{2,5})?\b)"
+    r"|(?P<reference>\b\d+[a-z]?(?:\(\d+[a-z]?\))+(?:\([a-z]\))*)"
+    r"|(?P<number>\b\d+(?:[.,]\d+)*\b)"
+)
+PLACEHOLDER_PATTERN = re.compile(r"\{\s*(\d+)\s*\}")
+
+
+def mask_text(text):
+    """Замінює числа, дати, посилання, e-mail і URL на {1}, {2}, ...; повертає (шаблон, значення)."""
+    values = []
+
+    def replace(match):
+        values.append(match.group(0))
+        return "{" + str(len(values)) + "}"
+
+    if PLACEHOLDER_PATTERN.search(text):
+        # Текст уже містить фігурні дужки з числами — маскування було б неоднозначним
+        return text, []
+    return MASK_PATTERN.sub(replace, text), values
+
+
+def restore_text(translated, values):
+    """Повертає значення на місце плейсхолдерів; None, якщо якийсь плейсхолдер втрачено або продубльовано."""
+    found = [int(number) for number in PLACEHOLDER_PATTERN.findall(translated)]
+    if sorted(found) != list(range(1, len(values) + 1)):
+        return None
+    return PLACEHOLDER_PATTERN.sub(lambda match: values[int(match.group(1)) - 1], translated)
+
+
+class PlaceholderMasker:
+    """Обгортає рушії маскуванням змінних частин сегмента в межах одного завдання."""
+
+    def __init__(self):
+        self.stats = {"masked": 0, "restored": 0, "fallback": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def wrap(self, translate):
+        """Повертає функцію рушія, що перекладає шаблон і відновлює значення.
+
+        Якщо рушій втратив плейсхолдер, сегмент перекладається ще раз без маскування.
+        Результат-кортеж (переклад, оцінка) також підтримується.
+        """
+        def masked(text, **kwargs):
+            template, values = mask_text(text)
+            if not values:
+                return translate(text, **kwargs)
+            self._count("masked")
+            result = translate(template, **kwargs)
+            translated = result[0] if isinstance(result, tuple) else result
+            if not translated or translated == ERROR_TEXT:
+                return result
+            restored = restore_text(translated, values)
+            if restored is None:
+                self._count("fallback")
+                logging.debug(f"Плейсхолдери втрачено, повторний переклад без маскування: {text[:60]}")
+                return translate(text, **kwargs)
+            self._count("restored")
+            return (restored,) + tuple(result[1:]) if isinstance(result, tuple) else restored
+        return masked
+
+    def summary_text(self):
+        return (
+            f"Маскування: сегментів {self.stats['masked']}, відновлено {self.stats['restored']}, "
+            f"без маскування повторно {self.stats['fallback']}"
+        )
@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Профілювання вмикається для CLI змінною середовища, в інтерфейсі — прапорцем
+PROFILE_ENABLED = os.getenv("LTU_PROFILE") == "1"
+SAMPLE_INTERVAL = 0.01
+TOP_ALLOCATIONS = 10
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class JobProfiler:
+    """Вибірковий профайлер усіх потоків процесу і tracemalloc-звіт за етапами завдання.
+
+    Окремий потік кожні interval секунд знімає стеки всіх потоків (sys._current_frames), тож видно і
+    робочі потоки пулу перекладу, і очікування на блокуваннях. Зразки групуються за потоком і поточним
+    етапом (метрики stage()), а однакові стеки зберігаються один раз з лічильником.
+    У Streamlit до профілю потрапляють і потоки інших сесій того самого процесу.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, top=TOP_ALLOCATIONS):
+        self.interval = interval
+        self.top = top
+        self.samples = {}
+        self.allocations = []
+        self._frames = {}
+        self._stages = []
+        self._started_tracing = False
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = None
+        self.elapsed = 0.0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.elapsed = time.monotonic() - self.started
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    def _frame_id(self, key):
+        index = self._frames.get(key)
+        if index is None:
+            index = self._frames[key] = len(self._frames)
+        return index
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stage = self._stages[-1][0] if self._stages else "—"
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(self._frame_id((code.co_name, code.co_filename, code.co_firstlineno)))
+                    frame = frame.f_back
+                # Псевдокадр етапу в корені стеку, щоб флеймграф ділився за етапами завдання
+                stack.append(self._frame_id((f"[{stage}]", "", 0)))
+                counts = self.samples.setdefault(names.get(ident, str(ident)), Counter())
+                counts[tuple(reversed(stack))] += 1
+
+    def enter_stage(self, name):
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        self._stages.append((name, snapshot))
+
+    def exit_stage(self, name):
+        _, before = self._stages.pop()
+        if before is None or not tracemalloc.is_tracing():
+            return
+        after = tracemalloc.take_snapshot()
+        ignored = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        )
+        diff = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "lineno")
+        self.allocations.append((name, sum(stat.size_diff for stat in diff), diff[:self.top]))
+
+    def write_speedscope(self, path):
+        frames = [None] * len(self._frames)
+        for (name, filename, line), index in self._frames.items():
+            frames[index] = {"name": name, "file": filename, "line": line} if filename else {"name": name}
+        profiles = []
+        for thread_name, counts in sorted(self.samples.items()):
+            stacks = list(counts.items())
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(count for _, count in stacks) * self.interval,
+                "samples": [list(stack) for stack, _ in stacks],
+                "weights": [count * self.interval for _, count in stacks],
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "$schema": SPEEDSCOPE_SCHEMA,
+                "shared": {"frames": frames},
+                "profiles": profiles,
+                "name": os.path.basename(path),
+                "exporter": "LegalTransUA",
+            }, f)
+
+    def write_folded(self, path):
+        """Згорнуті стеки для flamegraph.pl / inferno: «потік;етап;кадр;... кількість»."""
+        names = [None] * len(self._frames)
+        for (name, filename, line), index in self._frames.items():
+            names[index] = f"{name} ({os.path.basename(filename)}:{line})" if filename else name
+        with open(path, "w", encoding="utf-8") as f:
+            for thread_name, counts in sorted(self.samples.items()):
+                for stack, count in counts.items():
+                    f.write(";".join([thread_name] + [names[index] for index in stack]) + f" {count}\n")
+
+    def write_allocations(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for name, total, stats in self.allocations:
+                f.write(f"== {name}: {total / 1024 / 1024:+.1f} MiB ==\n")
+                for stat in stats:
+                    location = stat.traceback[0]
+                    f.write(
+                        f"{location.filename}:{location.lineno}: {stat.size_diff / 1024:+.1f} KiB "
+                        f"({stat.count_diff:+d} блоків)\n"
+                    )
+                f.write("\n")
+
+    def write(self, output_file):
+        """Записує профіль поруч із DOCX; повертає шляхи (speedscope, folded, allocations)."""
+        base = os.path.splitext(output_file)[0]
+        paths = (f"{base}.speedscope.json", f"{base}.folded.txt", f"{base}.allocations.txt")
+        self.write_speedscope(paths[0])
+        self.write_folded(paths[1])
+        self.write_allocations(paths[2])
+        total = sum(sum(counts.values()) for counts in self.samples.values())
+        logging.info(f"Профіль завдання ({total} зразків за {self.elapsed:.1f} с): {paths[0]}")
+        return paths
+
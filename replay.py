@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Запис викликів рушіїв у виробничих завданнях і їх відтворення офлайн (наприклад, у бенчмарку)
+RECORD_PATH = os.getenv("LTU_ENGINE_RECORD")
+REPLAY_PATH = os.getenv("LTU_ENGINE_REPLAY")
+# Множник записаних затримок під час відтворення: 1 — як у записі, 0 — без очікування
+REPLAY_TIME_SCALE = float(os.getenv("LTU_REPLAY_TIME_SCALE", "1.0"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    engine TEXT NOT NULL,
+    key BLOB NOT NULL,
+    request TEXT NOT NULL,
+    result TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_key ON calls (engine, key);
+"""
+
+_default_tape = None
+_default_lock = threading.Lock()
+
+
+class ReplayMissError(LookupError):
+    """У записі немає відповіді на такий запит до рушія."""
+
+
+def request_key(engine, text, kwargs):
+    """Ключ запиту: рушій, текст і додаткові параметри (зразок з пам'яті, терміни глосарію)."""
+    request = json.dumps([text, kwargs], ensure_ascii=False, sort_keys=True, default=list)
+    return hashlib.blake2b(f"{engine}\0{request}".encode("utf-8"), digest_size=16).digest(), request
+
+
+class EngineRecorder:
+    """Записує запити до рушіїв, відповіді й тривалість викликів у SQLite."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # autocommit: кожен виклик записується одразу, тож обірване завдання теж залишає запис
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def wrap(self, engine, translate):
+        def recorded(text, **kwargs):
+            started = time.monotonic()
+            result = translate(text, **kwargs)
+            seconds = time.monotonic() - started
+            key, request = request_key(engine, text, kwargs)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO calls (engine, key, request, result, seconds) VALUES (?, ?, ?, ?, ?)",
+                    (engine, key, request, json.dumps(result, ensure_ascii=False), seconds),
+                )
+                self.calls += 1
+            return result
+        return recorded
+
+    def summary_text(self):
+        return f"Запис викликів рушіїв: {self.calls} у {self.path}"
+
+
+class EngineReplayer:
+    """Відтворює записані відповіді рушіїв без мережі й моделей, з записаною (або масштабованою) затримкою.
+
+    Повторні запити з однаковим текстом отримують записані відповіді по черзі (а після останньої — знову
+    з початку), тож повтори й помилки першої спроби відтворюються так само, як у записаному завданні.
+    """
+
+    def __init__(self, path, time_scale=REPLAY_TIME_SCALE):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Запис викликів рушіїв не знайдено: {path}")
+        self.path = path
+        self.time_scale = time_scale
+        self._calls = {}
+        self._served = {}
+        self._lock = threading.Lock()
+        self.misses = 0
+        with sqlite3.connect(path) as conn:
+            for engine, key, result, seconds in conn.execute(
+                "SELECT engine, key, result, seconds FROM calls ORDER BY id"
+            ):
+                self._calls.setdefault((engine, key), []).append((json.loads(result), seconds))
+        logging.info(f"Відтворення викликів рушіїв: {sum(map(len, self._calls.values()))} записів з {path}")
+
+    def wrap(self, engine, translate):
+        """Повертає функцію рушія, що не викликає translate, а віддає записану відповідь."""
+        def replayed(text, **kwargs):
+            key, _ = request_key(engine, text, kwargs)
+            with self._lock:
+                calls = self._calls.get((engine, key))
+                if not calls:
+                    self.misses += 1
+                    raise ReplayMissError(f"{engine}: немає запису для «{text[:60]}»")
+                served = self._served.get((engine, key), 0)
+                self._served[engine, key] = served + 1
+            result, seconds = calls[served % len(calls)]
+            if self.time_scale:
+                time.sleep(seconds * self.time_scale)
+            # JSON не зберігає кортежі (переклад MarianMT з оцінкою)
+            return tuple(result) if isinstance(result, list) else result
+        return replayed
+
+    def summary_text(self):
+        return f"Відтворення викликів рушіїв: {sum(self._served.values())} відповідей, без запису {self.misses}"
+
+
+def replaying():
+    """Чи відтворюються записані виклики (тоді модель MarianMT не потрібна)."""
+    return bool(REPLAY_PATH)
+
+
+def default_tape():
+    """Запис або відтворення за змінними LTU_ENGINE_RECORD / LTU_ENGINE_REPLAY (один на процес) або None."""
+    global _default_tape
+    with _default_lock:
+        if _default_tape is None and REPLAY_PATH:
+            _default_tape = EngineReplayer(REPLAY_PATH)
+        elif _default_tape is None and RECORD_PATH:
+            _default_tape = EngineRecorder(RECORD_PATH)
+    return _default_tape
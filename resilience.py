@@ -0,0 +1,243 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Запобіжники рушіїв процесу за назвою рушія; конвеєр чекає на них перед повтором невдалих сегментів
+ENGINE_BREAKERS = {}
+
+
+class CircuitBreaker:
+    """Запобіжник для зовнішнього рушія: після серії помилок перестає надсилати запити."""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Чи можна зараз надіслати запит до рушія."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+                logging.info(f"{self.name}: запобіжник напіввідкритий, пробний запит")
+            # HALF_OPEN: пропускаємо лише один пробний запит
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def seconds_until_probe(self):
+        """Скільки ще запобіжник відкритий (0 — запит або пробний запит уже можна надіслати)."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info(f"{self.name}: рушій відновився, запобіжник закрито")
+            self.state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logging.warning(
+                        f"{self.name}: запобіжник відкрито після {self._failures} помилок поспіль"
+                    )
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class RetryBudget:
+    """Спільний на одне завдання ліміт повторних спроб для рушія."""
+
+    def __init__(self, max_retries):
+        self.remaining = max_retries
+        self._lock = threading.Lock()
+
+    def consume(self):
+        """Списує одну повторну спробу; False, якщо бюджет вичерпано."""
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+class LatencyHistogram:
+    """Гістограма затримок з фіксованими кошиками та ковзним вікном для перцентилів."""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, float("inf"))
+
+    def __init__(self, window=1000, min_samples=20):
+        self.counts = [0] * len(self.BUCKETS)
+        self.total = 0
+        self.min_samples = min_samples
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+            self.total += 1
+            self._recent.append(seconds)
+
+    def percentile(self, q):
+        """Перцентиль q (0..1) за ковзним вікном або None, якщо замало спостережень."""
+        with self._lock:
+            if len(self._recent) < self.min_samples:
+                return None
+            ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.total,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": {f"le_{b}": c for b, c in zip(self.BUCKETS, self.counts)},
+        }
+
+
+class TimeoutSession(requests.Session):
+    """Сесія requests із тайм-аутом за замовчуванням для бібліотек, які не передають timeout самі.
+
+    timeout — як у requests: секунди або пара (з'єднання, читання).
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class CallerSaturatedError(RuntimeError):
+    """Забагато незавершених (покинутих через тайм-аут) спроб: новий виклик відхилено одразу."""
+
+
+class HedgedCaller:
+    """Виконує виклик із загальним тайм-аутом і дублює його, якщо він триває довше за p95.
+
+    Частка продубльованих викликів обмежена max_hedge_ratio. Спроба після тайм-ауту не скасовується,
+    а лише перестає блокувати сегмент, тож сам виклик має мати тайм-аут сокета (TimeoutSession).
+    Кількість незавершених спроб обмежена max_outstanding: поки покинуті спроби займають потоки,
+    нові виклики відхиляються CallerSaturatedError, а не стають у чергу за ними.
+    """
+
+    def __init__(self, name, timeout=20.0, max_hedge_ratio=0.1, min_hedge_delay=0.2, max_workers=32,
+                 max_outstanding=None):
+        self.name = name
+        self.timeout = timeout
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_hedge_delay = min_hedge_delay
+        self.max_outstanding = max_outstanding or max_workers
+        self.outstanding = 0
+        self.rejected = 0
+        self.attempts = LatencyHistogram()
+        self.results = LatencyHistogram()
+        self.calls = 0
+        self.hedges = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"hedge-{name}")
+
+    def _timed(self, fn):
+        started = time.monotonic()
+        try:
+            return fn()
+        finally:
+            self.attempts.observe(time.monotonic() - started)
+
+    def _may_hedge(self):
+        with self._lock:
+            if self.hedges + 1 > self.max_hedge_ratio * self.calls or self.outstanding >= self.max_outstanding:
+                return False
+            self.hedges += 1
+            self.outstanding += 1
+            return True
+
+    def _attempt_done(self, future):
+        with self._lock:
+            self.outstanding -= 1
+
+    def _submit(self, fn):
+        # outstanding збільшується під замком разом із перевіркою ліміту (у call або _may_hedge)
+        future = self._executor.submit(self._timed, fn)
+        future.add_done_callback(self._attempt_done)
+        return future
+
+    def call(self, fn):
+        """Повертає результат першої успішної спроби; TimeoutError або CallerSaturatedError інакше."""
+        started = time.monotonic()
+        with self._lock:
+            if self.outstanding >= self.max_outstanding:
+                self.rejected += 1
+                raise CallerSaturatedError(f"{self.name}: {self.outstanding} незавершених спроб, виклик відхилено")
+            self.calls += 1
+            self.outstanding += 1
+        pending = {self._submit(fn)}
+
+        hedge_delay = self.attempts.percentile(0.95)
+        if hedge_delay is not None:
+            hedge_delay = min(max(hedge_delay, self.min_hedge_delay), self.timeout)
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done and self._may_hedge():
+                pending.add(self._submit(fn))
+
+        error = None
+        while pending:
+            remaining = self.timeout - (time.monotonic() - started)
+            done, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    self.results.observe(time.monotonic() - started)
+                    return future.result()
+                error = future.exception()
+
+        if error is not None and not pending:
+            raise error
+        with self._lock:
+            self.timeouts += 1
+        raise TimeoutError(f"{self.name}: немає відповіді за {self.timeout} с")
+
+    def summary(self):
+        """Хвіст затримок до (окремі спроби) і після (з дублюванням) хеджування."""
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "attempts": self.attempts.summary(),
+            "results": self.results.summary(),
+        }
@@ -0,0 +1,99 @@
+import logging
+import re
+import time
+
+ROUTE_COPY = "копія"
+
+_CURRENCY = r"(?:[€$£₴]|EUR|USD|GBP|UAH|CHF|грн\.?)"
+
+# Сегменти, які копіюються без перекладу
+COPY_PATTERNS = {
+    "url": re.compile(r"^(?:https?://|www\.)\S+$", re.IGNORECASE),
+    "email": re.compile(r"^[\w.+-]+@[\w-]+(?:\.[\w-]+)+$"),
+    "date": re.compile(r"^\d{1,2}[./-]\d{1,2}[./-]\d{2,4}$|^\d{4}-\d{2}-\d{2}$"),
+    "page": re.compile(
+        r"^(?:page|p\.|стор\.?|сторінка)?\s*[-–—]?\s*\d{1,4}\s*[-–—]?\s*(?:(?:of|з|/)\s*\d{1,4})?$", re.IGNORECASE
+    ),
+    # Римське число — лише правильно утворене й з крапкою: «I», «CV», «XL» чи «CIVIL» без крапки — це слова
+    "section": re.compile(
+        r"^(?:\d+\.)*\d+\.?$|^\(?(?:[a-z]|[ivxlc]{1,6})\)$|^(?=[IVXLC])C{0,3}(?:XC|XL|L?X{0,3})(?:IX|IV|V?I{0,3})\.$"
+    ),
+    "amount": re.compile(rf"^{_CURRENCY}?\s*[+-]?\d[\d\s.,']*\s*(?:{_CURRENCY}|%)?$", re.IGNORECASE),
+    "symbols": re.compile(r"^[\W\d_]+$"),
+}
+_LETTER = re.compile(r"[^\W\d_]")
+_CYRILLIC = re.compile(r"[Ѐ-ӿ]")
+_UKRAINIAN_ONLY = re.compile(r"[іїєґІЇЄҐ]")
+
+
+def classify_segment(text):
+    """Повертає (маршрут, категорія): копія або (None, None) для звичайного перекладу."""
+    stripped = text.strip()
+    for category, pattern in COPY_PATTERNS.items():
+        if pattern.match(stripped):
+            return ROUTE_COPY, category
+
+    letters = _LETTER.findall(stripped)
+    if letters:
+        cyrillic = sum(1 for letter in letters if _CYRILLIC.match(letter))
+        # Без і, ї, є, ґ кирилиця може бути російською чи іншою мовою — такий текст перекладається
+        if cyrillic / len(letters) >= 0.6 and _UKRAINIAN_ONLY.search(stripped):
+            return ROUTE_COPY, "ukrainian"
+    return None, None
+
+
+class FilteredPipeline:
+    """Обгортка конвеєра, що не надсилає рушіям неперекладні сегменти.
+
+    Номери сторінок і розділів, дати, суми, URL та український текст копіюються як є.
+    Має інтерфейс TranslationPipeline (engines, run).
+    """
+
+    def __init__(self, inner, max_workers=5):
+        self.inner = inner
+        self.engines = inner.engines
+        self.max_workers = max_workers
+        self.routes = {}
+        self.summary = {"copied": 0, "calls_saved": 0, "seconds_saved": 0.0, "categories": {}}
+
+    def run(self, paragraphs):
+        """Перекладає абзаци, оминаючи рушії для неперекладних сегментів."""
+        started = time.monotonic()
+        engines = list(self.engines)
+        translations = {name: [""] * len(paragraphs) for name in engines}
+
+        regular = []
+        for idx, para in enumerate(paragraphs):
+            route, category = classify_segment(para)
+            if route is None:
+                regular.append(idx)
+                continue
+            self.routes[para] = route
+            self.summary["categories"][category] = self.summary["categories"].get(category, 0) + 1
+            for name in engines:
+                translations[name][idx] = para
+
+        if regular:
+            inner = self.inner.run([paragraphs[idx] for idx in regular])
+            for name in engines:
+                for pos, idx in enumerate(regular):
+                    translations[name][idx] = inner[name][pos]
+
+        copied = len(paragraphs) - len(regular)
+        calls_made = len(regular) * len(engines)
+        calls_saved = copied * len(engines)
+        elapsed = time.monotonic() - started
+        # Оцінка: середній час на виклик у цьому завданні, помножений на заощаджені виклики
+        seconds_saved = elapsed / calls_made * calls_saved if calls_made else 0.0
+
+        self.summary["copied"] += copied
+        self.summary["calls_saved"] += calls_saved
+        self.summary["seconds_saved"] += seconds_saved
+        logging.info(self.summary_text())
+        return translations
+
+    def summary_text(self):
+        return (
+            f"Швидкий шлях: скопійовано {self.summary['copied']}, "
+            f"заощаджено викликів {self.summary['calls_saved']} (~{self.summary['seconds_saved']:.0f} с)"
+        )
@@ -0,0 +1,157 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline import ENGINES
+
+# Скільки рядків одночасно перетворюється на об'єкти Python під час обходу таблиці
+ROW_BATCH_SIZE = 1024
+
+MISSING_TERMS_TYPE = pa.list_(pa.struct([("term", pa.string()), ("translation", pa.string())]))
+
+# Необов'язкові колонки метаданих: присутні лише тоді, коли відповідний етап увімкнено
+METADATA_TYPES = {
+    "page": pa.int32(),
+    "note": pa.string(),
+    "changed": pa.bool_(),
+    "score": pa.float64(),
+    **{f"missing_{engine}": MISSING_TERMS_TYPE for engine in ENGINES},
+}
+
+
+def _missing_terms(term_flags, engine):
+    return [
+        [{"term": term, "translation": target} for term, target in flags[engine]]
+        if flags and flags.get(engine) else None
+        for flags in term_flags
+    ]
+
+
+class SegmentTable:
+    """Колонкова таблиця сегментів завдання (pyarrow.Table): оригінал, переклад кожного рушія й метадані.
+
+    Рядок — сегмент у порядку документа. Тексти зберігаються суцільними буферами UTF-8 зі зсувами, а не
+    окремими об'єктами str, тож на великих завданнях таблиця займає значно менше пам'яті, ніж паралельні списки,
+    а експорт в Arrow/Parquet не копіює дані.
+
+    take повертає перегляд: спільні з вихідною таблицею колонки та індекси вибраних рядків (rows).
+    """
+
+    def __init__(self, table, rows=None):
+        self.table = table
+        self.rows = rows
+
+    @classmethod
+    def from_translations(cls, paragraphs, translations, pages=None, notes=None, changed=None, scores=None,
+                          term_flags=None):
+        """Збирає таблицю з результату конвеєра {рушій: [переклади]} і метаданих етапів.
+
+        pages — номер сторінки кожного сегмента (PDF); notes — позначки маршрутів (каскад, пам'ять перекладів);
+        changed — індекси змінених абзаців інкрементального перекладу; scores — оцінки узгодженості;
+        term_flags — результат GlossaryEnforcer.check.
+        """
+        columns = {"source": pa.array(paragraphs, pa.string())}
+        for engine in ENGINES:
+            columns[engine] = pa.array(translations[engine], pa.string())
+        segments = cls(pa.table(columns))
+        if pages is not None:
+            segments = segments.with_column("page", pages)
+        if notes is not None:
+            segments = segments.with_column("note", notes)
+        if changed is not None:
+            segments = segments.with_column("changed", [idx in changed for idx in range(len(paragraphs))])
+        if scores is not None:
+            segments = segments.with_column("score", scores)
+        if term_flags:
+            for engine in ENGINES:
+                segments = segments.with_column(f"missing_{engine}", _missing_terms(term_flags, engine))
+        return segments
+
+    @classmethod
+    def read_parquet(cls, path):
+        return cls(pq.read_table(path))
+
+    def __len__(self):
+        return self.table.num_rows if self.rows is None else len(self.rows)
+
+    def __contains__(self, name):
+        return name in self.table.column_names
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def with_column(self, name, values, type=None):
+        """Нова таблиця з доданою (або заміненою) колонкою; наявні колонки не копіюються (крім перегляду)."""
+        array = values if isinstance(values, (pa.Array, pa.ChunkedArray)) else pa.array(
+            values, type or METADATA_TYPES.get(name)
+        )
+        table = self.to_arrow()
+        if name in self:
+            return SegmentTable(table.set_column(table.column_names.index(name), name, array))
+        return SegmentTable(table.append_column(name, array))
+
+    def values(self, name):
+        """Колонка як список Python (для етапів, що працюють зі списками)."""
+        column = self.table.column(name)
+        return (column if self.rows is None else column.take(self.rows)).to_pylist()
+
+    def translations(self):
+        """Переклади у форматі конвеєра: {рушій: [переклади]}."""
+        return {engine: self.values(engine) for engine in ENGINES}
+
+    def take(self, rows):
+        """Перегляд рядків rows у заданому порядку (нумерація — за новим порядком) без копіювання колонок."""
+        rows = pa.array(rows, pa.int64())
+        return SegmentTable(self.table, rows if self.rows is None else self.rows.take(rows))
+
+    def _base_rows(self, start, stop, rows=None):
+        """Індекси рядків self.table для позицій [start, stop) усієї таблиці або списку rows."""
+        if rows is not None:
+            chunk = pa.array(rows[start:stop], pa.int64())
+            return chunk if self.rows is None else self.rows.take(chunk)
+        if self.rows is None:
+            return None
+        return self.rows.slice(start, stop - start)
+
+    def iter_rows(self, rows=None, batch_size=ROW_BATCH_SIZE):
+        """Повертає пари (номер рядка, {колонка: значення}) для всіх рядків або лише rows у заданому порядку.
+
+        Рядки перетворюються на словники пакетами по batch_size, тож обхід великої таблиці не дублює її в пам'яті.
+        """
+        indices = range(len(self)) if rows is None else list(rows)
+        for start in range(0, len(indices), batch_size):
+            chunk = indices[start:start + batch_size]
+            base = self._base_rows(start, start + len(chunk), None if rows is None else indices)
+            batch = self.table.slice(start, len(chunk)) if base is None else self.table.take(base)
+            yield from zip(chunk, batch.to_pylist())
+
+    def iter_batches(self, batch_size=ROW_BATCH_SIZE):
+        """Рядки пакетами pyarrow.RecordBatch по batch_size; перегляд копіює лише поточний пакет."""
+        if self.rows is None:
+            yield from self.table.to_batches(max_chunksize=batch_size)
+            return
+        for start in range(0, len(self), batch_size):
+            yield from self.table.take(self._base_rows(start, min(start + batch_size, len(self)))).to_batches()
+
+    def to_arrow(self):
+        """pyarrow.Table без копіювання; перегляд (take) при цьому збирається в окрему таблицю."""
+        return self.table if self.rows is None else self.table.take(self.rows)
+
+    def write_parquet(self, path, compression="zstd"):
+        pq.write_table(self.to_arrow(), path, compression=compression)
+        return path
+
+
+def row_note(row):
+    """Службова позначка рядка для колонки №: сторінка PDF і маршрут (наприклад, «с. 3, пам'ять»)."""
+    parts = []
+    if row.get("page") is not None:
+        parts.append(f"с. {row['page']}")
+    if row.get("note"):
+        parts.append(row["note"])
+    return ", ".join(parts) or None
+
+
+def missing_terms(row, engine):
+    """Пари (термін, переклад) глосарію, яких бракує в перекладі рушія engine."""
+    return [(item["term"], item["translation"]) for item in row.get(f"missing_{engine}") or ()]
@@ -0,0 +1,111 @@
+from collections import Counter
+
+import numpy as np
+
+_NGRAM_MULT = np.uint64(0x9E3779B97F4A7C15)
+_HASH_MASK = np.uint64((1 << 40) - 1)
+
+
+def char_ngrams(text, n):
+    """Символьні n-грами тексту без пробілів (як у chrF)."""
+    text = "".join(text.split())
+    return Counter(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def chrf(hypothesis, reference, max_n=6, beta=1.0):
+    """Оцінка chrF (0..1) між двома перекладами; beta=1 дає симетричну міру узгодженості."""
+    if not hypothesis or not reference:
+        return 0.0
+    precisions = []
+    recalls = []
+    for n in range(1, max_n + 1):
+        hyp = char_ngrams(hypothesis, n)
+        ref = char_ngrams(reference, n)
+        if not hyp or not ref:
+            continue
+        overlap = sum((hyp & ref).values())
+        precisions.append(overlap / sum(hyp.values()))
+        recalls.append(overlap / sum(ref.values()))
+    if not precisions:
+        return 1.0 if hypothesis.strip() == reference.strip() else 0.0
+
+    precision = sum(precisions) / len(precisions)
+    recall = sum(recalls) / len(recalls)
+    if precision + recall == 0:
+        return 0.0
+    beta2 = beta ** 2
+    return (1 + beta2) * precision * recall / (beta2 * precision + recall)
+
+
+class NgramProfile:
+    """Хешовані лічильники символьних n-грам пакета текстів, обчислені векторно NumPy.
+
+    Для кожного n зберігаються відсортовані ключі (номер тексту << 40 | хеш n-грами),
+    кількості та суми n-грам по текстах.
+    """
+
+    def __init__(self, texts, max_n=6):
+        self.size = len(texts)
+        self.max_n = max_n
+        stripped = ["".join(text.split()) if text else "" for text in texts]
+        self.empty = np.array([not text for text in texts], dtype=bool)
+        self.stripped = stripped
+        lengths = np.fromiter(map(len, stripped), dtype=np.int64, count=len(stripped))
+        codes = np.frombuffer("".join(stripped).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        rows = np.repeat(np.arange(len(stripped), dtype=np.uint64), lengths)
+
+        self.keys, self.counts, self.totals = [], [], []
+        hashes = codes.copy()
+        for n in range(1, max_n + 1):
+            if n > 1:
+                # Хеш n-грами з хешу (n-1)-грами: h[i] = h[i] * M + c[i + n - 1] (переповнення uint64 допустиме)
+                hashes = hashes[:-1] * _NGRAM_MULT + codes[n - 1:]
+            valid = rows[:len(hashes)] == rows[n - 1:]
+            keys = (rows[:len(hashes)][valid] << np.uint64(40)) | (hashes[valid] & _HASH_MASK)
+            keys, counts = np.unique(keys, return_counts=True)
+            self.keys.append(keys)
+            self.counts.append(counts)
+            self.totals.append(np.bincount((keys >> np.uint64(40)).astype(np.int64), counts, minlength=self.size))
+
+
+def profile_chrf(hypothesis, reference, beta=1.0):
+    """chrF для кожної пари рядків двох профілів однакового розміру; масив значень 0..1."""
+    size = hypothesis.size
+    precision = np.zeros(size)
+    recall = np.zeros(size)
+    used = np.zeros(size)
+    for n in range(min(hypothesis.max_n, reference.max_n)):
+        # Ключі відсортовані, тож спільні n-грами знаходяться бінарним пошуком без повторного сортування
+        hyp_keys, ref_keys = hypothesis.keys[n], reference.keys[n]
+        ref_idx = np.minimum(np.searchsorted(ref_keys, hyp_keys), max(len(ref_keys) - 1, 0))
+        common = ref_keys[ref_idx] == hyp_keys if len(ref_keys) else np.zeros(len(hyp_keys), dtype=bool)
+        overlap = np.bincount(
+            (hyp_keys[common] >> np.uint64(40)).astype(np.int64),
+            np.minimum(hypothesis.counts[n][common], reference.counts[n][ref_idx[common]]),
+            minlength=size,
+        )
+        hyp_total, ref_total = hypothesis.totals[n], reference.totals[n]
+        has_both = (hyp_total > 0) & (ref_total > 0)
+        precision += np.divide(overlap, hyp_total, out=np.zeros(size), where=has_both)
+        recall += np.divide(overlap, ref_total, out=np.zeros(size), where=has_both)
+        used += has_both
+
+    precision = np.divide(precision, used, out=np.zeros(size), where=used > 0)
+    recall = np.divide(recall, used, out=np.zeros(size), where=used > 0)
+    beta2 = beta ** 2
+    denominator = beta2 * precision + recall
+    scores = np.divide((1 + beta2) * precision * recall, denominator, out=np.zeros(size), where=denominator > 0)
+
+    # Як у chrf: тексти без n-грам збігаються лише тоді, коли однакові
+    no_ngrams = used == 0
+    if no_ngrams.any():
+        scores[no_ngrams] = [
+            float(hypothesis.stripped[idx] == reference.stripped[idx]) for idx in np.flatnonzero(no_ngrams)
+        ]
+    scores[hypothesis.empty | reference.empty] = 0.0
+    return scores
+
+
+def batch_chrf(hypotheses, references, max_n=6, beta=1.0):
+    """Векторний chrF для списків перекладів однакової довжини (результат як у chrf)."""
+    return profile_chrf(NgramProfile(hypotheses, max_n), NgramProfile(references, max_n), beta)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from fuzzy_index import FuzzyIndex, MinHasher, word_similarity
+
+SEGMENTS = [
+    "The Supplier shall deliver the Goods within thirty days of the order.",
+    "This Agreement shall be governed by the laws of Ukraine.",
+    "Any dispute shall be referred to the International Commercial Arbitration Court.",
+    "The Buyer shall pay the price within ten banking days.",
+]
+
+
+def test_word_similarity():
+    assert word_similarity("a b c", "a b c") == 1.0
+    assert word_similarity("a b c d", "a b x d") == 0.75
+    # Верхня оцінка нижча за поріг — повертається без повного підрахунку
+    assert word_similarity("a b c d", "x y z d", threshold=0.5) == 0.25
+
+
+def test_signatures_match_single_signature():
+    hasher = MinHasher()
+    batch = hasher.signatures(SEGMENTS, chunk_size=3)
+    for text, signature in zip(SEGMENTS, batch):
+        assert np.array_equal(hasher.signature(text), signature)
+
+
+def test_candidates_find_near_duplicate_first():
+    hasher = MinHasher()
+    index = FuzzyIndex()
+    index.add([10, 11, 12, 13], hasher.signatures(SEGMENTS))
+    query = hasher.signature("The Supplier shall deliver the goods within thirty (30) days of the order.")
+    assert index.candidates(query)[0] == 10
+    assert index.candidates(hasher.signature("Completely unrelated text about weather.")) == []
+
+
+def test_merge_keeps_bands_sorted():
+    hasher = MinHasher()
+    index = FuzzyIndex()
+    for start in range(0, len(SEGMENTS), 2):
+        index.add(range(start, start + 2), hasher.signatures(SEGMENTS[start:start + 2]))
+        index.candidates(hasher.signature(SEGMENTS[start]))
+    index.add([len(SEGMENTS)], hasher.signatures(SEGMENTS[:1]))
+    assert len(index) == len(SEGMENTS) + 1
+    keys_by_band, ids_by_band = index._bands
+    for keys, ids in zip(keys_by_band, ids_by_band):
+        assert np.all(keys[:-1] <= keys[1:])
+        assert len(keys) == len(ids) == len(SEGMENTS)
+    # Дублікат першого сегмента збігається з ним в усіх смугах
+    assert sorted(index.candidates(hasher.signature(SEGMENTS[0]))[:2]) == [0, len(SEGMENTS)]
+
+
+def test_bands_must_divide_permutations():
+    with pytest.raises(ValueError):
+        FuzzyIndex(num_perm=64, bands=10)
@@ -0,0 +1,39 @@
+from glossary import Glossary, TermMatcher, load_glossary
+
+
+def test_longest_match_wins():
+    matcher = TermMatcher(["court", "arbitration court", "commercial arbitration court"])
+    assert matcher.find("The International Commercial Arbitration Court decides.") == [2]
+
+
+def test_leftmost_match_wins_over_overlap():
+    matcher = TermMatcher(["force majeure", "majeure event"])
+    assert matcher.find("A force majeure event occurs.") == [0]
+
+
+def test_repeated_and_adjacent_terms():
+    matcher = TermMatcher(["party", "agreement"])
+    assert matcher.find("Each Party to this Agreement and the other party") == [0, 1, 0]
+
+
+def test_failure_links_reach_suffix_terms():
+    matcher = TermMatcher(["a b c", "b d"])
+    assert matcher.find("a b d") == [1]
+
+
+def test_empty_term_is_ignored():
+    matcher = TermMatcher(["", "goods"])
+    assert matcher.find("the goods") == [1]
+
+
+def test_missing_accepts_inflected_translation():
+    glossary = Glossary([("supplier", "постачальник"), ("goods", "товар")])
+    found = glossary.matcher.find("The Supplier delivers the goods.")
+    assert glossary.missing(found, "Постачальником поставлено продукцію.") == [("goods", "товар")]
+
+
+def test_load_glossary_reuses_compiled_version():
+    data = "term,translation\nbuyer,покупець\n".encode("utf-8")
+    first = load_glossary(data)
+    assert load_glossary(data) is first
+    assert first.find("The Buyer pays.") == [("buyer", "покупець")]
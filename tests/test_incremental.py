@@ -0,0 +1,34 @@
+from incremental import align_segments
+
+
+def test_unchanged_document():
+    paragraphs = ["One.", "Two.", "Three."]
+    assert align_segments(paragraphs, paragraphs) == ([0, 1, 2], set())
+
+
+def test_whitespace_differences_are_ignored():
+    mapping, changed = align_segments(["Article  1.\n"], ["Article 1."])
+    assert mapping == [0]
+    assert changed == set()
+
+
+def test_edited_and_inserted_paragraphs():
+    old = ["One.", "Two.", "Three."]
+    new = ["One.", "Two, amended.", "Three.", "Four."]
+    mapping, changed = align_segments(old, new)
+    assert mapping == [0, None, 2, None]
+    assert changed == {1, 3}
+
+
+def test_moved_paragraph_reuses_previous_translation():
+    old = ["One.", "Two.", "Three.", "Four."]
+    new = ["Three.", "One.", "Two.", "Four."]
+    mapping, changed = align_segments(old, new)
+    assert mapping == [2, 0, 1, 3]
+    assert changed == {0}
+
+
+def test_deleted_paragraph():
+    mapping, changed = align_segments(["One.", "Two.", "Three."], ["One.", "Three."])
+    assert mapping == [0, 2]
+    assert changed == set()
@@ -0,0 +1,162 @@
+import argparse
+import logging
+import time
+
+from lxml import etree
+
+from translation_memory import TranslationMemory, TM_PATH
+
+# Вбудовані елементи TMX/XLIFF, текст яких є кодом форматування, а не частиною сегмента
+INLINE_CODE_TAGS = {"bpt", "ept", "ph", "it", "ut", "sc", "ec"}
+
+
+def _local_name(element):
+    return etree.QName(element).localname
+
+
+def segment_text(element):
+    """Текст сегмента без вбудованих кодів форматування, з нормалізованими пробілами."""
+    parts = [element.text or ""]
+    for child in element:
+        if _local_name(child) not in INLINE_CODE_TAGS:
+            parts.append(segment_text(child))
+        parts.append(child.tail or "")
+    return " ".join("".join(parts).split())
+
+
+def _release(element):
+    """Звільняє пам'ять оброблених елементів під час потокового розбору."""
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def _lang_matches(lang, wanted):
+    return bool(lang) and lang.lower().replace("_", "-").split("-")[0] == wanted
+
+
+def iter_tmx(path, source_lang="en", target_lang="uk"):
+    """Потоково повертає пари (source, target) з TMX-файлу."""
+    xml_lang = "{http://www.w3.org/XML/1998/namespace}lang"
+    for _, tu in etree.iterparse(path, events=("end",), tag="{*}tu", huge_tree=True):
+        source = target = None
+        for tuv in tu.iterchildren("{*}tuv"):
+            lang = tuv.get(xml_lang) or tuv.get("lang")
+            seg = next(tuv.iterchildren("{*}seg"), None)
+            if seg is None:
+                continue
+            if _lang_matches(lang, source_lang):
+                source = segment_text(seg)
+            elif _lang_matches(lang, target_lang):
+                target = segment_text(seg)
+        if source and target:
+            yield source, target
+        _release(tu)
+
+
+def _xliff_reversed(element, source_lang, target_lang):
+    """Напрям мов файлу XLIFF: False — як задано, True — навпаки, None — інша пара мов.
+
+    Мови беруться з srcLang/trgLang (2.0, <xliff>) або source-language/target-language (1.2, <file>).
+    """
+    source = element.get("srcLang") or element.get("source-language")
+    target = element.get("trgLang") or element.get("target-language")
+    if (not source or _lang_matches(source, source_lang)) and (not target or _lang_matches(target, target_lang)):
+        return False
+    if (not source or _lang_matches(source, target_lang)) and (not target or _lang_matches(target, source_lang)):
+        return True
+    return None
+
+
+def _unit_pair(unit):
+    source = next(unit.iterchildren("{*}source"), None)
+    target = next(unit.iterchildren("{*}target"), None)
+    if source is None or target is None:
+        return None
+    source_text = segment_text(source)
+    target_text = segment_text(target)
+    return (source_text, target_text) if source_text and target_text else None
+
+
+def iter_xliff(path, source_lang="en", target_lang="uk"):
+    """Потоково повертає пари (source, target) з XLIFF 1.2 (trans-unit) або 2.0 (unit із сегментами).
+
+    Пам'ять звільняється на рівні одиниці, тож дерево не росте разом із файлом. Файл зі зворотним напрямом
+    мов імпортується з переставленими source і target, з іншою парою мов — пропускається.
+    """
+    reversed_direction = False
+    skipped = False
+    events = etree.iterparse(
+        path, events=("start", "end"), tag=("{*}xliff", "{*}file", "{*}trans-unit", "{*}unit"), huge_tree=True
+    )
+    for event, element in events:
+        name = _local_name(element)
+        if event == "start":
+            if name in ("xliff", "file") and (element.get("srcLang") or element.get("source-language")):
+                direction = _xliff_reversed(element, source_lang, target_lang)
+                skipped = direction is None
+                reversed_direction = bool(direction)
+                if skipped:
+                    logging.warning(f"{path}: пара мов не {source_lang}→{target_lang}, одиниці пропущено")
+            continue
+        if name not in ("trans-unit", "unit"):
+            continue
+        if not skipped:
+            segments = [element] if name == "trans-unit" else element.iterchildren("{*}segment")
+            for segment in segments:
+                pair = _unit_pair(segment)
+                if pair:
+                    yield pair[::-1] if reversed_direction else pair
+        _release(element)
+
+
+def import_file(memory, path, batch_size=50_000, source_lang="en", target_lang="uk"):
+    """Імпортує TMX/XLIFF у пам'ять перекладів пакетами; повертає кількість одиниць."""
+    if path.lower().endswith(".tmx"):
+        units = iter_tmx(path, source_lang, target_lang)
+    elif path.lower().endswith((".xlf", ".xliff")):
+        units = iter_xliff(path, source_lang, target_lang)
+    else:
+        raise ValueError(f"Непідтримуваний формат пам'яті перекладів: {path}")
+
+    started = time.monotonic()
+    total = 0
+    batch = []
+    for unit in units:
+        batch.append(unit)
+        if len(batch) >= batch_size:
+            total += memory.import_units(batch)
+            batch = []
+            elapsed = time.monotonic() - started
+            logging.info(f"{path}: імпортовано {total} одиниць ({total / elapsed:.0f} од./с)")
+    if batch:
+        total += memory.import_units(batch)
+
+    elapsed = time.monotonic() - started
+    logging.info(f"{path}: усього {total} одиниць за {elapsed:.1f} с ({total / elapsed if elapsed else 0:.0f} од./с)")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Масовий імпорт TMX/XLIFF у пам'ять перекладів LegalTransUA.")
+    parser.add_argument("files", nargs="+", help="Файли .tmx, .xlf або .xliff.")
+    parser.add_argument("--db", default=TM_PATH, help="Шлях до бази пам'яті перекладів.")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="Кількість одиниць в одній транзакції.")
+    parser.add_argument("--source-lang", default="en")
+    parser.add_argument("--target-lang", default="uk")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    memory = TranslationMemory(args.db, load_index=False)
+    memory.bulk_mode()
+    try:
+        for path in args.files:
+            import_file(memory, path, args.batch_size, args.source_lang, args.target_lang)
+    finally:
+        memory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,9 @@
+import csv
 import logging
 import docx
 from docx.shared import Pt, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.table import WD_TABLE_ALIGNMENT
-from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import openai
 from transformers import MarianMTModel, MarianTokenizer
 import time
@@ -15,13 +14,30 @@ from docx.enum.section import WD_ORIENT
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from docx import Document
-import fitz  # PyMuPDF
-import requests
-from bs4 import BeautifulSoup
 import re
+from urllib.parse import urlparse
+import deep_translator.google
 from deep_translator import GoogleTranslator
+from deep_translator.constants import BASE_URLS
 from dotenv import load_dotenv
 import shutil  # Для перейменування файлів
+from pipeline import DISABLED_TEXT, ENGINES, ERROR_TEXT, TranslationPipeline
+from profiling import PROFILE_ENABLED, JobProfiler
+from replay import EngineReplayer, default_tape, replaying
+from metrics import ENGINE_RETRIES, MODEL_MEMORY, JobTimings, instrument_engine, stage
+from fetch import FetchError, fetch_paragraphs
+from pdf_extract import extract_pdf_lines
+from estimate import ThroughputHistory, estimate_job
+from incremental import translate_incremental
+from resilience import ENGINE_BREAKERS, CircuitBreaker, HedgedCaller, RetryBudget, TimeoutSession
+from cascade import CascadePipeline
+from segment_filter import FilteredPipeline
+from translation_memory import TranslationMemory, MemoryLookup
+from placeholders import PlaceholderMasker, PLACEHOLDER_PATTERN, mask_text
+from glossary import GlossaryEnforcer, load_glossary
+from agreement import DISAGREEMENT_THRESHOLD, agreement_scores, agreement_summary, disagreement_rows, review_order
+from segments import SegmentTable, missing_terms, row_note
+from exporters import EXPORTERS, export_segments
 
 # Завантаження змінних середовища з файлу .env
 load_dotenv(dotenv_path="key.env")
@@ -29,34 +45,61 @@ load_dotenv(dotenv_path="key.env")
 # Призначення ключа OpenAI
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# Адресу Google Translate можна перевизначити (наприклад, локальною заглушкою для бенчмарків);
+# для OpenAI це робить стандартна змінна OPENAI_API_BASE
+if os.getenv("LTU_GOOGLE_TRANSLATE_URL"):
+    BASE_URLS["GOOGLE_TRANSLATE"] = os.getenv("LTU_GOOGLE_TRANSLATE_URL")
+
 # Налаштування логування
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+MARIAN_MODEL_NAME = "Helsinki-NLP/opus-mt-en-uk"
+
+# Назви рушіїв у порядку колонок таблиці (pipeline.ENGINES); новий рушій без назви — KeyError під час імпорту
+_LABELS = {
+    "google": "Google Translate",
+    "marian": "MarianMT",
+    "openai": "OpenAI GPT",
+}
+ENGINE_LABELS = {name: _LABELS[name] for name in ENGINES}
+
+# Запобіжники спільні для всіх завдань процесу: збій рушія не залежить від документа
+ENGINE_BREAKERS.update(
+    google=CircuitBreaker("Google Translate"),
+    openai=CircuitBreaker("OpenAI GPT"),
+)
+
+# Тайм-аут і дублювання повільних запитів до Google Translate
+GOOGLE_HEDGER = HedgedCaller("Google Translate", timeout=20.0, max_hedge_ratio=0.1)
+# Тайм-аути сокета (з'єднання, читання) для запитів до Google Translate й OpenAI, с: спроба, покинута хеджуванням,
+# теж завершується й звільняє потік
+GOOGLE_SOCKET_TIMEOUT = (5.0, 15.0)
+OPENAI_REQUEST_TIMEOUT = 60
+
+# deep_translator викликає requests.get без тайм-ауту; підміняємо його сесією з тайм-аутом (і пулом з'єднань)
+deep_translator.google.requests = TimeoutSession(GOOGLE_SOCKET_TIMEOUT)
+
+# Максимальна кількість повторних спроб на рушій в межах одного завдання
+JOB_RETRY_BUDGET = 50
+
+# Формати результату завдання: таблиця порівняння DOCX і потокові експортери (exporters.EXPORTERS)
+OUTPUT_FORMATS = ("docx",) + tuple(EXPORTERS)
+
 def extract_text_from_docx(file_path):
     """Витягує текст із DOCX-файлу."""
     doc = docx.Document(file_path)
     return [para.text.strip() for para in doc.paragraphs if para.text.strip()]
 
-def extract_text_from_pdf(file_path):
-    """Екстрагує текст із PDF-файлу."""
-    doc = fitz.open(file_path)
-    text = ""
-    for page in doc:
-        text += page.get_text("text") + "\n"
-    return [line.strip() for line in text.splitlines() if line.strip()]
+def extract_text_from_pdf(file_path, processes=None):
+    """Екстрагує текст із PDF-файлу; великі файли обробляються паралельно за діапазонами сторінок."""
+    return [line for _, line in extract_pdf_lines(file_path, processes)]
 
 
 def extract_text_from_html(url):
-    """Екстрагує текст із веб-сторінки."""
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise Exception(f"Не вдалося завантажити сторінку: {url}")
-    
-    soup = BeautifulSoup(response.content, "html.parser")
-    paragraphs = soup.find_all("p")
-    return [para.get_text().strip() for para in paragraphs if para.get_text().strip()]
-
-def extract_text(source):
+    """Екстрагує основний текст веб-сторінки (без меню, банерів і підвалів); FetchError, якщо не вдалося."""
+    return fetch_paragraphs(url)
+
+def extract_text(source, processes=None):
     """Визначає тип джерела і екстрагує текст."""
     if isinstance(source, str):  # Перевірка на тип рядка (шлях до файлу або URL)
         if source.startswith("http"):
@@ -64,14 +107,13 @@ def extract_text(source):
             return extract_text_from_html(source)
         elif source.endswith(".pdf"):
             logging.info("Джерело визначено як PDF-файл.")
-            return extract_text_from_pdf(source)
+            return extract_text_from_pdf(source, processes)
         elif source.endswith(".docx"):
             logging.info("Джерело визначено як DOCX-файл.")
             return extract_text_from_docx(source)
     raise ValueError("Формат файлу не підтримується. Підтримуються DOCX, PDF або URL.")
 
-def choose_directory():
-    output_dir = "output"
+def choose_directory(output_dir="output"):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     return output_dir
@@ -84,14 +126,11 @@ def sanitize_filename(filename):
 def extract_text_from_url(url):
     """Функція для витягнення тексту з веб-сторінки."""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        # Отримати всі абзаци тексту
-        paragraphs = [p.text.strip() for p in soup.find_all('p') if p.text.strip()]
-        return paragraphs
-    except requests.exceptions.RequestException as e:
-        return f"Помилка при завантаженні URL: {e}"
+        # Заголовки, абзаци та пункти списків основного тексту в порядку документа
+        return fetch_paragraphs(url)
+    except FetchError as e:
+        logging.error(f"Помилка при завантаженні URL: {e}")
+        return []
 
 def split_text_into_chunks(text, max_length=500):
     """Розбиває текст на частини для перекладу."""
@@ -114,15 +153,25 @@ def split_text_into_chunks(text, max_length=500):
 
     return chunks
 
-def translate_text_google(text, max_retries=3):
+def translate_text_google(text, max_retries=3, budget=None):
+    breaker = ENGINE_BREAKERS["google"]
     for attempt in range(max_retries):
+        if not breaker.allow():
+            return None
         try:
-            translated = GoogleTranslator(source='en', target='uk').translate(text)
+            translated = GOOGLE_HEDGER.call(
+                lambda: GoogleTranslator(source='en', target='uk').translate(text)
+            )
+            breaker.record_success()
             return translated
         except Exception as e:
+            breaker.record_failure()
             logging.warning(
                 f"Google Translator Error (attempt {attempt + 1}/{max_retries}): {e}"
             )
+            if attempt + 1 == max_retries or (budget and not budget.consume()):
+                break
+            ENGINE_RETRIES.inc(engine="google")
             time.sleep(2 ** attempt)
     logging.error("Google Translate: Помилка після кількох спроб")
     return None
@@ -137,23 +186,193 @@ def translate_text_marian(text, tokenizer, model):
         logging.warning(f"MarianMT Error: {e}")
         return "Помилка перекладу"
 
-def translate_text_openai(text, max_retries=3):
-    """Перекладає текст через OpenAI GPT-3.5 Turbo з повторними спробами."""
+def translate_text_marian_scored(text, tokenizer, model):
+    """Перекладає текст через MarianMT і повертає також середню log-ймовірність токена."""
+    try:
+        inputs = tokenizer([text], return_tensors="pt", padding=True, truncation=True)
+        output = model.generate(**inputs, output_scores=True, return_dict_in_generate=True)
+        translated = tokenizer.batch_decode(output.sequences, skip_special_tokens=True)[0]
+        scores = getattr(output, "sequences_scores", None)
+        if scores is None:
+            # Жадібне декодування не повертає sequences_scores
+            scores = model.compute_transition_scores(output.sequences, output.scores, normalize_logits=True).mean(dim=1)
+        return translated, float(scores[0])
+    except Exception as e:
+        logging.warning(f"MarianMT Error: {e}")
+        return "Помилка перекладу", None
+
+def translate_text_openai(text, max_retries=3, budget=None, reference=None, terms=None):
+    """Перекладає текст через OpenAI GPT-3.5 Turbo з повторними спробами.
+
+    reference — пара (схожий оригінал, його переклад) з пам'яті перекладів як зразок.
+    terms — пари (термін, обов'язковий переклад) з глосарію, знайдені в тексті.
+    """
+    breaker = ENGINE_BREAKERS["openai"]
+    messages = [{"role": "system", "content": "Translate the following text to Ukrainian."}]
+    if PLACEHOLDER_PATTERN.search(text):
+        messages[0]["content"] += " Keep placeholders such as {1} exactly as they are."
+    if terms:
+        mandated = "; ".join(f"{source} → {target}" for source, target in terms)
+        messages[0]["content"] += f" Use these mandatory glossary translations: {mandated}."
+    if reference:
+        messages[0]["content"] += " Reuse the wording of the reference translation wherever the texts match."
+        messages.append({"role": "user", "content": reference[0]})
+        messages.append({"role": "assistant", "content": reference[1]})
+    messages.append({"role": "user", "content": text})
     for attempt in range(max_retries):
+        if not breaker.allow():
+            break
         try:
             response = openai.ChatCompletion.create(
                 model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Translate the following text to Ukrainian."},
-                    {"role": "user", "content": text},
-                ],
+                messages=messages,
+                request_timeout=OPENAI_REQUEST_TIMEOUT,
             )
+            breaker.record_success()
             return response.choices[0].message["content"].strip()
         except Exception as e:
+            breaker.record_failure()
             logging.warning(f"OpenAI API Error (attempt {attempt + 1}/{max_retries}): {e}")
+            if attempt + 1 == max_retries or (budget and not budget.consume()):
+                break
+            ENGINE_RETRIES.inc(engine="openai")
             time.sleep(2 ** attempt + 1)  # Експоненційний відкат
     return "Помилка перекладу"
 
+def log_google_latency():
+    """Логує хвіст затримок Google Translate до і після хеджування."""
+    summary = GOOGLE_HEDGER.summary()
+    attempts, results = summary["attempts"], summary["results"]
+    logging.info(
+        f"Google Translate: викликів {summary['calls']}, дублів {summary['hedges']}, "
+        f"тайм-аутів {summary['timeouts']}, відхилено {summary['rejected']}; p95/p99 спроб {attempts['p95']}/{attempts['p99']} с, "
+        f"з хеджуванням {results['p95']}/{results['p99']} с"
+    )
+
+def build_job_pipeline(tokenizer, model, max_workers=5, on_progress=None, cascade=False, memory=None,
+                       masker=None, fast_path=False, glossary=None, engines=None, throughput=None, **throttle):
+    """Збирає конвеєр завдання з увімкнених етапів; повертає (конвеєр, етапи для звіту).
+
+    engines — назви рушіїв, які треба викликати (за замовчуванням усі); решта колонок позначається як вимкнені.
+    throughput — ThroughputJob (ThroughputHistory.start_job), що вимірює швидкість рушіїв для майбутніх оцінок.
+    """
+    stages = []
+    disabled = [name for name in ENGINE_LABELS if engines is not None and name not in engines]
+    options = dict(memory=memory, masker=masker, glossary=glossary, throughput=throughput, disabled=disabled)
+    if cascade:
+        pipeline = build_cascade_pipeline(
+            tokenizer, model, max_workers=max_workers, on_progress=on_progress, **options
+        )
+        stages.append(pipeline)
+    else:
+        pipeline = TranslationPipeline(
+            build_engines(tokenizer, model, **options), max_workers=max_workers, on_progress=on_progress, **throttle
+        )
+    if fast_path:
+        pipeline = FilteredPipeline(pipeline, max_workers=max_workers)
+        stages.insert(0, pipeline)
+    stages += [stage for stage in (memory, masker, glossary) if stage]
+    return pipeline, stages
+
+def summarize_stages(paragraphs, stages):
+    """Повертає позначки рядків і підсумкові примітки етапів завдання."""
+    route_maps = [stage.routes for stage in stages if hasattr(stage, "routes")]
+    notes = [stage.summary_text() for stage in stages]
+    for note in notes:
+        logging.info(note)
+    return merge_row_notes(paragraphs, route_maps), notes
+
+def merge_row_notes(paragraphs, route_maps):
+    """Поєднує позначки маршрутів рядків з кількох етапів (каскад, пам'ять перекладів)."""
+    if not route_maps:
+        return None
+    notes = []
+    for para in paragraphs:
+        # Пам'ять перекладів бачить маскований шаблон абзацу
+        keys = (para, mask_text(para)[0])
+        found = [next((routes[key] for key in keys if key in routes), None) for routes in route_maps]
+        notes.append(", ".join(note for note in found if note) or None)
+    return notes
+
+def load_marian_model(model_name=MARIAN_MODEL_NAME):
+    """Завантажує токенізатор і модель MarianMT (з LTU_MARIAN_STAND_IN=1 — заглушку для бенчмарків)."""
+    if os.getenv("LTU_MARIAN_STAND_IN") == "1":
+        from bench_servers import stand_in_marian
+        return stand_in_marian()
+    tokenizer = MarianTokenizer.from_pretrained(model_name)
+    model = MarianMTModel.from_pretrained(model_name)
+    MODEL_MEMORY.set(sum(p.numel() * p.element_size() for p in model.parameters()), model=model_name)
+    return tokenizer, model
+
+def build_engines(tokenizer, model, retry_budget=JOB_RETRY_BUDGET, memory=None, masker=None, glossary=None,
+                  throughput=None, disabled=(), tape=None):
+    """Повертає словник рушіїв перекладу для TranslationPipeline з окремим бюджетом повторів на завдання.
+
+    memory — MemoryLookup; якщо задано, рушії спершу шукають переклад у пам'яті перекладів.
+    masker — PlaceholderMasker; якщо задано, числа та посилання маскуються до звернення до пам'яті й рушіїв
+    (імпортовані переклади шукаються за сегментом як є, до маскування).
+    glossary — GlossaryEnforcer; якщо задано, знайдені в сегменті терміни передаються OpenAI.
+    throughput — ThroughputJob; вимірює тривалість успішних реальних викликів рушіїв (не під час відтворення).
+    disabled — назви рушіїв, які не викликаються (у колонці буде DISABLED_TEXT).
+    tape — EngineRecorder або EngineReplayer; за замовчуванням — за змінними LTU_ENGINE_RECORD / LTU_ENGINE_REPLAY.
+    """
+    google_budget = RetryBudget(retry_budget)
+    openai_budget = RetryBudget(retry_budget)
+    engines = {
+        "google": lambda text: translate_text_google(text, budget=google_budget),
+        "marian": lambda text: translate_text_marian(text, tokenizer, model),
+        "openai": lambda text, reference=None, terms=None: translate_text_openai(
+            text, budget=openai_budget, reference=reference, terms=terms
+        ),
+    }
+    tape = tape or default_tape()
+    if tape:
+        engines = {name: tape.wrap(name, translate) for name, translate in engines.items()}
+    # Вимірюються лише реальні виклики рушіїв, без збігів з пам'яті та вимкнених колонок
+    engines = {name: instrument_engine(name, translate, (ERROR_TEXT,)) for name, translate in engines.items()}
+    # Відтворені виклики не показують справжньої швидкості рушіїв (з LTU_REPLAY_TIME_SCALE=0 — миттєві)
+    if throughput and not isinstance(tape, EngineReplayer):
+        engines = {name: throughput.wrap(name, translate) for name, translate in engines.items()}
+    if glossary:
+        engines["openai"] = glossary.wrap_openai(engines["openai"])
+    if memory:
+        engines = {
+            "google": memory.wrap("google", engines["google"]),
+            "marian": memory.wrap("marian", engines["marian"]),
+            "openai": memory.wrap_openai(engines["openai"]),
+        }
+    if masker:
+        engines = {name: masker.wrap(translate) for name, translate in engines.items()}
+        if memory:
+            engines = {name: memory.wrap_imported(translate) for name, translate in engines.items()}
+    for name in disabled:
+        engines[name] = lambda text, **kwargs: DISABLED_TEXT
+    return engines
+
+def build_cascade_pipeline(tokenizer, model, max_workers=5, on_progress=None, retry_budget=JOB_RETRY_BUDGET,
+                           memory=None, masker=None, glossary=None, throughput=None, disabled=(), tape=None):
+    """Повертає каскадний конвеєр: OpenAI лише там, де Google і MarianMT не узгоджені."""
+    marian_scored = lambda text: translate_text_marian_scored(text, tokenizer, model)
+    tape = tape or default_tape()
+    if tape:
+        marian_scored = tape.wrap("marian_scored", marian_scored)
+    marian_scored = instrument_engine("marian", marian_scored, (ERROR_TEXT,))
+    if throughput and not isinstance(tape, EngineReplayer):
+        marian_scored = throughput.wrap("marian", marian_scored)
+    # Ті самі обгортки пам'яті й маскування, що й для рушіїв у build_engines
+    if memory:
+        marian_scored = memory.wrap_scored("marian", marian_scored)
+    if masker:
+        marian_scored = masker.wrap(marian_scored)
+        if memory:
+            marian_scored = memory.wrap_imported(marian_scored, scored=True)
+    if "marian" in disabled:
+        marian_scored = lambda text: (DISABLED_TEXT, None)
+    return CascadePipeline(
+        build_engines(tokenizer, model, retry_budget, memory, masker, glossary, throughput, disabled, tape),
+        marian_scored, max_workers=max_workers, on_progress=on_progress,
+    )
+
 def set_table_border(table):
     """Встановлює межі таблиці."""
     tbl = table._element
@@ -204,14 +423,26 @@ def add_title(doc):
     run.font.size = Pt(12)
     paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
-def create_translation_table(doc, paragraphs, google_translations, marian_translations, openai_translations):
-    """Створює таблицю перекладів у DOCX-документі."""
-    table = doc.add_table(rows=1, cols=5)
-    table.style = "Table Grid"
+def create_translation_table(doc, segments, highlight_changes=False, rows=None):
+    """Створює таблицю перекладів у DOCX-документі з таблиці сегментів (segments.SegmentTable).
 
+    Метадані виводяться, якщо відповідна колонка є в таблиці: сторінка й маршрут — у колонці №,
+    пропущені терміни глосарію — під перекладом, оцінка узгодженості — в окремій колонці «Узгодж.».
+    highlight_changes — підсвічувати змінені абзаци інкрементального перекладу.
+    rows — індекси рядків для виведення в заданому порядку (номери рядків зберігаються).
+    """
+    with_scores = "score" in segments
     headers = ["№", "Оригінальний текст", "Google Translate", "MarianMT", "OpenAI GPT"]
+    if with_scores:
+        headers.append("Узгодж.")
+    table = doc.add_table(rows=1, cols=len(headers))
+    table.style = "Table Grid"
+
     header_fill_color = "D9EAF7"  # Світло-блакитний
     row_number_fill_color = "E0E0E0"  # Світло-сірий
+    changed_fill_color = "FFF2CC"  # Світло-жовтий для змінених рядків
+    missing_term_fill_color = "F4CCCC"  # Світло-червоний для перекладів без обов'язкових термінів
+    disagreement_fill_color = "FCE4D6"  # Світло-помаранчевий для неузгоджених рядків
 
     # Додаємо заголовки колонок
     for idx, header in enumerate(headers):
@@ -224,17 +455,41 @@ def create_translation_table(doc, paragraphs, google_translations, marian_transl
         cell._element.get_or_add_tcPr().append(create_shading_element(header_fill_color))
 
     # Заповнення таблиці
-    for i, (para, g_trans, m_trans, o_trans) in enumerate(zip(paragraphs, google_translations, marian_translations, openai_translations)):
+    for i, row in segments.iter_rows(rows):
         row_cells = table.add_row().cells
         row_cells[0].text = str(i + 1)
-        row_cells[1].text = para if para else ""
-        row_cells[2].text = g_trans if g_trans else "Помилка перекладу"
-        row_cells[3].text = m_trans if m_trans else "Помилка перекладу"
-        row_cells[4].text = o_trans if o_trans else "Помилка перекладу"
+        note = row_note(row)
+        if note:
+            row_cells[0].add_paragraph(note)
+        row_cells[1].text = row["source"] or ""
+        for column, engine in enumerate(ENGINE_LABELS, start=2):
+            row_cells[column].text = row[engine] or "Помилка перекладу"
 
         # Заливка для першої колонки
         row_cells[0]._element.get_or_add_tcPr().append(create_shading_element(row_number_fill_color))
 
+        # Підсвічування змінених рядків
+        if highlight_changes and row.get("changed"):
+            for cell in row_cells[1:]:
+                cell._element.get_or_add_tcPr().append(create_shading_element(changed_fill_color))
+
+        # Оцінка узгодженості рушіїв
+        if with_scores:
+            score = row["score"]
+            row_cells[5].text = "—" if score is None else f"{score:.2f}"
+            if score is None or score < DISAGREEMENT_THRESHOLD:
+                row_cells[5]._element.get_or_add_tcPr().append(create_shading_element(disagreement_fill_color))
+
+        # Позначка перекладів, де бракує термінів глосарію (окремим абзацом після перекладу)
+        for column, engine in enumerate(ENGINE_LABELS, start=2):
+            missing = missing_terms(row, engine)
+            if missing:
+                terms = "; ".join(f"{source} → {target}" for source, target in missing)
+                row_cells[column].add_paragraph().add_run(f"Бракує термінів: {terms}").italic = True
+                row_cells[column]._element.get_or_add_tcPr().append(
+                    create_shading_element(missing_term_fill_color)
+                )
+
         # Вирівнювання тексту по ширині
         for cell in row_cells:
             for paragraph in cell.paragraphs:
@@ -245,6 +500,8 @@ def create_translation_table(doc, paragraphs, google_translations, marian_transl
     # Встановлення ширини колонок
     total_width = docx.shared.Inches(10)
     column_widths = [total_width * 0.04, total_width * 0.23, total_width * 0.23, total_width * 0.23, total_width * 0.23]
+    if with_scores:
+        column_widths = [total_width * 0.04] + [total_width * 0.22] * 4 + [total_width * 0.08]
     for i, column in enumerate(table.columns):
         for cell in column.cells:
             cell.width = column_widths[i]
@@ -259,6 +516,21 @@ def create_translation_table(doc, paragraphs, google_translations, marian_transl
 
     return doc
 
+def load_translation_document(file_path):
+    """Зчитує таблицю перекладів із DOCX, створеного LegalTransUA."""
+    doc = docx.Document(file_path)
+    if not doc.tables:
+        raise ValueError(f"У файлі {file_path} немає таблиці перекладів.")
+    previous = {"paragraphs": []}
+    previous.update({name: [] for name in ENGINE_LABELS})
+    for row in doc.tables[0].rows[1:]:
+        # Лише перший абзац комірки: далі можуть бути службові позначки (наприклад, пропущені терміни)
+        cells = [cell.paragraphs[0].text for cell in row.cells]
+        previous["paragraphs"].append(cells[1])
+        for name, text in zip(ENGINE_LABELS, cells[2:]):
+            previous[name].append(text)
+    return previous
+
 def create_shading_element(color):
     """Створює елемент заливки комірки."""
     shading = OxmlElement("w:shd")
@@ -267,35 +539,55 @@ def create_shading_element(color):
     shading.set(qn("w:fill"), color)
     return shading
 
-import shutil  # Для перейменування файлів
-
-def save_translation_document(source, paragraphs, google_translations, marian_translations, openai_translations):
-    """Зберігає переклади в новий DOCX-документ."""
+def build_translation_document(segments, highlight_changes=False, notes=None, rows=None):
+    """Створює DOCX-документ із таблицею перекладів (segments — SegmentTable)."""
     doc = docx.Document()
     setup_document_orientation(doc)
     add_title(doc)
     doc.add_paragraph(f"Дата та час перекладу: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    for note in notes or []:
+        doc.add_paragraph(note)
 
     # Додаємо таблицю
-    create_translation_table(doc, paragraphs, google_translations, marian_translations, openai_translations)
+    create_translation_table(doc, segments, highlight_changes, rows)
+    return doc
 
-    # Визначення назви файлу
+def output_base_name(source):
+    """Назва джерела для імені файлу результату: ім'я файлу без розширення або останній сегмент URL (чи хост)."""
     if source.startswith("http"):
-        base_name = source.split("/")[-1]
+        url = urlparse(source)
+        parts = [part for part in url.path.split("/") if part]
+        base_name = parts[-1] if parts else url.netloc
     else:
         base_name = os.path.splitext(os.path.basename(source))[0]
+    return sanitize_filename(base_name)
 
-    sanitized_name = sanitize_filename(base_name)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+def output_path(source, output_dir="output", extension=".docx", name_suffix="", timestamp=None):
+    """Шлях до файлу результату: назва джерела, позначка LTU і час створення.
 
-    # Завжди використовуємо розширення .docx
-    save_directory = choose_directory()
-    output_file = os.path.join(
-        save_directory, f"{sanitized_name} (Translated by LTU) {timestamp}.docx"
+    Наявний файл не перезаписується: FileExistsError (наприклад, два джерела з однаковою назвою в одну секунду).
+    """
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    save_directory = choose_directory(output_dir)
+    path = os.path.join(
+        save_directory, f"{output_base_name(source)} (Translated by LTU){name_suffix} {timestamp}{extension}"
     )
+    if os.path.exists(path):
+        raise FileExistsError(f"Файл результату вже існує: {path}")
+    return path
+
+def save_translation_document(source, segments, output_dir="output", highlight_changes=False, notes=None,
+                              rows=None, name_suffix="", timestamp=None):
+    """Зберігає таблицю сегментів (SegmentTable) у новий DOCX-документ."""
+    with stage("render"):
+        doc = build_translation_document(segments, highlight_changes, notes, rows)
+
+    # Завжди використовуємо розширення .docx
+    output_file = output_path(source, output_dir, ".docx", name_suffix, timestamp)
 
     # Збереження файлу
-    doc.save(output_file)
+    with stage("save"):
+        doc.save(output_file)
     logging.info(f"Документ збережено за адресою: {output_file}")
 
     # Примусове перейменування на .docx, якщо файл має інше розширення
@@ -307,57 +599,179 @@ def save_translation_document(source, paragraphs, google_translations, marian_tr
 
     return output_file
 
+def check_formats(formats):
+    """ValueError, якщо серед formats є формат не з OUTPUT_FORMATS (перевіряється до початку роботи)."""
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+    if unknown:
+        raise ValueError(
+            f"Непідтримуваний формат результату: {', '.join(unknown)}. Доступні: {', '.join(OUTPUT_FORMATS)}"
+        )
 
-def process_document(source, tokenizer=None, model=None):
-    """Обробляє документ і зберігає вихідний файл у форматі DOCX."""
-    try:
-        paragraphs = extract_text(source)
-        if not paragraphs:
-            logging.error("Документ не містить тексту або текст не вдалося витягти.")
-            return
-
-        logging.info(f"Знайдено абзаців: {len(paragraphs)}")
-
-        # Ініціалізація MarianMT
-        if not tokenizer or not model:
-            model_name = "Helsinki-NLP/opus-mt-en-uk"
-            tokenizer = MarianTokenizer.from_pretrained(model_name)
-            model = MarianMTModel.from_pretrained(model_name)
-
-        # Підготовка списків для перекладів
-        google_translations = [""] * len(paragraphs)
-        marian_translations = [""] * len(paragraphs)
-        openai_translations = [""] * len(paragraphs)
-
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            # Google Translate
-            google_futures = {executor.submit(translate_text_google, para): idx for idx, para in enumerate(paragraphs)}
-            for future in tqdm(as_completed(google_futures), total=len(google_futures), desc="Google Translate"):
-                idx = google_futures[future]
-                google_translations[idx] = future.result() or "Помилка перекладу"
-
-            # MarianMT
-            marian_futures = {executor.submit(translate_text_marian, para, tokenizer, model): idx for idx, para in enumerate(paragraphs)}
-            for future in tqdm(as_completed(marian_futures), total=len(marian_futures), desc="MarianMT"):
-                idx = marian_futures[future]
-                marian_translations[idx] = future.result() or "Помилка перекладу"
-
-            # OpenAI GPT
-            openai_futures = {executor.submit(translate_text_openai, para): idx for idx, para in enumerate(paragraphs)}
-            for future in tqdm(as_completed(openai_futures), total=len(openai_futures), desc="OpenAI GPT"):
-                idx = openai_futures[future]
-                openai_translations[idx] = future.result() or "Помилка перекладу"
-
-        # Зберігаємо у форматі DOCX
-        output_file = save_translation_document(
-            source, paragraphs, google_translations, marian_translations, openai_translations
+def save_outputs(source, segments, formats=("docx",), output_dir="output", highlight_changes=False, notes=None,
+                 name_suffix=""):
+    """Зберігає результат завдання в кожному з форматів OUTPUT_FORMATS; повертає {формат: шлях}.
+
+    Усі файли завдання мають спільну назву й час створення й відрізняються лише розширенням.
+    name_suffix розрізняє джерела з однаковою назвою (наприклад, у пакетному перекладі).
+    """
+    check_formats(formats)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    outputs = {}
+    for fmt in formats:
+        if fmt == "docx":
+            outputs[fmt] = save_translation_document(
+                source, segments, output_dir, highlight_changes, notes, name_suffix=name_suffix, timestamp=timestamp
+            )
+            continue
+        with stage("export"):
+            outputs[fmt] = export_segments(
+                segments, fmt, output_path(source, output_dir, EXPORTERS[fmt].extension, name_suffix, timestamp),
+                source=source
+            )
+        logging.info(f"Експорт {fmt}: {outputs[fmt]}")
+    return outputs
+
+def write_review_csv(file, segments, rows=None):
+    """Записує таблицю перекладів з оцінками узгодженості у CSV (за замовчуванням від найменш узгоджених)."""
+    writer = csv.writer(file)
+    writer.writerow(["№", "Узгодженість", "Оригінальний текст"] + list(ENGINE_LABELS.values()))
+    for idx, row in segments.iter_rows(review_order(segments.values("score")) if rows is None else rows):
+        score = "" if row["score"] is None else f"{row['score']:.3f}"
+        writer.writerow([idx + 1, score, row["source"]] + [row[name] for name in ENGINE_LABELS])
+
+def save_review_files(source, segments, output_dir="output", notes=None):
+    """Зберігає CSV з оцінками та DOCX лише з неузгодженими рядками; повертає шляхи (csv, docx)."""
+    flagged = disagreement_rows(segments.values("score"))
+    docx_file = save_translation_document(
+        source, segments, output_dir=output_dir, notes=notes, rows=flagged, name_suffix=" (розбіжності)"
+    )
+    csv_file = f"{os.path.splitext(docx_file)[0]}.csv"
+    # utf-8-sig, щоб Excel правильно відкривав кирилицю
+    with open(csv_file, "w", encoding="utf-8-sig", newline="") as f:
+        write_review_csv(f, segments)
+    logging.info(f"Звіт розбіжностей: {len(flagged)} рядків, {docx_file}; оцінки: {csv_file}")
+    return csv_file, docx_file
+
+
+def _process_document(source, tokenizer, model, previous_file, highlight_changes, cascade, use_memory,
+                      mask_placeholders, fast_path, glossary_file, score_agreement, paragraphs, output_dir, engines,
+                      formats):
+    """Етапи process_document; кожен етап вимірюється для звіту про час завдання. Повертає {формат: шлях}."""
+    pages = None
+    with stage("extract"):
+        if paragraphs is None and source.endswith(".pdf") and not source.startswith("http"):
+            # Номер сторінки кожного абзацу зберігається в таблиці сегментів і показується в колонці №
+            lines = extract_pdf_lines(source)
+            pages = [page for page, _ in lines]
+            paragraphs = [line for _, line in lines]
+        elif paragraphs is None:
+            paragraphs = extract_text(source)
+    if not paragraphs:
+        logging.error("Документ не містить тексту або текст не вдалося витягти.")
+        return
+
+    logging.info(f"Знайдено абзаців: {len(paragraphs)}")
+
+    # Ініціалізація MarianMT
+    if (not tokenizer or not model) and not replaying():
+        with stage("load_model"):
+            tokenizer, model = load_marian_model()
+
+    def log_progress(engine, done, total):
+        logging.info(f"{ENGINE_LABELS[engine]}: {done}/{total} ({int(done / total * 100)}%)")
+
+    memory = MemoryLookup(TranslationMemory()) if use_memory else None
+    masker = PlaceholderMasker() if mask_placeholders else None
+    glossary = GlossaryEnforcer(load_glossary(glossary_file)) if glossary_file else None
+    history = ThroughputHistory()
+    throughput = history.start_job()
+    with stage("estimate"):
+        estimate_job(
+            paragraphs, tokenizer, memory.memory if memory else None, fast_path=fast_path,
+            mask_placeholders=mask_placeholders, engines=engines or tuple(ENGINE_LABELS), max_workers=10,
+            history=history
+        )
+    with stage("translate"):
+        pipeline, stages = build_job_pipeline(
+            tokenizer, model, max_workers=10, on_progress=log_progress, cascade=cascade,
+            memory=memory, masker=masker, fast_path=fast_path, glossary=glossary, engines=engines,
+            throughput=throughput, min_interval=2.0, min_step=0.1
         )
-        logging.info(f"Файл успішно збережено: {output_file}")
+        changed = None
+        if previous_file:
+            translations, changed = translate_incremental(
+                pipeline, paragraphs, load_translation_document(previous_file)
+            )
+        else:
+            translations = pipeline.run(paragraphs)
+    log_google_latency()
+    if default_tape():
+        logging.info(default_tape().summary_text())
+
+    with stage("postprocess"):
+        if memory:
+            memory.save()
+        throughput.save()
+        term_flags = glossary.check(paragraphs, translations) if glossary else None
+        row_notes, notes = summarize_stages(paragraphs, stages)
+        scores = agreement_scores(translations) if score_agreement else None
+        if scores is not None:
+            notes.append(agreement_summary(scores))
+            logging.info(notes[-1])
+    with stage("segment"):
+        segments = SegmentTable.from_translations(
+            paragraphs, translations, pages=pages, notes=row_notes, changed=changed, scores=scores,
+            term_flags=term_flags
+        )
+        # Далі працюємо лише з колонковою таблицею, списки рядків більше не потрібні
+        del paragraphs, translations, pages, row_notes, term_flags, scores
 
+    outputs = save_outputs(
+        source, segments, formats, output_dir=output_dir, highlight_changes=highlight_changes, notes=notes
+    )
+    logging.info(f"Файли успішно збережено: {', '.join(outputs.values())}")
+    if "score" in segments:
+        save_review_files(source, segments, output_dir=output_dir, notes=notes)
+    return outputs
+
+
+def process_document(source, tokenizer=None, model=None, previous_file=None, highlight_changes=False,
+                     cascade=False, use_memory=False, mask_placeholders=False, fast_path=False, glossary_file=None,
+                     score_agreement=False, paragraphs=None, output_dir="output", engines=None,
+                     profile=PROFILE_ENABLED, formats=("docx",)):
+    """Обробляє документ і зберігає результат у форматах formats (за замовчуванням — таблиця DOCX).
+
+    Якщо передано previous_file (DOCX попереднього перекладу), перекладаються лише змінені абзаци.
+    За cascade=True OpenAI викликається лише для абзаців, де Google і MarianMT не узгоджені.
+    За use_memory=True переклади шукаються в локальній пам'яті перекладів і поповнюють її.
+    За mask_placeholders=True числа, дати та посилання маскуються перед перекладом.
+    За fast_path=True номери сторінок, дати, суми, URL та український текст не надсилаються рушіям.
+    glossary_file — CSV/TSV глосарію (термін, переклад): терміни передаються OpenAI, пропуски позначаються в таблиці.
+    За score_agreement=True додається колонка узгодженості рушіїв, а поруч зберігаються CSV з оцінками
+    та DOCX лише з неузгодженими рядками.
+    paragraphs — уже витягнуті абзаци (наприклад, кількох сторінок після обходу); source тоді задає лише назву файлу.
+    engines — назви рушіїв для виклику (за замовчуванням усі); перед перекладом логуються оцінка тривалості й вартості.
+    За profile=True (або LTU_PROFILE=1) поруч із DOCX зберігаються профіль speedscope, згорнуті стеки
+    для флеймграфа і найбільші виділення пам'яті за етапами.
+    formats — формати з OUTPUT_FORMATS: docx, parquet, tmx, xliff, csv; повертається {формат: шлях}.
+    Невідомий формат — ValueError ще до витягнення тексту.
+    """
+    check_formats(formats)
+    try:
+        profiler = JobProfiler() if profile else None
+        with JobTimings(profiler) as timings:
+            outputs = _process_document(
+                source, tokenizer, model, previous_file, highlight_changes, cascade, use_memory, mask_placeholders,
+                fast_path, glossary_file, score_agreement, paragraphs, output_dir, engines, formats
+            )
+        logging.info(timings.summary_text())
+        if profiler and outputs:
+            profiler.write(next(iter(outputs.values())))
+        return outputs
     except Exception as e:
         logging.error(f"Сталася помилка під час обробки документа: {e}")
 
 
 if __name__ == "__main__":
     source = input("Введіть URL, шлях до PDF або DOCX-файлу: ").strip()
-    process_document(source, tokenizer, model)
\ No newline at end of file
+    process_document(source)
\ No newline at end of file
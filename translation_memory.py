@@ -0,0 +1,316 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from cascade import SKIPPED_TEXT
+from fuzzy_index import FuzzyIndex, MinHasher, normalize_segment, word_similarity
+from metrics import CACHE_LOOKUPS
+from pipeline import ERROR_TEXT
+
+TM_PATH = os.getenv("LTU_TM_PATH", os.path.join("data", "translation_memory.sqlite3"))
+
+# Пріоритет джерел перекладу під час вибору збігу
+ORIGIN_PRIORITY = ("import", "openai", "google", "marian")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    hash BLOB NOT NULL UNIQUE,
+    text TEXT NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS targets (
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    origin TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (source_id, origin)
+);
+"""
+
+
+# Версія ключів точного пошуку (PRAGMA user_version); 1 — з урахуванням регістру
+KEY_VERSION = 1
+
+
+def source_key(text):
+    """Ключ точного збігу: без відмінностей у пробілах, але з урахуванням регістру («Court» ≠ «court»).
+
+    Регістр нормалізується лише в нечіткому індексі.
+    """
+    return hashlib.blake2b(" ".join(text.split()).encode("utf-8"), digest_size=16).digest()
+
+
+class TranslationMemory:
+    """Локальна пам'ять перекладів у SQLite з точним і нечітким пошуком."""
+
+    def __init__(self, path=TM_PATH, num_perm=64, bands=16, load_index=True):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.hasher = MinHasher(num_perm=num_perm)
+        # Без індексу (масовий імпорт) нечіткий пошук недоступний, але пам'ять не росте з базою
+        self.index = FuzzyIndex(num_perm=num_perm, bands=bands) if load_index else None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._migrate_keys()
+        if self.index is not None:
+            self._load_index()
+
+    def _migrate_keys(self):
+        """Перераховує ключі сегментів, записані попередньою версією source_key (без урахування регістру)."""
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] >= KEY_VERSION:
+            return
+        with self._conn:
+            rows = self._conn.execute("SELECT id, text FROM sources").fetchall()
+            self._conn.executemany(
+                "UPDATE sources SET hash = ? WHERE id = ?", ((source_key(text), source_id) for source_id, text in rows)
+            )
+            self._conn.execute(f"PRAGMA user_version = {KEY_VERSION}")
+        if rows:
+            logging.info(f"Пам'ять перекладів {self.path}: оновлено ключі {len(rows)} сегментів")
+
+    def _load_index(self, chunk_size=100_000):
+        cursor = self._conn.execute("SELECT id, signature FROM sources")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            ids = [row[0] for row in rows]
+            signatures = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.uint32)
+            self.index.add(ids, signatures.reshape(len(rows), -1))
+        logging.info(f"Пам'ять перекладів {self.path}: {len(self.index)} сегментів")
+
+    def add_many(self, units):
+        """Записує одиниці (source, target, origin) однією транзакцією; повертає кількість записаних."""
+        count = 0
+        new_ids = []
+        new_signatures = []
+        with self._lock, self._conn:
+            for source, target, origin in units:
+                if not source or not target or target in (ERROR_TEXT, SKIPPED_TEXT):
+                    continue
+                key = source_key(source)
+                row = self._conn.execute("SELECT id FROM sources WHERE hash = ?", (key,)).fetchone()
+                if row:
+                    source_id = row[0]
+                else:
+                    signature = self.hasher.signature(source)
+                    source_id = self._conn.execute(
+                        "INSERT INTO sources (hash, text, signature) VALUES (?, ?, ?)",
+                        (key, source, signature.tobytes()),
+                    ).lastrowid
+                    new_ids.append(source_id)
+                    new_signatures.append(signature)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO targets (source_id, origin, text) VALUES (?, ?, ?)",
+                    (source_id, origin, target),
+                )
+                count += 1
+            if new_ids and self.index is not None:
+                self.index.add(new_ids, np.vstack(new_signatures))
+        return count
+
+    def import_units(self, units, origin="import"):
+        """Швидкий масовий запис пар (source, target) однією транзакцією; повертає кількість записаних."""
+        units = [(source, target) for source, target in units if source and target]
+        if not units:
+            return 0
+        keys = [source_key(source) for source, _ in units]
+        signatures = self.hasher.signatures([source for source, _ in units])
+        with self._lock, self._conn:
+            before = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM sources").fetchone()[0]
+            if self.index is None:
+                before = None
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO sources (hash, text, signature) VALUES (?, ?, ?)",
+                ((key, source, signature.tobytes()) for key, (source, _), signature in zip(keys, units, signatures)),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO targets (source_id, origin, text) "
+                "SELECT id, ?, ? FROM sources WHERE hash = ?",
+                ((origin, target, key) for key, (_, target) in zip(keys, units)),
+            )
+            new_rows = self._conn.execute(
+                "SELECT id, signature FROM sources WHERE id > ?", (before,)
+            ).fetchall() if before is not None else []
+        if new_rows:
+            new_signatures = np.frombuffer(b"".join(row[1] for row in new_rows), dtype=np.uint32)
+            self.index.add([row[0] for row in new_rows], new_signatures.reshape(len(new_rows), -1))
+        return len(units)
+
+    def bulk_mode(self):
+        """Налаштування SQLite для масового імпорту: WAL і без очікування fsync."""
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+
+    def record_job(self, paragraphs, translations):
+        """Зберігає результати завдання {рушій: [переклади]} у пам'ять."""
+        return self.add_many(
+            (para, texts[idx], engine)
+            for engine, texts in translations.items()
+            for idx, para in enumerate(paragraphs)
+        )
+
+    def lookup(self, source):
+        """Точний збіг: {origin: target} або порожній словник."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.origin, t.text FROM targets t JOIN sources s ON s.id = t.source_id WHERE s.hash = ?",
+                (source_key(source),),
+            ).fetchall()
+        return dict(rows)
+
+    def fuzzy(self, source, threshold=0.75, limit=3, origins=ORIGIN_PRIORITY):
+        """Найкращі попередні переклади схожих сегментів: [(score, source, target, origin)]."""
+        if self.index is None:
+            return []
+        candidates = self.index.candidates(self.hasher.signature(source))
+        if not candidates:
+            return []
+        with self._lock:
+            placeholders = ",".join("?" * len(candidates))
+            rows = self._conn.execute(
+                f"SELECT s.id, s.text, t.origin, t.text FROM sources s JOIN targets t ON t.source_id = s.id "
+                f"WHERE s.id IN ({placeholders})",
+                candidates,
+            ).fetchall()
+
+        best = {}
+        for source_id, text, origin, target in rows:
+            if origin not in origins:
+                continue
+            current = best.get(source_id)
+            if current is None or origins.index(origin) < origins.index(current[2]):
+                best[source_id] = (text, target, origin)
+
+        normalized = normalize_segment(source)
+        matches = []
+        for text, target, origin in best.values():
+            score = word_similarity(normalized, normalize_segment(text), threshold)
+            if score >= threshold:
+                matches.append((score, text, target, origin))
+        matches.sort(key=lambda match: -match[0])
+        return matches[:limit]
+
+    def close(self):
+        self._conn.close()
+
+
+class MemoryLookup:
+    """Обгортає рушії перевіркою пам'яті перекладів у межах одного завдання.
+
+    Точні збіги повертаються без виклику рушія. Для OpenAI нечіткий збіг від accept_threshold
+    приймається як є, а від reference_threshold передається моделі як зразок.
+    Нові переклади накопичуються в тому вигляді, в якому їх отримав рушій (наприклад, як шаблони
+    з плейсхолдерами), і записуються в пам'ять однією транзакцією в save().
+    """
+
+    def __init__(self, memory, accept_threshold=0.95, reference_threshold=0.75):
+        self.memory = memory
+        self.accept_threshold = accept_threshold
+        self.reference_threshold = reference_threshold
+        self.routes = {}
+        self.stats = {"exact": 0, "fuzzy_accepted": 0, "fuzzy_reference": 0}
+        self._fresh = []
+        self._lock = threading.Lock()
+
+    def _hit(self, text, key, route):
+        # Обгортки кожного рушія шукають той самий сегмент, тож збіг рахується раз на сегмент
+        with self._lock:
+            if text not in self.routes:
+                self.stats[key] += 1
+            self.routes[text] = route
+
+    def _exact(self, engine, text):
+        exact = self.memory.lookup(text)
+        # Імпортовані пам'яті (TMX/XLIFF) мають пріоритет над результатами рушіїв
+        if "import" in exact:
+            CACHE_LOOKUPS.inc(cache="tm", result="hit")
+            self._hit(text, "exact", "TMX")
+            return exact["import"]
+        if engine in exact:
+            CACHE_LOOKUPS.inc(cache="tm", result="hit")
+            self._hit(text, "exact", "TM 100%")
+            return exact[engine]
+        CACHE_LOOKUPS.inc(cache="tm", result="miss")
+        return None
+
+    def _remember(self, engine, text, result):
+        with self._lock:
+            self._fresh.append((text, result, engine))
+        return result
+
+    def wrap(self, engine, translate):
+        """Повертає функцію рушія, що спершу шукає переклад у пам'яті."""
+        def cached(text):
+            found = self._exact(engine, text)
+            if found:
+                return found
+            return self._remember(engine, text, translate(text))
+        return cached
+
+    def wrap_scored(self, engine, translate):
+        """Як wrap, але для рушія, що повертає (переклад, оцінка) — MarianMT у каскаді.
+
+        Збіг з пам'яті вважається впевненим: середня лог-ймовірність 0.
+        """
+        def cached(text):
+            found = self._exact(engine, text)
+            if found:
+                return found, 0.0
+            result = translate(text)
+            self._remember(engine, text, result[0])
+            return result
+        return cached
+
+    def wrap_imported(self, translate, scored=False):
+        """Повертає функцію рушія, що спершу шукає сегмент як є серед імпортованих перекладів (TMX/XLIFF).
+
+        Імпорт зберігає сегменти без маскування, тож з PlaceholderMasker ця обгортка стоїть зовні нього.
+        scored — рушій повертає (переклад, оцінка), як у wrap_scored.
+        """
+        def cached(text, **kwargs):
+            found = self.memory.lookup(text).get("import")
+            if found:
+                CACHE_LOOKUPS.inc(cache="tm", result="hit")
+                self._hit(text, "exact", "TMX")
+                return (found, 0.0) if scored else found
+            return translate(text, **kwargs)
+        return cached
+
+    def wrap_openai(self, translate):
+        """Як wrap, але з нечітким пошуком і передачею зразка в translate(text, reference=...)."""
+        def cached(text):
+            found = self._exact("openai", text)
+            if found:
+                return found
+            matches = self.memory.fuzzy(text, threshold=self.reference_threshold, limit=1)
+            if not matches:
+                return self._remember("openai", text, translate(text))
+            score, match_source, match_target, _ = matches[0]
+            if score >= self.accept_threshold:
+                self._hit(text, "fuzzy_accepted", f"TM {int(score * 100)}%")
+                return match_target
+            with self._lock:
+                self.stats["fuzzy_reference"] += 1
+            return self._remember("openai", text, translate(text, reference=(match_source, match_target)))
+        return cached
+
+    def save(self):
+        """Записує нові переклади завдання в пам'ять."""
+        with self._lock:
+            fresh, self._fresh = self._fresh, []
+        return self.memory.add_many(fresh)
+
+    def summary_text(self):
+        return (
+            f"Пам'ять перекладів: точних збігів {self.stats['exact']}, "
+            f"нечітких прийнято {self.stats['fuzzy_accepted']}, "
+            f"передано OpenAI як зразок {self.stats['fuzzy_reference']}"
+        )